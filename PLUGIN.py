@@ -2,9 +2,12 @@ import bpy
 from bpy.types import Operator
 from bpy.props import *
 import bmesh
-from mathutils import Vector
-from bpy.props import BoolProperty, StringProperty, EnumProperty
-from bpy.types import Operator, Panel, AddonPreferences
+import numpy as np
+from mathutils import Vector, Matrix
+from mathutils.kdtree import KDTree
+from mathutils.bvhtree import BVHTree
+from bpy.props import BoolProperty, StringProperty, EnumProperty, IntProperty, FloatProperty
+from bpy.types import Operator, Panel, AddonPreferences, PropertyGroup
 
 bl_info = {
     "name": "URDF Data Processor",
@@ -18,6 +21,2528 @@ bl_info = {
     "category": "Import-Export",
 }
 
+# === 网格数组工具（foreach_get / NumPy） ===
+
+def get_phobostype(obj):
+    """读取phobostype（兼容Phobos注册的枚举属性与自定义属性两种写法）"""
+    value = getattr(obj, 'phobostype', None)
+    if isinstance(value, str):
+        return value
+    value = obj.get('phobostype')
+    return value if isinstance(value, str) else None
+
+def set_phobostype(obj, phobostype):
+    """设置phobostype，Phobos未注册属性时写入自定义属性"""
+    try:
+        if hasattr(obj, 'phobostype'):
+            obj.phobostype = phobostype
+            return
+    except Exception:
+        pass
+    obj['phobostype'] = phobostype
+
+def is_link_object(obj):
+    """判断对象是否为link对象（规则与URDF_OT_ParentToBase.is_link_object一致）"""
+    if get_phobostype(obj) == 'link':
+        return True
+    if obj.name.startswith("link") or obj.name == "base_link":
+        return True
+    return any(key.startswith('link/') for key in obj.keys())
+
+def is_visual_object(obj):
+    """判断对象是否为visual网格（未设置phobostype的网格也视为visual）"""
+    if obj.type != 'MESH' or is_link_object(obj):
+        return False
+    return get_phobostype(obj) in (None, 'undefined', 'visual')
+
+def find_parent_link(obj):
+    """沿父级链向上查找最近的link对象"""
+    parent = obj.parent
+    while parent is not None:
+        if is_link_object(parent):
+            return parent
+        parent = parent.parent
+    return None
+
+def collect_link_visuals(scene):
+    """按所属link收集visual网格，返回 {link: [visual, ...]}"""
+    link_visuals = {}
+    for obj in scene.objects:
+        if not is_visual_object(obj):
+            continue
+        link = find_parent_link(obj)
+        if link is not None:
+            link_visuals.setdefault(link, []).append(obj)
+    return link_visuals
+
+def matrix_to_numpy(matrix):
+    """mathutils.Matrix → 4x4 float64数组"""
+    return np.array(matrix, dtype=np.float64)
+
+def transform_points(co, matrix):
+    """用4x4矩阵变换 (N, 3) 点集"""
+    return co @ matrix[:3, :3].T + matrix[:3, 3]
+
+def read_mesh_arrays(mesh):
+    """用foreach_get一次性读取网格的顶点、面、材质和UV缓冲区"""
+    n_verts = len(mesh.vertices)
+    n_loops = len(mesh.loops)
+    n_polys = len(mesh.polygons)
+
+    co = np.empty(n_verts * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    loop_vidx = np.empty(n_loops, dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_vidx)
+    loop_start = np.empty(n_polys, dtype=np.int32)
+    mesh.polygons.foreach_get("loop_start", loop_start)
+    loop_total = np.empty(n_polys, dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_total)
+    mat_idx = np.empty(n_polys, dtype=np.int32)
+    mesh.polygons.foreach_get("material_index", mat_idx)
+
+    uv = None
+    if mesh.uv_layers.active is not None and n_loops:
+        uv = np.empty(n_loops * 2, dtype=np.float32)
+        mesh.uv_layers.active.data.foreach_get("uv", uv)
+        uv = uv.reshape(-1, 2)
+
+    return {
+        'co': co.reshape(-1, 3),
+        'loop_vidx': loop_vidx,
+        'loop_start': loop_start,
+        'loop_total': loop_total,
+        'mat_idx': mat_idx,
+        'uv': uv,
+    }
+
+def read_mesh_layers(mesh):
+    """读取合并时需保留的附加数据：平滑着色、锐边/缝合线、面角法线、全部UV层和颜色属性"""
+    n_edges = len(mesh.edges)
+    n_loops = len(mesh.loops)
+
+    smooth = np.empty(len(mesh.polygons), dtype=bool)
+    mesh.polygons.foreach_get("use_smooth", smooth)
+    edges = np.empty(n_edges * 2, dtype=np.int32)
+    mesh.edges.foreach_get("vertices", edges)
+    sharp = np.empty(n_edges, dtype=bool)
+    mesh.edges.foreach_get("use_edge_sharp", sharp)
+    seam = np.empty(n_edges, dtype=bool)
+    mesh.edges.foreach_get("use_seam", seam)
+
+    # 面角法线同时包含平滑/平直着色和自定义拆分法线（Blender 4.1起为corner_normals）
+    normals = np.empty(n_loops * 3, dtype=np.float32)
+    if hasattr(mesh, 'corner_normals'):
+        mesh.corner_normals.foreach_get("vector", normals)
+    else:
+        mesh.calc_normals_split()
+        mesh.loops.foreach_get("normal", normals)
+
+    uvs = {}
+    for layer in mesh.uv_layers:
+        uv = np.empty(n_loops * 2, dtype=np.float32)
+        layer.data.foreach_get("uv", uv)
+        uvs[layer.name] = uv.reshape(-1, 2)
+
+    # {名称: (域, 数据类型, (N, 4)线性颜色)}
+    colors = {}
+    active_color = None
+    if hasattr(mesh, 'color_attributes'):
+        for attribute in mesh.color_attributes:
+            color = np.empty(len(attribute.data) * 4, dtype=np.float32)
+            attribute.data.foreach_get("color", color)
+            colors[attribute.name] = (attribute.domain, attribute.data_type, color.reshape(-1, 4))
+        active = getattr(mesh.color_attributes, 'active_color', None)
+        active_color = active.name if active is not None else None
+    else:
+        for layer in mesh.vertex_colors:
+            color = np.empty(n_loops * 4, dtype=np.float32)
+            layer.data.foreach_get("color", color)
+            colors[layer.name] = ('CORNER', 'BYTE_COLOR', color.reshape(-1, 4))
+
+    return {
+        'smooth': smooth,
+        'edges': edges.reshape(-1, 2),
+        'sharp': sharp,
+        'seam': seam,
+        'normals': normals.reshape(-1, 3),
+        'custom_normals': bool(mesh.has_custom_normals),
+        'uvs': uvs,
+        'active_uv': mesh.uv_layers.active.name if mesh.uv_layers.active is not None else None,
+        'colors': colors,
+        'active_color': active_color,
+    }
+
+def read_vertex_groups(obj):
+    """读取对象的顶点组权重，返回 {组名: (顶点索引, 权重)}（组名在对象上，权重存于网格）"""
+    names = {group.index: group.name for group in obj.vertex_groups}
+    if not names or obj.type != 'MESH':
+        return {}
+    entries = {name: ([], []) for name in names.values()}
+    for vertex in obj.data.vertices:
+        for element in vertex.groups:
+            name = names.get(element.group)
+            if name is not None:
+                entries[name][0].append(vertex.index)
+                entries[name][1].append(element.weight)
+    return {name: (np.array(indices, dtype=np.int32), np.array(weights, dtype=np.float32))
+            for name, (indices, weights) in entries.items()}
+
+def reverse_polygon_winding(loop_start, loop_total):
+    """返回使每个面环绕方向反转的loop重排索引（镜像变换后使用）"""
+    owner = np.repeat(np.arange(len(loop_start)), loop_total)
+    position = np.arange(len(owner)) - loop_start[owner]
+    return loop_start[owner] + loop_total[owner] - 1 - position
+
+def merge_objects_to_arrays(objects, reference_matrix, layers=False):
+    """把多个网格对象的缓冲区变换到参考坐标系并拼接（不修改场景）
+
+    返回 (arrays, materials)，materials为合并后的材质槽列表。
+    layers为True时同时拼接着色、锐边/缝合线、法线、全部UV/颜色层（arrays['layers']）
+    和顶点组（arrays['groups']），与bpy.ops.object.join保留的数据一致。
+    """
+    ref_inv = np.linalg.inv(matrix_to_numpy(reference_matrix))
+    materials = []
+    material_lookup = {}
+    parts = []
+    vert_offset = 0
+    loop_offset = 0
+    has_uv = False
+
+    for obj in objects:
+        arrays = read_mesh_arrays(obj.data)
+        if not len(arrays['loop_start']):
+            continue
+
+        local = ref_inv @ matrix_to_numpy(obj.matrix_world)
+        co = transform_points(arrays['co'], local).astype(np.float32)
+        loop_vidx = arrays['loop_vidx']
+        uv = arrays['uv']
+        extra = read_mesh_layers(obj.data) if layers else None
+
+        # 负行列式（镜像）会翻转法线，需要反转环绕顺序
+        if np.linalg.det(local[:3, :3]) < 0:
+            order = reverse_polygon_winding(arrays['loop_start'], arrays['loop_total'])
+            loop_vidx = loop_vidx[order]
+            if uv is not None:
+                uv = uv[order]
+            if extra is not None:
+                extra['normals'] = extra['normals'][order]
+                extra['uvs'] = {name: data[order] for name, data in extra['uvs'].items()}
+                extra['colors'] = {name: (domain, data_type, data[order] if domain == 'CORNER' else data)
+                                   for name, (domain, data_type, data) in extra['colors'].items()}
+
+        # 材质槽按材质去重后重映射
+        slots = [slot.material for slot in obj.material_slots] or [None]
+        slot_map = np.empty(len(slots), dtype=np.int32)
+        for i, material in enumerate(slots):
+            key = material.name if material else None
+            if key not in material_lookup:
+                material_lookup[key] = len(materials)
+                materials.append(material)
+            slot_map[i] = material_lookup[key]
+        mat_idx = slot_map[np.clip(arrays['mat_idx'], 0, len(slots) - 1)]
+
+        has_uv = has_uv or uv is not None
+        part = {
+            'co': co,
+            'loop_vidx': loop_vidx + vert_offset,
+            'loop_start': arrays['loop_start'] + loop_offset,
+            'loop_total': arrays['loop_total'],
+            'mat_idx': mat_idx,
+            'uv': uv,
+        }
+        if extra is not None:
+            # 法线按线性部分的逆转置变换
+            normals = extra['normals'] @ np.linalg.inv(local[:3, :3]).astype(np.float32)
+            length = np.linalg.norm(normals, axis=1, keepdims=True)
+            extra['normals'] = np.divide(normals, length, out=normals, where=length > 0)
+            extra['sharp_edges'] = extra['edges'][extra['sharp']] + vert_offset
+            extra['seam_edges'] = extra['edges'][extra['seam']] + vert_offset
+            extra['local_vidx'] = loop_vidx
+            part['layers'] = extra
+            part['groups'] = {name: (indices + vert_offset, weights)
+                              for name, (indices, weights) in read_vertex_groups(obj).items()}
+        parts.append(part)
+        vert_offset += len(co)
+        loop_offset += len(loop_vidx)
+
+    merged = {
+        'co': np.concatenate([p['co'] for p in parts]) if parts else np.zeros((0, 3), np.float32),
+        'loop_vidx': np.concatenate([p['loop_vidx'] for p in parts]) if parts else np.zeros(0, np.int32),
+        'loop_start': np.concatenate([p['loop_start'] for p in parts]) if parts else np.zeros(0, np.int32),
+        'loop_total': np.concatenate([p['loop_total'] for p in parts]) if parts else np.zeros(0, np.int32),
+        'mat_idx': np.concatenate([p['mat_idx'] for p in parts]) if parts else np.zeros(0, np.int32),
+        'uv': None,
+    }
+    if has_uv:
+        merged['uv'] = np.concatenate([
+            p['uv'] if p['uv'] is not None else np.zeros((len(p['loop_vidx']), 2), np.float32)
+            for p in parts
+        ])
+    if layers:
+        merged['layers'] = concatenate_mesh_layers(parts) if parts else None
+        groups = {}
+        for p in parts:
+            for name, (indices, weights) in p['groups'].items():
+                groups.setdefault(name, []).append((indices, weights))
+        merged['groups'] = {name: (np.concatenate([i for i, _ in entries]), np.concatenate([w for _, w in entries]))
+                            for name, entries in groups.items()}
+    return merged, materials
+
+def concatenate_mesh_layers(parts):
+    """拼接各部分的附加数据；某部分缺少的UV层补0、颜色层补白色
+
+    同名颜色属性在所有部分中都是顶点域时保持顶点域，否则统一为面角域。
+    """
+    uv_names = list(dict.fromkeys(name for p in parts for name in p['layers']['uvs']))
+    color_names = list(dict.fromkeys(name for p in parts for name in p['layers']['colors']))
+
+    uvs = {}
+    for name in uv_names:
+        uvs[name] = np.concatenate([
+            p['layers']['uvs'].get(name, np.zeros((len(p['loop_vidx']), 2), np.float32))
+            for p in parts
+        ])
+
+    colors = {}
+    for name in color_names:
+        present = [p['layers']['colors'][name] for p in parts if name in p['layers']['colors']]
+        domain = 'POINT' if all(d == 'POINT' for d, _, _ in present) else 'CORNER'
+        chunks = []
+        for p in parts:
+            entry = p['layers']['colors'].get(name)
+            size = len(p['co']) if domain == 'POINT' else len(p['loop_vidx'])
+            if entry is None:
+                chunks.append(np.ones((size, 4), np.float32))
+            elif entry[0] == 'POINT' and domain == 'CORNER':
+                chunks.append(entry[2][p['layers']['local_vidx']])
+            else:
+                chunks.append(entry[2])
+        colors[name] = (domain, present[0][1], np.concatenate(chunks))
+
+    return {
+        'smooth': np.concatenate([p['layers']['smooth'] for p in parts]),
+        'sharp_edges': np.concatenate([p['layers']['sharp_edges'] for p in parts]),
+        'seam_edges': np.concatenate([p['layers']['seam_edges'] for p in parts]),
+        'normals': np.concatenate([p['layers']['normals'] for p in parts]),
+        'custom_normals': any(p['layers']['custom_normals'] for p in parts),
+        'uvs': uvs,
+        'active_uv': next((p['layers']['active_uv'] for p in parts if p['layers']['active_uv']), None),
+        'colors': colors,
+        'active_color': next((p['layers']['active_color'] for p in parts if p['layers']['active_color']), None),
+    }
+
+def edge_keys(pairs):
+    """(N, 2) 边顶点对 → 与方向无关的int64键"""
+    pairs = np.sort(np.asarray(pairs, dtype=np.int64).reshape(-1, 2), axis=1)
+    return (pairs[:, 0] << 32) | pairs[:, 1]
+
+def write_mesh_layers(mesh, layers):
+    """把concatenate_mesh_layers的结果写入新建网格（需在边已生成后调用）"""
+    if len(layers['smooth']) == len(mesh.polygons):
+        mesh.polygons.foreach_set("use_smooth", layers['smooth'])
+
+    edges = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+    mesh.edges.foreach_get("vertices", edges)
+    keys = edge_keys(edges)
+    for name, pairs in (("use_edge_sharp", layers['sharp_edges']), ("use_seam", layers['seam_edges'])):
+        if len(pairs):
+            mesh.edges.foreach_set(name, np.isin(keys, edge_keys(pairs)))
+
+    for name, uv in layers['uvs'].items():
+        uv_layer = mesh.uv_layers.new(name=name)
+        uv_layer.data.foreach_set("uv", np.ascontiguousarray(uv, dtype=np.float32).ravel())
+    if layers['active_uv'] and layers['active_uv'] in mesh.uv_layers:
+        mesh.uv_layers.active = mesh.uv_layers[layers['active_uv']]
+
+    for name, (domain, data_type, color) in layers['colors'].items():
+        if hasattr(mesh, 'color_attributes'):
+            attribute = mesh.color_attributes.new(name=name, type=data_type, domain=domain)
+        else:
+            attribute = mesh.vertex_colors.new(name=name)
+        attribute.data.foreach_set("color", np.ascontiguousarray(color, dtype=np.float32).ravel())
+    if layers['active_color'] and hasattr(mesh, 'color_attributes') and layers['active_color'] in mesh.color_attributes:
+        mesh.color_attributes.active_color = mesh.color_attributes[layers['active_color']]
+
+    mesh.update()
+    # 任一部分带自定义法线时，所有面角都写入原法线（与join的行为一致）
+    if layers['custom_normals']:
+        if hasattr(mesh, 'use_auto_smooth'):
+            mesh.use_auto_smooth = True
+        mesh.normals_split_custom_set(layers['normals'].tolist())
+
+def apply_vertex_groups(obj, groups):
+    """把merge_objects_to_arrays拼接的顶点组权重写到对象上（同名组合并）"""
+    for name, (indices, weights) in groups.items():
+        group = obj.vertex_groups.get(name) or obj.vertex_groups.new(name=name)
+        # VertexGroup.add每次只接受一个权重值，按权重分批写入
+        for weight in np.unique(weights):
+            group.add(indices[weights == weight].tolist(), float(weight), 'REPLACE')
+
+def build_mesh_from_arrays(name, arrays, materials):
+    """用foreach_set从拼接后的缓冲区直接创建网格数据"""
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(arrays['co']))
+    mesh.vertices.foreach_set("co", np.ascontiguousarray(arrays['co'], dtype=np.float32).ravel())
+    mesh.loops.add(len(arrays['loop_vidx']))
+    mesh.loops.foreach_set("vertex_index", np.ascontiguousarray(arrays['loop_vidx'], dtype=np.int32))
+    mesh.polygons.add(len(arrays['loop_start']))
+    mesh.polygons.foreach_set("loop_start", np.ascontiguousarray(arrays['loop_start'], dtype=np.int32))
+    try:
+        mesh.polygons.foreach_set("loop_total", np.ascontiguousarray(arrays['loop_total'], dtype=np.int32))
+    except (AttributeError, RuntimeError, TypeError):
+        pass  # Blender 4.x中loop_total只读，由loop_start推导
+    mesh.polygons.foreach_set("material_index", np.ascontiguousarray(arrays['mat_idx'], dtype=np.int32))
+
+    for material in materials:
+        mesh.materials.append(material)
+
+    if arrays.get('layers') is None and arrays.get('uv') is not None:
+        uv_layer = mesh.uv_layers.new(name="UVMap")
+        uv_layer.data.foreach_set("uv", np.ascontiguousarray(arrays['uv'], dtype=np.float32).ravel())
+
+    mesh.update(calc_edges=True)
+    if arrays.get('layers') is not None:
+        write_mesh_layers(mesh, arrays['layers'])
+    return mesh
+
+def material_parameters(material):
+    """材质的 (基础色RGBA, 粗糙度, 金属度) 数组，优先读取Principled BSDF节点
+
+    基础色连接了纹理等节点时返回None（不是纯色材质）。
+    """
+    color = list(material.diffuse_color)
+    roughness = material.roughness
+    metallic = material.metallic
+    if material.use_nodes and material.node_tree is not None:
+        for node in material.node_tree.nodes:
+            if node.type != 'BSDF_PRINCIPLED':
+                continue
+            if node.inputs['Base Color'].is_linked:
+                return None
+            color = list(node.inputs['Base Color'].default_value)
+            roughness = node.inputs['Roughness'].default_value
+            metallic = node.inputs['Metallic'].default_value
+            break
+    return np.array(color + [roughness, metallic], dtype=np.float64)
+
+def write_corner_colors(mesh, colors, name="Col"):
+    """把 (loops, 4) 线性颜色写入网格的面角颜色属性"""
+    colors = np.ascontiguousarray(colors, dtype=np.float32).ravel()
+    if hasattr(mesh, 'color_attributes'):
+        attribute = mesh.color_attributes.new(name=name, type='BYTE_COLOR', domain='CORNER')
+        mesh.color_attributes.active_color = attribute
+    else:
+        attribute = mesh.vertex_colors.new(name=name)
+    attribute.data.foreach_set("color", colors)
+    return attribute
+
+def polar_decompose(linear):
+    """3x3线性部分分解为 旋转 @ 对称拉伸，旋转部分保证det=+1（镜像归入拉伸）"""
+    u, sigma, vt = np.linalg.svd(linear)
+    if np.linalg.det(u @ vt) < 0:
+        u[:, -1] *= -1
+        sigma[-1] *= -1
+    return u @ vt, vt.T @ np.diag(sigma) @ vt
+
+def bake_linear_into_mesh(mesh, linear):
+    """将3x3线性变换直接乘入顶点数组（镜像时同时反转面环绕方向）"""
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    co = (co.reshape(-1, 3) @ linear.T).astype(np.float32)
+    mesh.vertices.foreach_set("co", co.ravel())
+    if np.linalg.det(linear) < 0:
+        if hasattr(mesh, 'flip_normals'):
+            mesh.flip_normals()
+        else:
+            bm = bmesh.new()
+            bm.from_mesh(mesh)
+            bmesh.ops.reverse_faces(bm, faces=bm.faces)
+            bm.to_mesh(mesh)
+            bm.free()
+    mesh.update()
+
+def apply_world_matrices(new_world, old_world):
+    """把目标世界矩阵写回对象，不依赖depsgraph更新
+
+    只重新求解自身或父级发生变化的对象的局部矩阵；old_world必须包含这些对象
+    及其父级的变换快照。
+    """
+    affected = set(new_world)
+    for obj in new_world:
+        affected.update(child for child in obj.children if child in old_world)
+    for obj in affected:
+        target = new_world.get(obj, old_world[obj])
+        if obj.parent is None:
+            obj.matrix_basis = Matrix(target.tolist())
+            continue
+        old_parent = old_world[obj.parent]
+        new_parent = new_world.get(obj.parent, old_parent)
+        old_local = matrix_to_numpy(obj.matrix_parent_inverse) @ matrix_to_numpy(obj.matrix_basis)
+        # 父级到子级之间的固定部分（骨骼父级时非单位阵）
+        bridge = np.linalg.inv(old_parent) @ old_world[obj] @ np.linalg.inv(old_local)
+        obj.matrix_parent_inverse = Matrix.Identity(4)
+        obj.matrix_basis = Matrix((np.linalg.inv(new_parent @ bridge) @ target).tolist())
+
+def normalize_object_transforms(objects, tolerance=1e-4):
+    """批量消除对象世界变换中的缩放/剪切，不调用bpy.ops
+
+    世界矩阵做极分解 A = R @ P：对象只保留刚体部分 [R|t]，网格对象的拉伸P
+    直接乘入顶点数组；共享网格按所需拉伸分组，必要时复制网格数据。
+    返回 {'objects': 修复的对象数, 'meshes': 改写的网格数, 'copies': 新复制的网格数}。
+    """
+    objects = list(objects)
+    world = {obj: matrix_to_numpy(obj.matrix_world) for obj in objects}
+    for obj in objects:
+        for child in obj.children:
+            world.setdefault(child, matrix_to_numpy(child.matrix_world))
+        if obj.parent is not None:
+            world.setdefault(obj.parent, matrix_to_numpy(obj.parent.matrix_world))
+
+    # 检测：线性部分不正交（缩放、剪切或镜像）的对象
+    new_world = {}
+    stretch = {}
+    for obj in objects:
+        linear = world[obj][:3, :3]
+        if np.allclose(linear.T @ linear, np.eye(3), atol=tolerance) and np.linalg.det(linear) > 0:
+            continue
+        if abs(np.linalg.det(linear)) < 1e-12:
+            print(f"    ! 跳过退化变换: {obj.name}")
+            continue
+        rotation, stretch[obj] = polar_decompose(linear)
+        rigid = world[obj].copy()
+        rigid[:3, :3] = rotation
+        new_world[obj] = rigid
+
+    if not new_world:
+        return {'objects': 0, 'meshes': 0, 'copies': 0}
+
+    apply_world_matrices(new_world, world)
+
+    # 网格数据：按每个使用者所需的拉伸分组，共享网格只在必要时复制
+    mesh_users = {}
+    for obj in bpy.data.objects:
+        if obj.type == 'MESH':
+            mesh_users.setdefault(obj.data, []).append(obj)
+
+    baked_meshes = 0
+    copies = 0
+    for mesh, users in mesh_users.items():
+        if not any(user in stretch for user in users):
+            continue
+        groups = {}
+        for user in users:
+            linear = stretch.get(user, np.eye(3))
+            groups.setdefault(np.round(linear, 6).tobytes(), (linear, []))[1].append(user)
+
+        identity_key = np.round(np.eye(3), 6).tobytes()
+        keep_key = identity_key if identity_key in groups else max(groups, key=lambda k: len(groups[k][1]))
+        for key, (linear, group_users) in groups.items():
+            if key == identity_key:
+                continue
+            if key == keep_key:
+                target_mesh = mesh
+            else:
+                target_mesh = mesh.copy()
+                copies += 1
+                for user in group_users:
+                    user.data = target_mesh
+            bake_linear_into_mesh(target_mesh, linear)
+            baked_meshes += 1
+
+    return {'objects': len(new_world), 'meshes': baked_meshes, 'copies': copies}
+
+# === link层级与惯量工具 ===
+
+# 会产生运动自由度的关节类型，其余（fixed或未设置）视为固定连接
+MOVABLE_JOINT_TYPES = ('revolute', 'continuous', 'prismatic', 'planar', 'floating')
+
+def collect_link_tree(scene):
+    """收集场景中的link层级，返回 (按父级在前排序的links, {link: 父link或None})"""
+    links = [obj for obj in scene.objects if is_link_object(obj)]
+    parent_links = {link: find_parent_link(link) for link in links}
+    
+    ordered = []
+    visited = set()
+    
+    def visit(link):
+        if link in visited:
+            return
+        visited.add(link)
+        parent = parent_links.get(link)
+        if parent is not None and parent in parent_links:
+            visit(parent)
+        ordered.append(link)
+    
+    for link in sorted(links, key=lambda obj: obj.name):
+        visit(link)
+    return ordered, parent_links
+
+def inertia_to_matrix(values):
+    """Phobos惯量列表 [ixx, ixy, ixz, iyy, iyz, izz] → 3x3对称矩阵"""
+    ixx, ixy, ixz, iyy, iyz, izz = (float(v) for v in values)
+    return np.array([[ixx, ixy, ixz], [ixy, iyy, iyz], [ixz, iyz, izz]])
+
+def matrix_to_inertia(matrix):
+    """3x3惯量矩阵 → Phobos惯量列表 [ixx, ixy, ixz, iyy, iyz, izz]"""
+    return [float(matrix[0, 0]), float(matrix[0, 1]), float(matrix[0, 2]),
+            float(matrix[1, 1]), float(matrix[1, 2]), float(matrix[2, 2])]
+
+def combine_inertials(items):
+    """按平行轴定理合并惯量
+
+    items为 [(质量, 世界质心(3,), 世界坐标系下绕自身质心的惯量(3, 3)), ...]，
+    返回 (总质量, 总质心, 世界坐标系下绕总质心的惯量)。
+    """
+    total_mass = sum(mass for mass, _, _ in items)
+    if total_mass <= 0:
+        return 0.0, np.zeros(3), np.zeros((3, 3))
+    com = sum(mass * np.asarray(center) for mass, center, _ in items) / total_mass
+    inertia = np.zeros((3, 3))
+    for mass, center, local in items:
+        d = np.asarray(center) - com
+        inertia += local + mass * (np.dot(d, d) * np.eye(3) - np.outer(d, d))
+    return total_mass, com, inertia
+
+# === 运动学与碰撞工具 ===
+
+def read_joint_limits(obj):
+    """读取关节上下限，兼容 joint/limits/* 与 joint/limit/* 两种格式"""
+    lower = obj.get("joint/limits/lower", obj.get("joint/limit/lower", None))
+    upper = obj.get("joint/limits/upper", obj.get("joint/limit/upper", None))
+    return lower, upper
+
+def get_model_name(scene, default="robot_model"):
+    """从Phobos导出设置中读取模型名称"""
+    try:
+        if hasattr(scene, 'phobosexportsettings'):
+            export_settings = scene.phobosexportsettings
+            if export_settings.rosPackageName:
+                return export_settings.rosPackageName
+            if export_settings.name:
+                return export_settings.name
+    except Exception:
+        pass
+    return default
+
+def axis_rotation_matrices(axis_index, angles):
+    """绕X/Y/Z轴的批量旋转矩阵 (N, 3, 3)"""
+    c, s = np.cos(angles), np.sin(angles)
+    i, j = [(1, 2), (2, 0), (0, 1)][axis_index]
+    rotation = np.zeros((len(angles), 3, 3))
+    rotation[:, axis_index, axis_index] = 1.0
+    rotation[:, i, i] = c
+    rotation[:, j, j] = c
+    rotation[:, i, j] = -s
+    rotation[:, j, i] = s
+    return rotation
+
+def euler_to_matrices(angles, order='XYZ'):
+    """批量欧拉角转旋转矩阵，与Blender的rotation_mode约定一致（先绕order[0]旋转）"""
+    rotation = np.broadcast_to(np.eye(3), (len(angles), 3, 3))
+    for axis_name in order:
+        column = 'XYZ'.index(axis_name)
+        rotation = axis_rotation_matrices(column, angles[:, column]) @ rotation
+    return rotation
+
+def quaternion_to_matrices(quaternions):
+    """批量四元数 (w, x, y, z) 转旋转矩阵"""
+    q = quaternions / np.linalg.norm(quaternions, axis=1, keepdims=True)
+    w, x, y, z = q.T
+    return np.stack([
+        np.stack([1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)], axis=1),
+        np.stack([2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)], axis=1),
+        np.stack([2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)], axis=1),
+    ], axis=1)
+
+def axis_angle_to_matrices(axis_angles):
+    """批量轴角 (angle, x, y, z) 转旋转矩阵"""
+    angle = axis_angles[:, 0]
+    half = angle / 2.0
+    axis = axis_angles[:, 1:]
+    norm = np.linalg.norm(axis, axis=1, keepdims=True)
+    axis = np.where(norm > 0, axis / np.where(norm > 0, norm, 1.0), [0.0, 0.0, 1.0])
+    return quaternion_to_matrices(np.column_stack([np.cos(half), axis * np.sin(half)[:, None]]))
+
+def action_fcurves(animation):
+    """动画数据当前动作中作用于该对象的F-curve
+
+    Blender 4.4起的分层动作按action_slot从各条带的channelbag读取，旧式动作读取action.fcurves。
+    """
+    action = animation.action
+    if action is None:
+        return []
+    if getattr(action, 'is_action_layered', False):
+        slot = getattr(animation, 'action_slot', None)
+        if slot is None:
+            return []
+        fcurves = []
+        for layer in action.layers:
+            for strip in layer.strips:
+                channelbag = strip.channelbag(slot) if hasattr(strip, 'channelbag') else None
+                if channelbag is not None:
+                    fcurves.extend(channelbag.fcurves)
+        return fcurves
+    return list(getattr(action, 'fcurves', ()))
+
+def joint_values_from_motion(motion, axis, prismatic):
+    """由link相对零位的运动 (N, 4, 4) 提取关节值：转动取绕轴角度，滑动取沿轴位移"""
+    if prismatic:
+        return motion[:, :3, 3] @ axis
+    rotation = motion[:, :3, :3]
+    skew = rotation - rotation.transpose(0, 2, 1)
+    sine = (skew[:, 2, 1] * axis[0] + skew[:, 0, 2] * axis[1] + skew[:, 1, 0] * axis[2]) / 2.0
+    cosine = (np.trace(rotation, axis1=1, axis2=2) - np.einsum('i,nij,j->n', axis, rotation, axis)) / 2.0
+    return np.unwrap(np.arctan2(sine, cosine))
+
+class KinematicModel:
+    """由link/joint属性和对象层级构建的运动学模型（只保存NumPy数据）
+
+    当前场景姿态作为零位：link世界位姿 = 父link位姿 @ rest @ 关节运动(q)。
+    """
+    
+    SUPPORTED_JOINTS = ('revolute', 'continuous', 'prismatic')
+    
+    def __init__(self, scene):
+        self.links, parent_links = collect_link_tree(scene)
+        index = {link: i for i, link in enumerate(self.links)}
+        count = len(self.links)
+        
+        self.names = [link.get('link/name', link.name) for link in self.links]
+        self.parent = np.array([index.get(parent_links[link], -1) for link in self.links], dtype=np.int64)
+        
+        world = np.array([matrix_to_numpy(link.matrix_world) for link in self.links]).reshape(-1, 4, 4)
+        # link坐标系只取刚体部分，缩放不影响关节坐标系
+        for i in range(count):
+            world[i, :3, :3] = polar_decompose(world[i, :3, :3])[0]
+        self.rest_world = world
+        self.rest = np.empty_like(world)
+        for i in range(count):
+            p = self.parent[i]
+            self.rest[i] = world[i] if p < 0 else np.linalg.inv(world[p]) @ world[i]
+        
+        # 可动关节：每个可动link对应一个关节变量
+        self.joint_index = np.full(count, -1, dtype=np.int64)
+        self.joint_links = []
+        self.joint_types = []
+        self.joint_names = []
+        axes, lower, upper = [], [], []
+        for i, link in enumerate(self.links):
+            joint_type = link.get('joint/type')
+            if self.parent[i] < 0 or joint_type not in self.SUPPORTED_JOINTS:
+                continue
+            axis = np.array(link.get('joint/axis', [0.0, 0.0, 1.0]), dtype=np.float64)
+            norm = np.linalg.norm(axis)
+            axis = axis / norm if norm > 0 else np.array([0.0, 0.0, 1.0])
+            lo, hi = read_joint_limits(link)
+            if joint_type == 'continuous' or lo is None or hi is None:
+                lo, hi = (-np.pi, np.pi) if joint_type != 'prismatic' else (-1.0, 1.0)
+            
+            self.joint_index[i] = len(self.joint_links)
+            self.joint_links.append(i)
+            self.joint_types.append(joint_type)
+            self.joint_names.append(link.get('joint/name', f"{self.names[i]}_joint"))
+            axes.append(axis)
+            lower.append(float(lo))
+            upper.append(float(hi))
+        
+        self.axes = np.array(axes, dtype=np.float64).reshape(-1, 3)
+        self.lower = np.array(lower, dtype=np.float64)
+        self.upper = np.array(upper, dtype=np.float64)
+        self.prismatic = np.array([t == 'prismatic' for t in self.joint_types], dtype=bool)
+    
+    @property
+    def dof(self):
+        return len(self.joint_links)
+    
+    def children_of(self, link_index):
+        """返回某link的直接子link索引"""
+        return [i for i in range(len(self.links)) if self.parent[i] == link_index]
+    
+    def subtree(self, link_index):
+        """返回以某link为根的子树（含自身）的link索引集合"""
+        members = {link_index}
+        # links按父级在前排序，一次遍历即可
+        for i in range(link_index + 1, len(self.links)):
+            if self.parent[i] in members:
+                members.add(i)
+        return members
+    
+    def sample_configurations(self, count, rng):
+        """在关节限制范围内均匀采样 (count, dof) 关节向量"""
+        return rng.uniform(self.lower, self.upper, size=(count, self.dof))
+    
+    def prepare_batch_terms(self):
+        """预计算批量正运动学用到的常量项（Rodrigues展开后的 R_rest、R_rest·K、R_rest·K²）"""
+        count = len(self.links)
+        self.rest_rotation = self.rest[:, :3, :3].copy()
+        self.rest_translation = self.rest[:, :3, 3].copy()
+        self.rest_k = np.zeros((count, 3, 3))
+        self.rest_k2 = np.zeros((count, 3, 3))
+        self.rest_axis = np.zeros((count, 3))
+        for i, joint in enumerate(self.joint_index):
+            if joint < 0:
+                continue
+            x, y, z = self.axes[joint]
+            k = np.array([[0, -z, y], [z, 0, -x], [-y, x, 0]])
+            self.rest_k[i] = self.rest_rotation[i] @ k
+            self.rest_k2[i] = self.rest_rotation[i] @ k @ k
+            self.rest_axis[i] = self.rest_rotation[i] @ self.axes[joint]
+    
+    def required_links(self, links):
+        """计算给定link所需的全部祖先link（按父级在前排序）"""
+        needed = set()
+        for i in links:
+            while i >= 0 and i not in needed:
+                needed.add(i)
+                i = self.parent[i]
+        return sorted(needed)
+    
+    def forward_kinematics(self, configurations, links=None):
+        """批量正运动学，不经过depsgraph
+
+        configurations为 (B, dof) 关节向量，返回 (B, n_links, 4, 4) 的link世界位姿；
+        指定links时只计算这些link及其祖先，并只返回这些link的位姿 (B, len(links), 4, 4)。
+        """
+        if not hasattr(self, 'rest_k'):
+            self.prepare_batch_terms()
+        configurations = np.atleast_2d(np.asarray(configurations, dtype=np.float64))
+        batch = len(configurations)
+        count = len(self.links)
+        order = range(count) if links is None else self.required_links(links)
+        
+        # 与关节值无关的link（如base及其固定子link）保持 (3,3)/(3,) 常量，不做批量运算
+        rotation = [None] * count
+        translation = [None] * count
+        for i in order:
+            joint = self.joint_index[i]
+            if joint < 0:
+                local_rotation = self.rest_rotation[i]
+                local_translation = self.rest_translation[i]
+            elif self.prismatic[joint]:
+                local_rotation = self.rest_rotation[i]
+                local_translation = self.rest_translation[i] + configurations[:, joint, None] * self.rest_axis[i]
+            else:
+                values = configurations[:, joint, None, None]
+                local_rotation = (self.rest_rotation[i] + np.sin(values) * self.rest_k[i]
+                                  + (1.0 - np.cos(values)) * self.rest_k2[i])
+                local_translation = self.rest_translation[i]
+            
+            p = self.parent[i]
+            if p < 0:
+                rotation[i] = local_rotation
+                translation[i] = local_translation
+            else:
+                rotation[i] = np.matmul(rotation[p], local_rotation)
+                translation[i] = np.matmul(rotation[p], local_translation[..., None])[..., 0] + translation[p]
+        
+        selected = list(range(count)) if links is None else list(links)
+        poses = np.zeros((batch, len(selected), 4, 4))
+        for column, i in enumerate(selected):
+            poses[:, column, :3, :3] = rotation[i]
+            poses[:, column, :3, 3] = translation[i]
+        poses[:, :, 3, 3] = 1.0
+        return poses
+    
+    def link_poses(self, q):
+        """单个关节向量下所有link的世界位姿 (n_links, 4, 4)"""
+        return self.forward_kinematics(np.asarray(q)[None])[0]
+
+class LinkCollisionModel:
+    """每个link在自身坐标系下的碰撞几何缓存：BVH、边集合和包围盒
+
+    碰撞测试时BVH不重建，只把另一link的边变换到本link坐标系做射线查询。
+    """
+    
+    def __init__(self, model, scene):
+        self.model = model
+        count = len(model.links)
+        self.trees = [None] * count
+        self.edges = [None] * count
+        self.bounds = np.zeros((count, 2, 3))
+        
+        geometry = {}
+        for obj in scene.objects:
+            if obj.type != 'MESH' or is_link_object(obj):
+                continue
+            link = find_parent_link(obj)
+            if link is None:
+                continue
+            kind = 'collision' if get_phobostype(obj) == 'collision' else 'visual'
+            geometry.setdefault(link, {}).setdefault(kind, []).append(obj)
+        
+        for i, link in enumerate(model.links):
+            objects = geometry.get(link, {})
+            objects = objects.get('collision') or objects.get('visual') or []
+            if objects:
+                self.build(i, objects)
+    
+    def build(self, i, objects):
+        """在link坐标系下拼接几何并构建BVH"""
+        arrays, _ = merge_objects_to_arrays(objects, self.model.rest_world[i])
+        co = arrays['co'].astype(np.float64)
+        if not len(arrays['loop_start']):
+            return
+        
+        loop_vidx = arrays['loop_vidx']
+        polygons = [loop_vidx[start:start + total].tolist()
+                    for start, total in zip(arrays['loop_start'].tolist(), arrays['loop_total'].tolist())]
+        self.trees[i] = BVHTree.FromPolygons(co.tolist(), polygons)
+        
+        # 面的每条边（去重）作为射线查询段
+        owner = np.repeat(np.arange(len(arrays['loop_start'])), arrays['loop_total'])
+        position = np.arange(len(owner)) - arrays['loop_start'][owner]
+        following = arrays['loop_start'][owner] + (position + 1) % arrays['loop_total'][owner]
+        edges = np.sort(np.stack([loop_vidx, loop_vidx[following]], axis=1), axis=1)
+        edges = np.unique(edges, axis=0)
+        self.edges[i] = co[edges]
+        self.bounds[i] = (co.min(axis=0), co.max(axis=0))
+    
+    def has_geometry(self, i):
+        return self.trees[i] is not None
+    
+    def world_bounds(self, poses):
+        """link包围盒在给定位姿下的世界AABB，poses形状为 (..., n_links, 4, 4)"""
+        lo, hi = self.bounds[:, 0], self.bounds[:, 1]
+        center = (lo + hi) / 2
+        half = (hi - lo) / 2
+        rotation = poses[..., :3, :3]
+        world_center = np.einsum('...ij,...j->...i', rotation, center) + poses[..., :3, 3]
+        world_half = np.einsum('...ij,...j->...i', np.abs(rotation), half)
+        return world_center - world_half, world_center + world_half
+    
+    def edges_hit(self, target, edges):
+        """target坐标系下的边段是否穿过target的几何表面"""
+        lo, hi = self.bounds[target]
+        seg_lo = edges.min(axis=1)
+        seg_hi = edges.max(axis=1)
+        mask = np.all((seg_lo <= hi) & (seg_hi >= lo), axis=1)
+        if not mask.any():
+            return False
+        
+        origins = edges[mask, 0]
+        directions = edges[mask, 1] - origins
+        lengths = np.linalg.norm(directions, axis=1)
+        valid = lengths > 1e-12
+        tree = self.trees[target]
+        for origin, direction, length in zip(origins[valid].tolist(),
+                                             (directions[valid] / lengths[valid, None]).tolist(),
+                                             lengths[valid].tolist()):
+            if tree.ray_cast(origin, direction, length)[0] is not None:
+                return True
+        return False
+    
+    def test_pairs(self, poses, pairs, mask=None):
+        """对link对 (M, 2) 做世界AABB粗筛和BVH精确测试，返回是否碰撞 (M,)"""
+        if mask is None:
+            mask = np.ones(len(pairs), dtype=bool)
+        lower, upper = self.world_bounds(poses)
+        a, b = pairs[:, 0], pairs[:, 1]
+        overlap = mask & np.all((lower[a] <= upper[b]) & (lower[b] <= upper[a]), axis=1)
+        
+        hit = np.zeros(len(pairs), dtype=bool)
+        for k in np.nonzero(overlap)[0]:
+            i, j = pairs[k]
+            hit[k] = self.collide(i, j, poses[i], poses[j])
+        return hit
+    
+    def collide(self, a, b, pose_a, pose_b):
+        """两个link在给定世界位姿下是否相交"""
+        a_to_b = np.linalg.inv(pose_b) @ pose_a
+        b_to_a = np.linalg.inv(pose_a) @ pose_b
+        edges_a = self.edges[a] @ a_to_b[:3, :3].T + a_to_b[:3, 3]
+        if self.edges_hit(b, edges_a):
+            return True
+        edges_b = self.edges[b] @ b_to_a[:3, :3].T + b_to_a[:3, 3]
+        return self.edges_hit(a, edges_b)
+
+def bulk_parent(children, parent):
+    """不经过bpy.ops直接批量设置父级，保持子对象的世界变换"""
+    parent_inverse = parent.matrix_world.inverted()
+    for child in children:
+        world = child.matrix_world.copy()
+        child.parent = parent
+        child.parent_type = 'OBJECT'
+        child.matrix_parent_inverse = parent_inverse
+        child.matrix_basis = world
+
+def sample_world_vertices(obj, max_count):
+    """按固定步长抽样网格顶点并变换到世界坐标"""
+    co = read_mesh_arrays(obj.data)['co'] if obj.type == 'MESH' else np.zeros((0, 3), np.float32)
+    if len(co) > max_count:
+        co = co[::int(np.ceil(len(co) / max_count))]
+    return transform_points(co.astype(np.float64), matrix_to_numpy(obj.matrix_world))
+
+class TemporaryExportEdits:
+    """导出期间的临时场景修改，restore()按相反顺序全部撤销"""
+
+    def __init__(self):
+        self._undo = []
+
+    def hide_object(self, obj):
+        """临时解除父级并从所有集合中移除对象，使其不参与导出"""
+        collections = list(obj.users_collection)
+        parent = obj.parent
+        parent_type = obj.parent_type
+        parent_bone = obj.parent_bone
+        parent_inverse = obj.matrix_parent_inverse.copy()
+        basis = obj.matrix_basis.copy()
+
+        obj.parent = None
+        for collection in collections:
+            collection.objects.unlink(obj)
+
+        def undo():
+            for collection in collections:
+                if obj.name not in collection.objects:
+                    collection.objects.link(obj)
+            obj.parent = parent
+            obj.parent_type = parent_type
+            obj.parent_bone = parent_bone
+            obj.matrix_parent_inverse = parent_inverse
+            obj.matrix_basis = basis
+        self._undo.append(undo)
+
+    def add_object(self, obj, collection):
+        """把临时对象加入集合，恢复时连同其网格数据一起删除"""
+        collection.objects.link(obj)
+
+        def undo():
+            data = obj.data
+            bpy.data.objects.remove(obj, do_unlink=True)
+            if isinstance(data, bpy.types.Mesh) and data.users == 0:
+                bpy.data.meshes.remove(data)
+        self._undo.append(undo)
+
+    def set_slot_materials(self, obj, materials):
+        """临时替换对象各材质槽的材质"""
+        previous = [slot.material for slot in obj.material_slots]
+        for slot, material in zip(obj.material_slots, materials):
+            slot.material = material
+        
+        def undo():
+            for slot, material in zip(obj.material_slots, previous):
+                slot.material = material
+        self._undo.append(undo)
+    
+    def replace_data(self, obj, data):
+        """临时替换对象的网格数据，恢复时删除临时网格"""
+        original = obj.data
+        obj.data = data
+        
+        def undo():
+            obj.data = original
+            if data.users == 0:
+                bpy.data.meshes.remove(data)
+        self._undo.append(undo)
+    
+    def add_material(self, material):
+        """登记临时材质，恢复时删除"""
+        def undo():
+            bpy.data.materials.remove(material)
+        self._undo.append(undo)
+    
+    def reparent_many(self, context, assignments):
+        """临时批量更换父级并保持世界变换，assignments为 [(对象, 新父级), ...]
+
+        骨骼父级会沿用到新父级骨架的第一根骨骼，父级逆矩阵在一次场景更新后统一求解。
+        """
+        worlds = []
+        for obj, parent in assignments:
+            world = obj.matrix_world.copy()
+            state = (obj.parent, obj.parent_type, obj.parent_bone,
+                     obj.matrix_parent_inverse.copy(), obj.matrix_basis.copy())
+            
+            parent_type = obj.parent_type
+            if parent_type in ('BONE', 'BONE_RELATIVE') and parent.type == 'ARMATURE' and parent.data.bones:
+                parent_bone = parent.data.bones[0].name
+            else:
+                parent_type, parent_bone = 'OBJECT', ""
+            obj.parent = parent
+            obj.parent_type = parent_type
+            obj.parent_bone = parent_bone
+            obj.matrix_parent_inverse = Matrix.Identity(4)
+            worlds.append((obj, world))
+            
+            def undo(obj=obj, state=state):
+                obj.parent, obj.parent_type, obj.parent_bone = state[0], state[1], state[2]
+                obj.matrix_parent_inverse = state[3]
+                obj.matrix_basis = state[4]
+            self._undo.append(undo)
+        
+        context.view_layer.update()
+        for obj, world in worlds:
+            # 当前 world' = X @ basis，求新的父级逆矩阵使世界变换不变
+            bridge = obj.matrix_world @ obj.matrix_basis.inverted()
+            obj.matrix_parent_inverse = bridge.inverted() @ world @ obj.matrix_basis.inverted()
+        context.view_layer.update()
+    
+    def restore(self):
+        """撤销所有临时修改"""
+        while self._undo:
+            undo = self._undo.pop()
+            try:
+                undo()
+            except Exception as e:
+                print(f"    ! 恢复临时修改失败: {e}")
+
+
+# === URDF解析与网格读取 ===
+
+# 二进制STL的三角形记录（50字节）
+STL_RECORD = np.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attribute', '<u2')])
+
+def parse_urdf_vector(text, default):
+    """解析以空格分隔的数值属性"""
+    if not text:
+        return list(default)
+    return [float(value) for value in text.split()]
+
+def parse_urdf_origin(element):
+    """<origin xyz rpy> → 4x4齐次矩阵（rpy即XYZ顺序欧拉角）"""
+    matrix = np.eye(4)
+    if element is None:
+        return matrix
+    rpy = parse_urdf_vector(element.get('rpy'), (0.0, 0.0, 0.0))
+    matrix[:3, :3] = euler_to_matrices(np.array([rpy], dtype=np.float64), 'XYZ')[0]
+    matrix[:3, 3] = parse_urdf_vector(element.get('xyz'), (0.0, 0.0, 0.0))
+    return matrix
+
+def parse_urdf_geometry(element):
+    """<geometry> → {'type': mesh/box/cylinder/sphere, 尺寸参数}"""
+    if element is None:
+        return None
+    for child in element:
+        if child.tag == 'mesh':
+            return {'type': 'mesh', 'filename': child.get('filename', ''),
+                    'scale': parse_urdf_vector(child.get('scale'), (1.0, 1.0, 1.0))}
+        if child.tag == 'box':
+            return {'type': 'box', 'size': parse_urdf_vector(child.get('size'), (1.0, 1.0, 1.0))}
+        if child.tag == 'cylinder':
+            return {'type': 'cylinder', 'radius': float(child.get('radius', 0.0)),
+                    'length': float(child.get('length', 0.0))}
+        if child.tag == 'sphere':
+            return {'type': 'sphere', 'radius': float(child.get('radius', 0.0))}
+    return None
+
+def parse_urdf_material(element):
+    """<material> → (名称, rgba或None)"""
+    if element is None:
+        return None
+    color = element.find('color')
+    rgba = parse_urdf_vector(color.get('rgba'), (1.0, 1.0, 1.0, 1.0)) if color is not None else None
+    return element.get('name', ''), rgba
+
+def parse_urdf_link(element):
+    """<link> → {'name', 'visuals', 'collisions', 'inertial'}"""
+    link = {'name': element.get('name'), 'visuals': [], 'collisions': [], 'inertial': None}
+    for kind in ('visual', 'collision'):
+        for child in element.findall(kind):
+            item = {
+                'name': child.get('name'),
+                'origin': parse_urdf_origin(child.find('origin')),
+                'geometry': parse_urdf_geometry(child.find('geometry')),
+            }
+            if kind == 'visual':
+                item['material'] = parse_urdf_material(child.find('material'))
+            link[kind + 's'].append(item)
+    
+    inertial = element.find('inertial')
+    if inertial is not None:
+        mass = inertial.find('mass')
+        inertia = inertial.find('inertia')
+        keys = ('ixx', 'ixy', 'ixz', 'iyy', 'iyz', 'izz')
+        link['inertial'] = {
+            'origin': parse_urdf_origin(inertial.find('origin')),
+            'mass': float(mass.get('value', 0.0)) if mass is not None else 0.0,
+            'inertia': [float(inertia.get(key, 0.0)) if inertia is not None else 0.0 for key in keys],
+        }
+    return link
+
+def parse_urdf_joint(element):
+    """<joint> → {'name', 'type', 'parent', 'child', 'origin', 'axis', 'limit', 'dynamics'}"""
+    parent = element.find('parent')
+    child = element.find('child')
+    axis = element.find('axis')
+    limit = element.find('limit')
+    dynamics = element.find('dynamics')
+    return {
+        'name': element.get('name'),
+        'type': element.get('type', 'fixed'),
+        'parent': parent.get('link') if parent is not None else None,
+        'child': child.get('link') if child is not None else None,
+        'origin': parse_urdf_origin(element.find('origin')),
+        'axis': parse_urdf_vector(axis.get('xyz') if axis is not None else None, (1.0, 0.0, 0.0)),
+        'limit': {key: float(value) for key, value in (limit.attrib.items() if limit is not None else ())
+                  if key in ('lower', 'upper', 'effort', 'velocity')},
+        'dynamics': {key: float(value) for key, value in (dynamics.attrib.items() if dynamics is not None else ())
+                     if key in ('damping', 'friction')},
+    }
+
+def parse_urdf(filepath):
+    """用iterparse流式解析URDF，每个顶层元素处理后立即释放
+
+    返回 {'name', 'materials': {名称: rgba}, 'links': [...], 'joints': [...]}；
+    transmission、gazebo等其他顶层元素被忽略。
+    """
+    import xml.etree.ElementTree as ET
+    robot = {'name': 'robot', 'materials': {}, 'links': [], 'joints': []}
+    root = None
+    depth = 0
+    for event, element in ET.iterparse(filepath, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if depth == 1:
+                root = element
+                robot['name'] = element.get('name', robot['name'])
+            continue
+        
+        depth -= 1
+        if depth != 1:
+            continue
+        if element.tag == 'link':
+            robot['links'].append(parse_urdf_link(element))
+        elif element.tag == 'joint':
+            robot['joints'].append(parse_urdf_joint(element))
+        elif element.tag == 'material':
+            name, rgba = parse_urdf_material(element)
+            if rgba is not None:
+                robot['materials'][name] = rgba
+        root.clear()
+    return robot
+
+def resolve_urdf_mesh_path(filename, urdf_dir):
+    """把 package:// / model:// / file:// 或相对路径解析为本地文件路径，找不到时返回None"""
+    import os
+    for scheme in ('package://', 'model://'):
+        if filename.startswith(scheme):
+            package, _, relative = filename[len(scheme):].partition('/')
+            # 从URDF所在目录逐级向上查找包目录
+            directory = urdf_dir
+            while True:
+                for candidate in (os.path.join(directory, package, relative), os.path.join(directory, relative)):
+                    if os.path.isfile(candidate):
+                        return candidate
+                parent = os.path.dirname(directory)
+                if parent == directory:
+                    return None
+                directory = parent
+    if filename.startswith('file://'):
+        filename = filename[len('file://'):]
+    path = filename if os.path.isabs(filename) else os.path.join(urdf_dir, filename)
+    return path if os.path.isfile(path) else None
+
+def read_stl_arrays(filepath):
+    """用NumPy读取STL（二进制或ASCII），焊接重复顶点后返回网格缓冲区字典"""
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    count = int.from_bytes(data[80:84], 'little') if len(data) >= 84 else 0
+    if len(data) == 84 + STL_RECORD.itemsize * count:
+        triangles = np.frombuffer(data, dtype=STL_RECORD, count=count, offset=84)['vertices'].reshape(-1, 3)
+    else:
+        text = data.decode('ascii', errors='ignore')
+        values = [line.split()[1:4] for line in text.splitlines() if line.lstrip().startswith('vertex')]
+        triangles = np.array(values, dtype=np.float32).reshape(-1, 3)
+    
+    # 按12字节整体去重，比按行排序更快（+0.0 把 -0.0 统一为 0.0）
+    triangles = np.ascontiguousarray(triangles, dtype=np.float32) + np.float32(0.0)
+    keys = triangles.view(np.dtype((np.void, triangles.dtype.itemsize * 3))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    face_count = len(triangles) // 3
+    return {
+        'co': triangles[first],
+        'loop_vidx': inverse.astype(np.int32).ravel(),
+        'loop_start': np.arange(0, face_count * 3, 3, dtype=np.int32),
+        'loop_total': np.full(face_count, 3, dtype=np.int32),
+        'mat_idx': np.zeros(face_count, dtype=np.int32),
+        'uv': None,
+    }
+
+def count_mesh_triangles(filepath):
+    """读取网格文件并返回三角形数量（STL/OBJ/DAE/GLB/glTF），无法识别的格式返回None"""
+    import os
+    import json
+    import xml.etree.ElementTree as ET
+    extension = os.path.splitext(filepath)[1].lower()
+    
+    if extension == '.stl':
+        with open(filepath, 'rb') as f:
+            data = f.read()
+        count = int.from_bytes(data[80:84], 'little') if len(data) >= 84 else 0
+        if len(data) == 84 + STL_RECORD.itemsize * count:
+            return count
+        return sum(1 for line in data.splitlines() if line.lstrip().startswith(b'facet'))
+    
+    if extension == '.obj':
+        triangles = 0
+        with open(filepath, 'rb') as f:
+            for line in f:
+                if line.startswith(b'f '):
+                    triangles += len(line.split()) - 3
+        return triangles
+    
+    if extension == '.dae':
+        triangles = 0
+        for _, element in ET.iterparse(filepath, events=('end',)):
+            tag = element.tag.rsplit('}', 1)[-1]
+            if tag == 'triangles':
+                triangles += int(element.get('count', 0))
+            elif tag == 'polylist':
+                vcount = next((child for child in element if child.tag.rsplit('}', 1)[-1] == 'vcount'), None)
+                if vcount is not None and vcount.text:
+                    triangles += int((np.array(vcount.text.split(), dtype=np.int64) - 2).clip(0).sum())
+            elif tag == 'polygons':
+                triangles += int(element.get('count', 0))
+            if tag in ('triangles', 'polylist', 'polygons'):
+                element.clear()
+        return triangles
+    
+    if extension in ('.glb', '.gltf'):
+        with open(filepath, 'rb') as f:
+            data = f.read()
+        if extension == '.glb':
+            if data[:4] != b'glTF':
+                raise ValueError("无效的GLB文件头")
+            length = int.from_bytes(data[12:16], 'little')
+            document = json.loads(data[20:20 + length])
+        else:
+            document = json.loads(data)
+        accessors = document.get('accessors', [])
+        triangles = 0
+        for mesh in document.get('meshes', []):
+            for primitive in mesh.get('primitives', []):
+                if primitive.get('mode', 4) != 4:
+                    continue
+                accessor = primitive.get('indices', primitive.get('attributes', {}).get('POSITION'))
+                if accessor is not None:
+                    triangles += accessors[accessor]['count'] // 3
+        return triangles
+    
+    return None
+
+def check_mesh_file(filepath):
+    """检查单个网格文件：存在、可读、三角形数量非零，返回 (路径, 三角形数量或None, 错误信息或None)"""
+    import os
+    if not os.path.isfile(filepath):
+        return filepath, None, "文件不存在"
+    try:
+        triangles = count_mesh_triangles(filepath)
+    except Exception as e:
+        return filepath, None, f"无法读取: {e}"
+    if triangles is None:
+        return filepath, None, "无法识别的网格格式"
+    if triangles <= 0:
+        return filepath, triangles, "三角形数量为0"
+    return filepath, triangles, None
+
+def find_urdf_files(directory):
+    """递归查找目录下的URDF文件，按修改时间从新到旧排序"""
+    import os
+    found = []
+    for root, _, files in os.walk(directory):
+        found.extend(os.path.join(root, name) for name in files if name.lower().endswith('.urdf'))
+    return sorted(found, key=os.path.getmtime, reverse=True)
+
+def verify_urdf_export(urdf_path, expected_links=None, expected_joints=None):
+    """校验导出的URDF：流式解析、并行检查所有引用的网格、与场景的link/joint数量比较
+
+    返回 {'robot', 'meshes': [(引用, 路径, 三角形数量, 错误)], 'errors': [...], 'warnings': [...]}。
+    """
+    import os
+    from concurrent.futures import ThreadPoolExecutor
+    
+    robot = parse_urdf(urdf_path)
+    urdf_dir = os.path.dirname(urdf_path)
+    errors, warnings = [], []
+    
+    # 同一网格文件只检查一次
+    references = {}
+    for link in robot['links']:
+        for item in link['visuals'] + link['collisions']:
+            geometry = item['geometry']
+            if geometry is None:
+                errors.append(f"link {link['name']}: 缺少geometry")
+            elif geometry['type'] == 'mesh':
+                references.setdefault(geometry['filename'], []).append(link['name'])
+    
+    resolved = {filename: resolve_urdf_mesh_path(filename, urdf_dir) for filename in references}
+    for filename, path in resolved.items():
+        if path is None:
+            errors.append(f"网格不存在: {filename}（{', '.join(sorted(set(references[filename])))}）")
+    
+    existing = {filename: path for filename, path in resolved.items() if path is not None}
+    with ThreadPoolExecutor() as executor:
+        results = dict(zip(existing, executor.map(check_mesh_file, existing.values())))
+    
+    meshes = []
+    for filename, (path, triangles, error) in results.items():
+        meshes.append((filename, path, triangles, error))
+        if error:
+            errors.append(f"{filename}: {error}")
+    
+    # 结构检查
+    link_names = [link['name'] for link in robot['links']]
+    if len(set(link_names)) != len(link_names):
+        errors.append("存在重名link")
+    known = set(link_names)
+    children = set()
+    for joint in robot['joints']:
+        for end in ('parent', 'child'):
+            if joint[end] not in known:
+                errors.append(f"关节 {joint['name']}: {end} link '{joint[end]}' 不存在")
+        if joint['child'] in children:
+            errors.append(f"link '{joint['child']}' 有多个父关节")
+        children.add(joint['child'])
+    roots = known - children
+    if len(roots) != 1:
+        errors.append(f"根link数量为 {len(roots)}（应为1）: {', '.join(sorted(roots))}")
+    
+    if expected_links is not None and expected_links != len(robot['links']):
+        warnings.append(f"link数量不一致: URDF {len(robot['links'])} / 场景 {expected_links}")
+    if expected_joints is not None and expected_joints != len(robot['joints']):
+        warnings.append(f"关节数量不一致: URDF {len(robot['joints'])} / 场景 {expected_joints}")
+    
+    return {'robot': robot, 'meshes': meshes, 'errors': errors, 'warnings': warnings}
+
+def scene_link_joint_counts(scene):
+    """场景索引中的link数量和关节数量（有父link的link各对应一个关节）"""
+    links, parent_links = collect_link_tree(scene)
+    return len(links), sum(1 for link in links if parent_links.get(link) is not None)
+
+def report_urdf_verification(urdf_path, scene, expected=None):
+    """校验URDF并在控制台输出结果，返回 (错误列表, 警告列表)
+    
+    expected为 (link数量, 关节数量)，省略时按当前场景统计
+    """
+    import time
+    start_time = time.time()
+    expected_links, expected_joints = expected or scene_link_joint_counts(scene)
+    result = verify_urdf_export(urdf_path, expected_links, expected_joints)
+    robot = result['robot']
+    
+    print(f"  校验URDF: {urdf_path}")
+    print(f"    link: {len(robot['links'])}, 关节: {len(robot['joints'])}, 网格文件: {len(result['meshes'])}")
+    triangles = sum(t for _, _, t, error in result['meshes'] if not error)
+    print(f"    三角形总数: {triangles}")
+    for error in result['errors']:
+        print(f"    ✗ {error}")
+    for warning in result['warnings']:
+        print(f"    ! {warning}")
+    if not result['errors']:
+        print(f"    ✓ 校验通过 ({time.time() - start_time:.2f} 秒)")
+    return result['errors'], result['warnings']
+
+def diff_urdf(path_a, path_b, tolerance=1e-6):
+    """比较两个URDF的结构差异，返回差异描述列表"""
+    robot_a, robot_b = parse_urdf(path_a), parse_urdf(path_b)
+    differences = []
+    
+    def compare_names(kind, items_a, items_b):
+        names_a, names_b = set(items_a), set(items_b)
+        for name in sorted(names_a - names_b):
+            differences.append(f"- {kind} {name}")
+        for name in sorted(names_b - names_a):
+            differences.append(f"+ {kind} {name}")
+        return sorted(names_a & names_b)
+    
+    def close(a, b):
+        return np.allclose(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64), atol=tolerance)
+    
+    links_a = {link['name']: link for link in robot_a['links']}
+    links_b = {link['name']: link for link in robot_b['links']}
+    for name in compare_names("link", links_a, links_b):
+        a, b = links_a[name], links_b[name]
+        for kind in ('visuals', 'collisions'):
+            geometry_a = [(item['geometry'] or {}).get('type') for item in a[kind]]
+            geometry_b = [(item['geometry'] or {}).get('type') for item in b[kind]]
+            if geometry_a != geometry_b:
+                differences.append(f"~ link {name} {kind}: {geometry_a} → {geometry_b}")
+            else:
+                for item_a, item_b in zip(a[kind], b[kind]):
+                    if not close(item_a['origin'], item_b['origin']):
+                        differences.append(f"~ link {name} {kind} origin 不同")
+                        break
+        inertial_a, inertial_b = a['inertial'], b['inertial']
+        if (inertial_a is None) != (inertial_b is None):
+            differences.append(f"~ link {name} inertial: {'有' if inertial_a else '无'} → {'有' if inertial_b else '无'}")
+        elif inertial_a is not None:
+            if not close(inertial_a['mass'], inertial_b['mass']):
+                differences.append(f"~ link {name} mass: {inertial_a['mass']:.6g} → {inertial_b['mass']:.6g}")
+            if not close(inertial_a['inertia'], inertial_b['inertia']) or not close(inertial_a['origin'], inertial_b['origin']):
+                differences.append(f"~ link {name} inertia/质心 不同")
+    
+    joints_a = {joint['name']: joint for joint in robot_a['joints']}
+    joints_b = {joint['name']: joint for joint in robot_b['joints']}
+    for name in compare_names("joint", joints_a, joints_b):
+        a, b = joints_a[name], joints_b[name]
+        for key in ('type', 'parent', 'child'):
+            if a[key] != b[key]:
+                differences.append(f"~ joint {name} {key}: {a[key]} → {b[key]}")
+        if not close(a['axis'], b['axis']):
+            differences.append(f"~ joint {name} axis: {a['axis']} → {b['axis']}")
+        if not close(a['origin'], b['origin']):
+            differences.append(f"~ joint {name} origin 不同")
+        for key in sorted(set(a['limit']) | set(b['limit'])):
+            value_a, value_b = a['limit'].get(key), b['limit'].get(key)
+            if value_a is None or value_b is None or not close(value_a, value_b):
+                differences.append(f"~ joint {name} limit.{key}: {value_a} → {value_b}")
+    return differences
+
+# === 模型快照与网格写出（MJCF/SDF等导出器共享） ===
+
+def triangulate_arrays(arrays):
+    """多边形扇形三角化，返回 ((T, 3) 顶点索引, (T,) 所属多边形索引)"""
+    total = arrays['loop_total'].astype(np.int64)
+    start = arrays['loop_start'].astype(np.int64)
+    counts = np.clip(total - 2, 0, None)
+    polygon = np.repeat(np.arange(len(total)), counts)
+    # 每个三角形在所属多边形内的序号 0..n-3
+    offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    first = start[polygon]
+    loops = np.stack([first, first + offset + 1, first + offset + 2], axis=1)
+    return arrays['loop_vidx'][loops].astype(np.int32), polygon
+
+def write_binary_stl(filepath, co, triangles):
+    """用NumPy结构化数组一次性写出二进制STL"""
+    corners = np.asarray(co, dtype=np.float32)[triangles]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    length = np.linalg.norm(normals, axis=1, keepdims=True)
+    normals = np.divide(normals, length, out=np.zeros_like(normals), where=length > 0)
+    
+    records = np.zeros(len(triangles), dtype=STL_RECORD)
+    records['normal'] = normals
+    records['vertices'] = corners
+    with open(filepath, 'wb') as f:
+        f.write(b'Binary STL written by URDF Tools'.ljust(80, b' '))
+        f.write(np.uint32(len(records)).tobytes())
+        records.tofile(f)
+
+def write_glb(filepath, co, triangles, material_index=None, materials=(), quantize=False):
+    """用NumPy写出二进制glTF（GLB）
+
+    co为Blender坐标（Z向上），顶点按glTF约定写为Y向上，节点上再绕X轴旋转+90°转回，
+    应用节点变换后的坐标与STL/DAE一致（URDF把网格坐标当作link坐标系坐标）。
+    每个材质一个primitive，共享同一个POSITION访问器。法线省略（按规范由读取端计算平面法线）。
+    materials为 (名称, [R, G, B, A, 粗糙度, 金属度]) 列表（与material_parameters一致）。
+    quantize=True时位置量化为uint16（KHR_mesh_quantization），反量化的缩放与平移写在节点上。
+    """
+    import json
+    co = np.asarray(co, dtype=np.float32)
+    positions = np.ascontiguousarray(np.stack([co[:, 0], co[:, 2], -co[:, 1]], axis=1)) if len(co) else co.reshape(0, 3)
+    triangles = np.asarray(triangles).reshape(-1, 3)
+    if material_index is None:
+        material_index = np.zeros(len(triangles), dtype=np.int32)
+    
+    chunks = []
+    views = []
+    accessors = []
+    
+    def add_view(data, target, stride=None):
+        offset = sum(len(chunk) for chunk in chunks)
+        raw = data.tobytes()
+        chunks.append(raw + b'\0' * (-len(raw) % 4))
+        view = {'buffer': 0, 'byteOffset': offset, 'byteLength': len(raw), 'target': target}
+        if stride:
+            view['byteStride'] = stride
+        views.append(view)
+        return len(views) - 1
+    
+    # Y向上 → Z向上：(x, y, z) → (x, -z, y)
+    half = float(np.sqrt(0.5))
+    node = {'mesh': 0, 'rotation': [half, 0.0, 0.0, half]}
+    extensions = []
+    if quantize and len(positions):
+        low = positions.min(axis=0)
+        extent = positions.max(axis=0) - low
+        step = np.where(extent > 0, extent / 65535.0, 1.0)
+        quantized = np.zeros((len(positions), 4), dtype=np.uint16)  # 顶点属性步长须为4字节的倍数
+        quantized[:, :3] = np.rint((positions - low) / step)
+        view = add_view(quantized, 34962, stride=8)
+        accessors.append({'bufferView': view, 'componentType': 5123, 'count': len(positions), 'type': 'VEC3',
+                          'min': quantized[:, :3].min(axis=0).tolist(), 'max': quantized[:, :3].max(axis=0).tolist()})
+        # 节点变换为 T·R·S，平移在旋转之后，需写入旋转后的偏移
+        node['translation'] = [float(low[0]), float(-low[2]), float(low[1])]
+        node['scale'] = step.tolist()
+        extensions.append("KHR_mesh_quantization")
+    else:
+        view = add_view(positions, 34962)
+        accessors.append({'bufferView': view, 'componentType': 5126, 'count': len(positions), 'type': 'VEC3',
+                          'min': (positions.min(axis=0) if len(positions) else np.zeros(3)).tolist(),
+                          'max': (positions.max(axis=0) if len(positions) else np.zeros(3)).tolist()})
+    
+    index_type, component = (np.uint16, 5123) if len(positions) < 65536 else (np.uint32, 5125)
+    primitives = []
+    used = np.unique(material_index)
+    for slot in used:
+        indices = triangles[material_index == slot].astype(index_type).ravel()
+        view = add_view(indices, 34963)
+        accessors.append({'bufferView': view, 'componentType': component, 'count': len(indices), 'type': 'SCALAR'})
+        primitive = {'attributes': {'POSITION': 0}, 'indices': len(accessors) - 1, 'mode': 4}
+        if 0 <= slot < len(materials):
+            primitive['material'] = int(slot)
+        primitives.append(primitive)
+    
+    document = {
+        'asset': {'version': "2.0", 'generator': "URDF Tools"},
+        'scene': 0,
+        'scenes': [{'nodes': [0]}],
+        'nodes': [node],
+        'meshes': [{'primitives': primitives}],
+        'buffers': [{'byteLength': sum(len(chunk) for chunk in chunks)}],
+        'bufferViews': views,
+        'accessors': accessors,
+    }
+    if materials:
+        document['materials'] = [
+            {'name': name, 'pbrMetallicRoughness': {'baseColorFactor': [float(v) for v in parameters[:4]],
+                                                    'roughnessFactor': float(parameters[4]),
+                                                    'metallicFactor': float(parameters[5])}}
+            for name, parameters in materials]
+    if extensions:
+        document['extensionsUsed'] = extensions
+        document['extensionsRequired'] = extensions
+    
+    header = json.dumps(document, separators=(',', ':')).encode('utf-8')
+    header += b' ' * (-len(header) % 4)
+    binary = b''.join(chunks)
+    with open(filepath, 'wb') as f:
+        f.write(np.array([0x46546C67, 2, 12 + 8 + len(header) + 8 + len(binary)], dtype='<u4').tobytes())
+        f.write(np.array([len(header), 0x4E4F534A], dtype='<u4').tobytes())
+        f.write(header)
+        f.write(np.array([len(binary), 0x004E4942], dtype='<u4').tobytes())
+        f.write(binary)
+
+COLLADA_NAMESPACE = "http://www.collada.org/2005/11/COLLADASchema"
+MESH_ATTRIBUTES = ('NORMAL', 'TEXCOORD', 'COLOR')
+
+def format_decimals(values, decimals):
+    """按固定小数位数取整并格式化（去掉末尾的0），返回字符串数组"""
+    values = np.round(np.asarray(values, dtype=np.float64), decimals) + 0.0
+    text = np.char.mod(f"%.{decimals}f", values)
+    return np.char.rstrip(np.char.rstrip(text, '0'), '.')
+
+def weld_positions(co, decimals):
+    """取整后合并重复顶点，返回 (取整后的唯一顶点, 原索引→新索引)，顶点保持首次出现的顺序"""
+    rounded = np.round(np.asarray(co, dtype=np.float64), decimals) + 0.0
+    if not len(rounded):
+        return rounded, np.zeros(0, dtype=np.int64)
+    _, first, inverse = np.unique(rounded, axis=0, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return rounded[first[order]], rank[inverse.reshape(-1)]
+
+def optimize_obj_text(text, drop, decimals, weld):
+    """精简OBJ文本：去掉drop中的属性（NORMAL/TEXCOORD/COLOR）、按小数位数取整、焊接重复顶点"""
+    counts = {'v': 0, 'vt': 0, 'vn': 0}
+    rows = []
+    entries = []
+    
+    def resolve(token, kind):
+        index = int(token)
+        return index if index > 0 else counts[kind] + index + 1
+    
+    for line in text.splitlines():
+        keyword = line.split(None, 1)[0] if line.strip() else ''
+        if keyword == 'v':
+            counts['v'] += 1
+            rows.append(line.split()[1:])
+            if len(rows) == 1:
+                entries.append(('v', None))
+        elif keyword in ('vt', 'vn'):
+            counts[keyword] += 1
+            if ('TEXCOORD' if keyword == 'vt' else 'NORMAL') in drop:
+                continue
+            values = line.split()[1:]
+            entries.append(('', f"{keyword} " + " ".join(format_decimals(np.array(values, dtype=np.float64), decimals))))
+        elif keyword == 'f':
+            corners = []
+            for token in line.split()[1:]:
+                parts = token.split('/') + ['', '']
+                corners.append((resolve(parts[0], 'v'),
+                                resolve(parts[1], 'vt') if parts[1] and 'TEXCOORD' not in drop else None,
+                                resolve(parts[2], 'vn') if parts[2] and 'NORMAL' not in drop else None))
+            entries.append(('f', corners))
+        else:
+            entries.append(('', line))
+    
+    co = np.array([row[:3] for row in rows], dtype=np.float64).reshape(-1, 3)
+    colors = [row[3:6] for row in rows] if 'COLOR' not in drop and any(len(row) >= 6 for row in rows) else None
+    if weld and colors is None:
+        co, remap = weld_positions(co, decimals)
+    else:
+        remap = np.arange(len(co))
+    
+    formatted = format_decimals(co, decimals)
+    vertex_lines = []
+    for index, row in enumerate(formatted):
+        extra = "" if colors is None or len(colors[index]) < 3 else " " + " ".join(
+            format_decimals(np.array(colors[index], dtype=np.float64), decimals))
+        vertex_lines.append("v " + " ".join(row) + extra)
+    
+    output = []
+    for kind, payload in entries:
+        if kind == 'v':
+            output.extend(vertex_lines)
+        elif kind == 'f':
+            corners = []
+            for vertex, uv, normal in payload:
+                vertex = int(remap[vertex - 1]) + 1
+                # 焊接后相邻重复的顶点会产生退化面
+                if corners and corners[-1][0] == vertex:
+                    continue
+                corners.append((vertex, uv, normal))
+            if len(corners) > 1 and corners[0][0] == corners[-1][0]:
+                corners.pop()
+            if len(corners) < 3:
+                continue
+            tokens = []
+            for vertex, uv, normal in corners:
+                if normal is not None:
+                    tokens.append(f"{vertex}/{'' if uv is None else uv}/{normal}")
+                elif uv is not None:
+                    tokens.append(f"{vertex}/{uv}")
+                else:
+                    tokens.append(str(vertex))
+            output.append("f " + " ".join(tokens))
+        else:
+            output.append(payload)
+    return "\n".join(output) + "\n"
+
+def collapse_welded_corners(vertex, vcount):
+    """去掉面内首尾相接重复的顶点，返回 (保留的角点掩码, 新的每面顶点数)，不足3个顶点的面整面去掉"""
+    owner = np.repeat(np.arange(len(vcount)), vcount)
+    start = np.concatenate(([0], np.cumsum(vcount)[:-1])).astype(np.int64)
+    position = np.arange(len(owner)) - start[owner]
+    previous = start[owner] + (position - 1) % vcount[owner]
+    keep = vertex != vertex[previous]
+    counts = np.bincount(owner, weights=keep, minlength=len(vcount)).astype(np.int64)
+    keep &= (counts >= 3)[owner]
+    return keep, counts[counts >= 3]
+
+def optimize_dae_tree(tree, drop, decimals, weld):
+    """精简COLLADA元素树：去掉drop中的输入及其数据源、按小数位数取整、焊接重复顶点"""
+    q = lambda tag: f"{{{COLLADA_NAMESPACE}}}{tag}"
+    root = tree.getroot()
+    
+    for mesh in root.iter(q('mesh')):
+        sources = {source.get('id'): source for source in mesh.findall(q('source'))}
+        vertices = mesh.find(q('vertices'))
+        remap = None
+        if vertices is not None:
+            for element in list(vertices.findall(q('input'))):
+                if element.get('semantic') in drop:
+                    vertices.remove(element)
+            vertex_inputs = vertices.findall(q('input'))
+            position = next((element for element in vertex_inputs if element.get('semantic') == 'POSITION'), None)
+            # 只有POSITION是逐顶点数据时才能焊接
+            if weld and position is not None and len(vertex_inputs) == 1:
+                source = sources.get(position.get('source', '').lstrip('#'))
+                array = source.find(q('float_array')) if source is not None else None
+                if array is not None and array.text:
+                    co, remap = weld_positions(np.array(array.text.split(), dtype=np.float64).reshape(-1, 3), decimals)
+                    array.text = " ".join(format_decimals(co, decimals).ravel())
+                    array.set('count', str(co.size))
+                    accessor = source.find(f"{q('technique_common')}/{q('accessor')}")
+                    if accessor is not None:
+                        accessor.set('count', str(len(co)))
+        
+        for primitive in mesh:
+            inputs = primitive.findall(q('input'))
+            if primitive.tag == q('vertices') or not inputs:
+                continue
+            stride = max(int(element.get('offset', 0)) for element in inputs) + 1
+            for element in inputs:
+                if element.get('semantic') in drop:
+                    primitive.remove(element)
+            kept = primitive.findall(q('input'))
+            offsets = sorted({int(element.get('offset', 0)) for element in kept})
+            vertex_offset = next((int(element.get('offset', 0)) for element in kept
+                                  if element.get('semantic') == 'VERTEX'), None)
+            for element in kept:
+                element.set('offset', str(offsets.index(int(element.get('offset', 0)))))
+            # 焊接后顶点重复的面是退化面；strip/fan类图元的顶点顺序有含义，不做处理
+            collapse = (remap is not None and vertex_offset is not None
+                        and primitive.tag in (q('triangles'), q('polylist'), q('polygons')))
+            vcount_element = primitive.find(q('vcount'))
+            faces = 0
+            for p in primitive.findall(q('p')):
+                if not p.text:
+                    continue
+                indices = np.array(p.text.split(), dtype=np.int64).reshape(-1, stride)
+                if remap is not None and vertex_offset is not None:
+                    indices[:, vertex_offset] = remap[indices[:, vertex_offset]]
+                if collapse:
+                    if primitive.tag == q('triangles'):
+                        vcount = np.full(len(indices) // 3, 3, dtype=np.int64)
+                    elif primitive.tag == q('polylist') and vcount_element is not None and vcount_element.text:
+                        vcount = np.array(vcount_element.text.split(), dtype=np.int64)
+                    else:
+                        vcount = np.array([len(indices)], dtype=np.int64)
+                    keep, vcount = collapse_welded_corners(indices[:, vertex_offset], vcount)
+                    indices = indices[keep]
+                    faces += len(vcount)
+                    if primitive.tag == q('polylist') and vcount_element is not None:
+                        vcount_element.text = " ".join(vcount.astype(str))
+                    elif primitive.tag == q('polygons') and not len(vcount):
+                        # <polygons>中每个<p>是一个面
+                        primitive.remove(p)
+                        continue
+                p.text = " ".join(indices[:, offsets].ravel().astype(str))
+            if collapse:
+                primitive.set('count', str(faces))
+        
+        referenced = set()
+        for element in mesh.iter(q('input')):
+            referenced.add(element.get('source', '').lstrip('#'))
+        for identifier, source in sources.items():
+            if identifier not in referenced:
+                mesh.remove(source)
+            else:
+                array = source.find(q('float_array'))
+                if array is not None and array.text:
+                    array.text = " ".join(format_decimals(np.array(array.text.split(), dtype=np.float64), decimals))
+    
+    if 'TEXCOORD' in drop:
+        for material in root.iter(q('instance_material')):
+            for element in list(material.findall(q('bind_vertex_input'))):
+                if element.get('input_semantic') == 'TEXCOORD':
+                    material.remove(element)
+    return tree
+
+MTL_TEXTURE_KEYWORDS = ('map_', 'bump', 'disp', 'decal', 'refl')
+TEXTURE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tga', '.bmp', '.tif', '.tiff', '.exr', '.hdr', '.webp')
+
+def file_sha1(filepath, block_size=1 << 20):
+    """分块计算文件内容的SHA1"""
+    import hashlib
+    digest = hashlib.sha1()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def texture_cache_directory():
+    """跨导出共享的纹理缓存目录"""
+    import os
+    import tempfile
+    try:
+        return bpy.utils.user_resource('DATAFILES', path=os.path.join("urdf_tools", "texture_cache"), create=True)
+    except Exception:
+        directory = os.path.join(tempfile.gettempdir(), "urdf_tools_texture_cache")
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+def collect_texture_references(directory):
+    """查找导出目录中DAE（<init_from>）和MTL（map_*）引用的纹理
+
+    返回 {引用文件: [(引用字符串, 本地路径), ...]}，找不到的纹理不列出。
+    """
+    import os
+    import xml.etree.ElementTree as ET
+    from urllib.parse import unquote
+    references = {}
+    for folder, _, filenames in os.walk(directory):
+        for filename in filenames:
+            owner = os.path.join(folder, filename)
+            extension = os.path.splitext(filename)[1].lower()
+            found = []
+            if extension == '.dae':
+                try:
+                    root = ET.parse(owner).getroot()
+                except ET.ParseError:
+                    continue
+                for element in root.iter(f"{{{COLLADA_NAMESPACE}}}init_from"):
+                    found.append((element.text or "").strip())
+            elif extension == '.mtl':
+                with open(owner, 'r', encoding='utf-8', errors='replace') as f:
+                    for line in f:
+                        tokens = line.split()
+                        if len(tokens) >= 2 and tokens[0].startswith(MTL_TEXTURE_KEYWORDS):
+                            found.append(tokens[-1])
+            items = []
+            for reference in found:
+                if not reference.lower().endswith(TEXTURE_EXTENSIONS):
+                    continue
+                path = unquote(reference[7:] if reference.startswith('file://') else reference)
+                if not os.path.isabs(path):
+                    path = os.path.join(folder, path)
+                if os.path.isfile(path):
+                    items.append((reference, os.path.normpath(path)))
+            if items:
+                references[owner] = items
+    return references
+
+def rewrite_texture_references(owner, mapping):
+    """把引用文件中的纹理引用按 {旧引用: 新引用} 替换"""
+    import os
+    with open(owner, 'r', encoding='utf-8') as f:
+        text = f.read()
+    if os.path.splitext(owner)[1].lower() == '.dae':
+        for old, new in mapping.items():
+            text = text.replace(f">{old}<", f">{new}<")
+    else:
+        lines = []
+        for line in text.split("\n"):
+            tokens = line.split()
+            if len(tokens) >= 2 and tokens[0].startswith(MTL_TEXTURE_KEYWORDS) and tokens[-1] in mapping:
+                line = line.rstrip()
+                line = line[:len(line) - len(tokens[-1])] + mapping[tokens[-1]]
+            lines.append(line)
+        text = "\n".join(lines)
+    with open(owner, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+def encode_texture(source, target_stem, max_size, file_format='JPEG', quality=85):
+    """用Blender图像API缩小并重新编码纹理（需在主线程调用）
+
+    带透明通道的图像始终写为PNG。返回 (写出的路径, 原尺寸, 新尺寸)。
+    """
+    image = bpy.data.images.load(source, check_existing=False)
+    try:
+        width, height = image.size
+        size = (width, height)
+        if max(width, height) > max_size:
+            factor = max_size / max(width, height)
+            size = (max(1, round(width * factor)), max(1, round(height * factor)))
+            image.scale(*size)
+        # 8/16位及浮点RGBA
+        if file_format == 'PNG' or image.depth in (32, 64, 128):
+            file_format, extension = 'PNG', '.png'
+        else:
+            extension = '.jpg'
+        target = target_stem + extension
+        image.filepath_raw = target
+        image.file_format = file_format
+        try:
+            image.save(quality=quality)
+        except TypeError:
+            # 旧版本Blender的save()不接受参数
+            image.save()
+        return target, (width, height), size
+    finally:
+        bpy.data.images.remove(image)
+
+def rotation_to_quaternion(rotation):
+    """3x3旋转矩阵 → 四元数 (w, x, y, z)"""
+    m = rotation
+    trace = m[0, 0] + m[1, 1] + m[2, 2]
+    if trace > 0:
+        s = 2.0 * np.sqrt(trace + 1.0)
+        q = [0.25 * s, (m[2, 1] - m[1, 2]) / s, (m[0, 2] - m[2, 0]) / s, (m[1, 0] - m[0, 1]) / s]
+    elif m[0, 0] > m[1, 1] and m[0, 0] > m[2, 2]:
+        s = 2.0 * np.sqrt(1.0 + m[0, 0] - m[1, 1] - m[2, 2])
+        q = [(m[2, 1] - m[1, 2]) / s, 0.25 * s, (m[0, 1] + m[1, 0]) / s, (m[0, 2] + m[2, 0]) / s]
+    elif m[1, 1] > m[2, 2]:
+        s = 2.0 * np.sqrt(1.0 + m[1, 1] - m[0, 0] - m[2, 2])
+        q = [(m[0, 2] - m[2, 0]) / s, (m[0, 1] + m[1, 0]) / s, 0.25 * s, (m[1, 2] + m[2, 1]) / s]
+    else:
+        s = 2.0 * np.sqrt(1.0 + m[2, 2] - m[0, 0] - m[1, 1])
+        q = [(m[1, 0] - m[0, 1]) / s, (m[0, 2] + m[2, 0]) / s, (m[1, 2] + m[2, 1]) / s, 0.25 * s]
+    q = np.array(q)
+    return q if q[0] >= 0 else -q
+
+def rotation_to_rpy(rotation):
+    """3x3旋转矩阵 → URDF/SDF的 roll pitch yaw（XYZ顺序欧拉角）"""
+    pitch = np.arcsin(np.clip(-rotation[2, 0], -1.0, 1.0))
+    if abs(rotation[2, 0]) < 1.0 - 1e-9:
+        roll = np.arctan2(rotation[2, 1], rotation[2, 2])
+        yaw = np.arctan2(rotation[1, 0], rotation[0, 0])
+    else:
+        # 万向锁：roll取0，全部归入yaw
+        roll = 0.0
+        yaw = np.arctan2(-rotation[0, 1], rotation[1, 1])
+    return np.array([roll, pitch, yaw])
+
+def format_numbers(values, precision=12):
+    """数值列表 → 以空格分隔的字符串
+
+    默认保留12位有效数字：足以无损保留原点、惯量和关节限制，又能去掉0.1+0.2这类浮点误差尾数。
+    """
+    # +0.0 把 -0.0 统一为 0
+    return " ".join(f"{float(v) + 0.0:.{precision}g}" for v in values)
+
+def sanitize_filename(name):
+    """把对象/网格名称转换为可用作文件名的字符串"""
+    import re
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', name).strip('_') or "mesh"
+
+def collect_link_geometry(scene):
+    """按所属link收集 visual / collision / inertial 对象"""
+    groups = {}
+    for obj in scene.objects:
+        if is_link_object(obj):
+            continue
+        phobostype = get_phobostype(obj)
+        if phobostype == 'collision' or phobostype == 'inertial':
+            kind = phobostype
+        elif is_visual_object(obj):
+            kind = 'visual'
+        else:
+            continue
+        link = find_parent_link(obj)
+        if link is not None:
+            groups.setdefault(link, {'visual': [], 'collision': [], 'inertial': []})[kind].append(obj)
+    return groups
+
+def object_link_transform(obj, link_world_inverse):
+    """对象相对link的变换拆分为 (刚体4x4, 3x3拉伸)"""
+    local = link_world_inverse @ matrix_to_numpy(obj.matrix_world)
+    rotation, stretch = polar_decompose(local[:3, :3])
+    origin = np.eye(4)
+    origin[:3, :3] = rotation
+    origin[:3, 3] = local[:3, 3]
+    return origin, stretch
+
+def describe_geometry(obj, stretch):
+    """对象的几何描述；图元尺寸优先使用geometry/*属性，否则由网格包围盒和拉伸推算"""
+    kind = obj.get('geometry/type')
+    if kind not in ('box', 'cylinder', 'sphere'):
+        return {'type': 'mesh'} if obj.type == 'MESH' and len(obj.data.polygons) else None
+    
+    extent = np.ones(3)
+    if obj.type == 'MESH' and len(obj.data.vertices):
+        co = read_mesh_arrays(obj.data)['co']
+        extent = (co.max(axis=0) - co.min(axis=0)) * np.abs(np.diag(stretch))
+    if kind == 'box':
+        return {'type': 'box', 'size': [float(v) for v in obj.get('geometry/size', extent)]}
+    if kind == 'cylinder':
+        return {'type': 'cylinder',
+                'radius': float(obj.get('geometry/radius', max(extent[0], extent[1]) / 2.0)),
+                'length': float(obj.get('geometry/length', extent[2]))}
+    return {'type': 'sphere', 'radius': float(obj.get('geometry/radius', extent.max() / 2.0))}
+
+def object_rgba(obj):
+    """对象第一个材质的颜色，没有材质时返回None"""
+    for slot in getattr(obj, 'material_slots', []):
+        if slot.material is not None:
+            return [float(v) for v in slot.material.diffuse_color]
+    return None
+
+def read_joint_snapshot(link, model, index):
+    """读取link上的关节属性，返回导出用的关节描述"""
+    joint_type = link.get('joint/type', 'fixed')
+    joint = {'name': link.get('joint/name', f"{model.names[index]}_joint"), 'type': joint_type}
+    j = model.joint_index[index]
+    if j < 0:
+        joint['type'] = 'fixed'
+        return joint
+    
+    prefix = 'joint/limit/' if 'joint/limit/lower' in link or 'joint/limit/effort' in link else 'joint/limits/'
+    joint['axis'] = model.axes[j].tolist()
+    joint['lower'] = None if joint_type == 'continuous' else float(model.lower[j])
+    joint['upper'] = None if joint_type == 'continuous' else float(model.upper[j])
+    joint['effort'] = float(link.get(prefix + 'effort', link.get('joint/limits/effort', 0.0)))
+    joint['velocity'] = float(link.get(prefix + 'velocity', link.get('joint/limits/velocity', 0.0)))
+    joint['damping'] = float(link.get('joint/dynamics/damping', 0.0))
+    joint['friction'] = float(link.get('joint/dynamics/friction', 0.0))
+    return joint
+
+def collect_robot_snapshot(scene):
+    """导出用的机器人快照：link树、关节、visual/collision几何和惯量（只读，不修改场景）
+
+    links按父级在前排序，每项包含 name、object、parent（索引，根为-1）、
+    origin（相对父link的刚体变换，根为世界变换）、joint、visuals、collisions、inertial。
+    """
+    model = KinematicModel(scene)
+    groups = collect_link_geometry(scene)
+    links = []
+    for i, link in enumerate(model.links):
+        world_inverse = np.linalg.inv(model.rest_world[i])
+        entry = {
+            'name': model.names[i],
+            'object': link,
+            'parent': int(model.parent[i]),
+            'origin': model.rest[i],
+            'joint': read_joint_snapshot(link, model, i) if model.parent[i] >= 0 else None,
+            'visuals': [],
+            'collisions': [],
+            'inertial': None,
+        }
+        group = groups.get(link, {'visual': [], 'collision': [], 'inertial': []})
+        for kind in ('visual', 'collision'):
+            for obj in sorted(group[kind], key=lambda o: o.name):
+                origin, stretch = object_link_transform(obj, world_inverse)
+                geometry = describe_geometry(obj, stretch)
+                if geometry is not None:
+                    entry[kind + 's'].append({'object': obj, 'name': obj.name, 'origin': origin,
+                                              'stretch': stretch, 'geometry': geometry,
+                                              'rgba': object_rgba(obj)})
+        
+        # 同一link下的多个惯量按平行轴定理合成，表示在link坐标系下
+        items = []
+        for obj in group['inertial']:
+            if float(obj.get('inertial/mass', 0.0)) <= 0:
+                continue
+            origin, _ = object_link_transform(obj, world_inverse)
+            rotation = origin[:3, :3]
+            local = inertia_to_matrix(obj.get('inertial/inertia', [0.0] * 6))
+            items.append((float(obj['inertial/mass']), origin[:3, 3], rotation @ local @ rotation.T))
+        if items:
+            mass, com, inertia = combine_inertials(items)
+            entry['inertial'] = {'mass': mass, 'com': com, 'inertia': inertia}
+        links.append(entry)
+    return {'name': get_model_name(scene), 'links': links}
+
+class MeshExportCache:
+    """按内容哈希去重的网格文件写出缓存，同一内容只写出一次
+
+    返回的文件路径相对root（默认为网格目录本身）；多个导出格式共用一个缓存时，
+    已写出的网格文件（包括Phobos导出的网格）可以直接复用。
+    """
+    
+    def __init__(self, directory, root=None):
+        import threading
+        self.directory = directory
+        self.root = root or directory
+        self.files = {}
+        self.names = set()
+        self.by_data = {}
+        self.lock = threading.Lock()
+    
+    def reuse(self, mesh, filepath):
+        """登记一个已存在的、与网格数据（未烘焙拉伸）对应的文件"""
+        import os
+        self.by_data[(mesh.name, None)] = os.path.relpath(filepath, self.root).replace(os.sep, '/')
+    
+    def mesh_file(self, obj, stretch=None):
+        """写出（或复用）对象网格，返回 (相对root的文件路径, 轴向缩放或None)
+
+        拉伸为对角阵时以缩放形式返回，网格文件保持原始顶点以便共享；
+        否则（含剪切或镜像）把拉伸烘焙进顶点。
+        """
+        key, scale, baked = self.mesh_key(obj.data, stretch)
+        if key not in self.by_data:
+            self.by_data[key] = self.write(obj.data, baked)
+        return self.by_data[key], scale
+    
+    @staticmethod
+    def mesh_key(mesh, stretch=None):
+        """返回 (缓存键, 轴向缩放或None, 需要烘焙的拉伸或None)"""
+        scale = None
+        baked = None
+        if stretch is not None:
+            diagonal = np.diag(stretch)
+            if np.allclose(stretch, np.diag(diagonal), atol=1e-6) and (diagonal > 0).all():
+                scale = diagonal if not np.allclose(diagonal, 1.0, atol=1e-6) else None
+            else:
+                baked = stretch
+        return (mesh.name, None if baked is None else np.round(baked, 9).tobytes()), scale, baked
+    
+    def write(self, mesh, linear=None):
+        """三角化并按内容哈希写出二进制STL，返回相对root的文件路径"""
+        return self.write_arrays(mesh.name, read_mesh_arrays(mesh), linear)
+    
+    def write_arrays(self, name, arrays, linear=None):
+        """write() 的纯NumPy部分：不访问bpy，可在工作线程中调用"""
+        import os
+        import hashlib
+        from concurrent.futures import Future
+        co = arrays['co']
+        triangles, _ = triangulate_arrays(arrays)
+        if linear is not None:
+            co = (co @ linear.T).astype(np.float32)
+            if np.linalg.det(linear) < 0:
+                triangles = triangles[:, ::-1]
+        triangles = np.ascontiguousarray(triangles)
+        
+        digest = hashlib.sha1(np.ascontiguousarray(co).tobytes() + triangles.tobytes()).hexdigest()
+        # 每个内容哈希对应一个Future：写出完成后才发布路径，同内容的其他线程等待同一次写出
+        with self.lock:
+            pending = self.files.get(digest)
+            if pending is None:
+                pending = self.files[digest] = Future()
+                base = sanitize_filename(name)
+                unique, suffix = base, 1
+                while unique in self.names:
+                    unique, suffix = f"{base}_{suffix}", suffix + 1
+                self.names.add(unique)
+                filepath = os.path.join(self.directory, unique + ".stl")
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            return pending.result()
+        
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            write_binary_stl(filepath, co, triangles)
+        except BaseException as e:
+            # 写出失败时撤销登记，等待中的线程得到同一个异常
+            with self.lock:
+                del self.files[digest]
+                self.names.discard(unique)
+            pending.set_exception(e)
+            raise
+        pending.set_result(os.path.relpath(filepath, self.root).replace(os.sep, '/'))
+        return pending.result()
+
+def urdf_origin_element(parent, matrix):
+    """写入<origin>（单位变换时省略）"""
+    import xml.etree.ElementTree as ET
+    if np.allclose(matrix, np.eye(4), atol=1e-9):
+        return None
+    return ET.SubElement(parent, 'origin', xyz=format_numbers(matrix[:3, 3]),
+                         rpy=format_numbers(rotation_to_rpy(matrix[:3, :3])))
+
+def urdf_link_element(link, mesh_uri, name=None, item_names=True):
+    """快照中的link → URDF <link>元素
+
+    mesh_uri(item) 返回 (网格URI, 轴向缩放或None)；name覆盖link名称，
+    item_names为False时省略visual/collision的name属性（用于结构比较）。
+    """
+    import xml.etree.ElementTree as ET
+    element = ET.Element('link', name=link['name'] if name is None else name)
+    
+    inertial = link['inertial']
+    if inertial is not None:
+        node = ET.SubElement(element, 'inertial')
+        frame = np.eye(4)
+        frame[:3, 3] = inertial['com']
+        urdf_origin_element(node, frame)
+        ET.SubElement(node, 'mass', value=format_numbers([inertial['mass']]))
+        matrix = inertial['inertia']
+        ET.SubElement(node, 'inertia', ixx=format_numbers([matrix[0, 0]]), ixy=format_numbers([matrix[0, 1]]),
+                      ixz=format_numbers([matrix[0, 2]]), iyy=format_numbers([matrix[1, 1]]),
+                      iyz=format_numbers([matrix[1, 2]]), izz=format_numbers([matrix[2, 2]]))
+    
+    for kind in ('visual', 'collision'):
+        for item in link[kind + 's']:
+            node = ET.SubElement(element, kind)
+            if item_names:
+                node.set('name', item['name'])
+            urdf_origin_element(node, item['origin'])
+            geometry = ET.SubElement(node, 'geometry')
+            data = item['geometry']
+            if data['type'] == 'box':
+                ET.SubElement(geometry, 'box', size=format_numbers(data['size']))
+            elif data['type'] == 'cylinder':
+                ET.SubElement(geometry, 'cylinder', radius=format_numbers([data['radius']]),
+                              length=format_numbers([data['length']]))
+            elif data['type'] == 'sphere':
+                ET.SubElement(geometry, 'sphere', radius=format_numbers([data['radius']]))
+            else:
+                uri, scale = mesh_uri(item)
+                mesh = ET.SubElement(geometry, 'mesh', filename=uri)
+                if scale is not None:
+                    mesh.set('scale', format_numbers(scale))
+            if kind == 'visual' and item['rgba'] is not None:
+                rgba = format_numbers(item['rgba'], 4)
+                # 材质名由颜色决定，同名材质颜色一定相同
+                material = ET.SubElement(node, 'material', name="color_" + rgba.replace(" ", "_").replace(".", "p"))
+                ET.SubElement(material, 'color', rgba=rgba)
+    return element
+
+def urdf_joint_element(link, parent_name, child_name, include_origin=True):
+    """快照中link的关节 → URDF <joint>元素"""
+    import xml.etree.ElementTree as ET
+    joint = link['joint']
+    element = ET.Element('joint', name=joint['name'], type=joint['type'])
+    if include_origin:
+        urdf_origin_element(element, link['origin'])
+    ET.SubElement(element, 'parent', link=parent_name)
+    ET.SubElement(element, 'child', link=child_name)
+    if joint['type'] == 'fixed':
+        return element
+    
+    ET.SubElement(element, 'axis', xyz=format_numbers(joint['axis']))
+    limit = ET.SubElement(element, 'limit', effort=format_numbers([joint['effort']]),
+                          velocity=format_numbers([joint['velocity']]))
+    if joint['lower'] is not None and joint['upper'] is not None:
+        limit.set('lower', format_numbers([joint['lower']]))
+        limit.set('upper', format_numbers([joint['upper']]))
+    if joint['damping'] or joint['friction']:
+        ET.SubElement(element, 'dynamics', damping=format_numbers([joint['damping']]),
+                      friction=format_numbers([joint['friction']]))
+    return element
+
+def build_urdf_document(snapshot, mesh_uri, robot_name):
+    """由机器人快照生成完整（展开的）URDF元素树"""
+    import xml.etree.ElementTree as ET
+    robot = ET.Element('robot', name=robot_name)
+    links = snapshot['links']
+    for link in links:
+        robot.append(urdf_link_element(link, mesh_uri))
+    for link in links:
+        if link['joint'] is not None:
+            robot.append(urdf_joint_element(link, links[link['parent']]['name'], link['name']))
+    return ET.ElementTree(robot)
+
+def write_sdf_model(snapshot, directory, model_name, cache, sdf_version="1.7"):
+    """写出Gazebo模型目录中的 model.sdf 与 model.config，网格以 model:// URI 引用
+
+    Gazebo按资源路径下的目录名解析 model://<名称>，因此URI和model.config中的名称
+    使用模型目录（directory）的目录名；model_name只作为SDF中<model>的名称。
+    cache为MeshExportCache（root应为模型目录），返回 model.sdf 的路径。
+    """
+    import os
+    import xml.etree.ElementTree as ET
+    package = os.path.basename(os.path.normpath(directory))
+    
+    def pose(parent, matrix):
+        if np.allclose(matrix, np.eye(4), atol=1e-9):
+            return
+        ET.SubElement(parent, 'pose').text = format_numbers(list(matrix[:3, 3]) + list(rotation_to_rpy(matrix[:3, :3])))
+    
+    def value(parent, tag, number):
+        ET.SubElement(parent, tag).text = format_numbers([number])
+    
+    def geometry(parent, item):
+        element = ET.SubElement(ET.SubElement(parent, 'geometry'), item['geometry']['type'])
+        data = item['geometry']
+        if data['type'] == 'box':
+            ET.SubElement(element, 'size').text = format_numbers(data['size'])
+        elif data['type'] == 'cylinder':
+            value(element, 'radius', data['radius'])
+            value(element, 'length', data['length'])
+        elif data['type'] == 'sphere':
+            value(element, 'radius', data['radius'])
+        else:
+            path, scale = cache.mesh_file(item['object'], item['stretch'])
+            ET.SubElement(element, 'uri').text = f"model://{package}/{path}"
+            if scale is not None:
+                ET.SubElement(element, 'scale').text = format_numbers(scale)
+    
+    sdf = ET.Element('sdf', version=sdf_version)
+    model = ET.SubElement(sdf, 'model', name=model_name)
+    
+    # link位姿相对模型坐标系（即场景世界坐标系），关节坐标系与子link重合
+    world = []
+    for link in snapshot['links']:
+        world.append(link['origin'] if link['parent'] < 0 else world[link['parent']] @ link['origin'])
+    
+    used_names = {}
+    for index, link in enumerate(snapshot['links']):
+        element = ET.SubElement(model, 'link', name=link['name'])
+        pose(element, world[index])
+        
+        inertial = link['inertial']
+        if inertial is not None:
+            node = ET.SubElement(element, 'inertial')
+            frame = np.eye(4)
+            frame[:3, 3] = inertial['com']
+            pose(node, frame)
+            value(node, 'mass', inertial['mass'])
+            tensor = ET.SubElement(node, 'inertia')
+            matrix = inertial['inertia']
+            for tag, (r, c) in zip(('ixx', 'ixy', 'ixz', 'iyy', 'iyz', 'izz'),
+                                   ((0, 0), (0, 1), (0, 2), (1, 1), (1, 2), (2, 2))):
+                value(tensor, tag, matrix[r, c])
+        
+        for kind in ('collision', 'visual'):
+            for item in link[kind + 's']:
+                # 同一link内的visual/collision名称必须唯一
+                base = sanitize_filename(item['name'])
+                count = used_names.get((index, kind, base), 0)
+                used_names[(index, kind, base)] = count + 1
+                node = ET.SubElement(element, kind, name=base if not count else f"{base}_{count}")
+                pose(node, item['origin'])
+                geometry(node, item)
+                if kind == 'visual' and item['rgba'] is not None:
+                    material = ET.SubElement(node, 'material')
+                    ET.SubElement(material, 'ambient').text = format_numbers(item['rgba'], 4)
+                    ET.SubElement(material, 'diffuse').text = format_numbers(item['rgba'], 4)
+    
+    for link in snapshot['links']:
+        joint = link['joint']
+        if joint is None:
+            continue
+        is_fixed = joint['type'] == 'fixed'
+        element = ET.SubElement(model, 'joint', name=joint['name'],
+                                type='fixed' if is_fixed else ('prismatic' if joint['type'] == 'prismatic' else 'revolute'))
+        ET.SubElement(element, 'parent').text = snapshot['links'][link['parent']]['name']
+        ET.SubElement(element, 'child').text = link['name']
+        if is_fixed:
+            continue
+        axis = ET.SubElement(element, 'axis')
+        ET.SubElement(axis, 'xyz').text = format_numbers(joint['axis'])
+        limit = ET.SubElement(axis, 'limit')
+        # continuous关节使用Gazebo惯用的极大限位
+        value(limit, 'lower', joint['lower'] if joint['lower'] is not None else -1e16)
+        value(limit, 'upper', joint['upper'] if joint['upper'] is not None else 1e16)
+        if joint['effort']:
+            value(limit, 'effort', joint['effort'])
+        if joint['velocity']:
+            value(limit, 'velocity', joint['velocity'])
+        if joint['damping'] or joint['friction']:
+            dynamics = ET.SubElement(axis, 'dynamics')
+            value(dynamics, 'damping', joint['damping'])
+            value(dynamics, 'friction', joint['friction'])
+    
+    os.makedirs(directory, exist_ok=True)
+    tree = ET.ElementTree(sdf)
+    if hasattr(ET, 'indent'):
+        ET.indent(tree, space="  ")
+    sdf_path = os.path.join(directory, "model.sdf")
+    tree.write(sdf_path, encoding='utf-8', xml_declaration=True)
+    
+    config = ET.Element('model')
+    ET.SubElement(config, 'name').text = package
+    ET.SubElement(config, 'version').text = "1.0"
+    ET.SubElement(config, 'sdf', version=sdf_version).text = "model.sdf"
+    ET.SubElement(config, 'description').text = f"{model_name} exported from Blender URDF Tools"
+    tree = ET.ElementTree(config)
+    if hasattr(ET, 'indent'):
+        ET.indent(tree, space="  ")
+    tree.write(os.path.join(directory, "model.config"), encoding='utf-8', xml_declaration=True)
+    return sdf_path
+
+class URDF_OT_ConvertUnits(Operator):
+    """CAD单位换算：统一缩放网格、位置、prismatic关节限制和惯量 (Step 0)"""
+    bl_idname = "urdf.convert_units"
+    bl_label = "Convert Units to Meters"
+    bl_description = "将毫米/厘米/英寸单位的CAD导入数据一次性换算为米，可根据场景包围盒自动判断单位"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    source_unit: EnumProperty(
+        name="Source Unit",
+        description="导入数据的原始单位",
+        items=[
+            ('AUTO', 'Auto Detect', '根据场景包围盒统计自动判断'),
+            ('MM', 'Millimeter', '毫米 (×0.001)'),
+            ('CM', 'Centimeter', '厘米 (×0.01)'),
+            ('INCH', 'Inch', '英寸 (×0.0254)'),
+        ],
+        default='AUTO'
+    )
+    
+    UNIT_FACTORS = {'MM': 0.001, 'CM': 0.01, 'INCH': 0.0254}
+    # 自动判定时的候选单位，以及换算为米后零件尺寸中位数的典型值
+    DETECT_UNITS = (('M', 1.0), ('MM', 0.001), ('CM', 0.01))
+    TYPICAL_PART_SIZE = 0.1
+    
+    # 长度相关的关节属性（prismatic关节）
+    LENGTH_JOINT_KEYS = (
+        'joint/limit/lower', 'joint/limit/upper', 'joint/limit/velocity',
+        'joint/limits/lower', 'joint/limits/upper', 'joint/limits/velocity',
+    )
+    
+    # 几何图元的长度属性
+    LENGTH_GEOMETRY_KEYS = ('geometry/size', 'geometry/radius', 'geometry/length')
+    
+    def execute(self, context):
+        scene = context.scene
+        
+        print(f"\n{'='*60}")
+        print("开始单位换算...")
+        print(f"{'='*60}")
+        
+        if self.source_unit == 'AUTO':
+            factor = self.detect_factor(scene)
+        else:
+            factor = self.UNIT_FACTORS[self.source_unit]
+        
+        if factor == 1.0:
+            self.report({'INFO'}, "场景尺寸已符合米制，无需换算")
+            print("✓ 场景尺寸已符合米制，无需换算")
+            return {'FINISHED'}
+        
+        print(f"换算系数: ×{factor}")
+        
+        try:
+            mesh_count = self.scale_meshes(scene, factor)
+            object_count = self.scale_transforms(context, factor)
+            property_count = self.scale_properties(scene, factor)
+            scene.cursor.location = scene.cursor.location * factor
+        except Exception as e:
+            self.report({'ERROR'}, f"单位换算失败: {str(e)}")
+            print(f"单位换算错误: {e}")
+            return {'CANCELLED'}
+        
+        print(f"  ✓ 网格数据: {mesh_count}")
+        print(f"  ✓ 对象变换: {object_count}")
+        print(f"  ✓ 关节限制/惯量/图元属性: {property_count}")
+        print(f"{'='*60}\n")
+        
+        self.report({'INFO'}, f"单位换算完成 (×{factor})：{mesh_count} 个网格, {object_count} 个对象")
+        return {'FINISHED'}
+    
+    def detect_factor(self, scene):
+        """根据场景包围盒统计判断单位
+        
+        换算后整体尺寸落在0.02~20米之间的单位都是候选（米与厘米、毫米与厘米的范围有重叠），
+        候选中选择换算后零件尺寸中位数最接近典型零件尺寸（量级上）的单位
+        """
+        mesh_objects = [obj for obj in scene.objects if obj.type == 'MESH']
+        if not mesh_objects:
+            return 1.0
+        
+        corners = np.array([[list(corner) for corner in obj.bound_box] for obj in mesh_objects], dtype=np.float64)
+        matrices = np.array([matrix_to_numpy(obj.matrix_world) for obj in mesh_objects])
+        world = np.einsum('nij,nkj->nki', matrices[:, :3, :3], corners) + matrices[:, None, :3, 3]
+        
+        scene_size = float(np.linalg.norm(world.reshape(-1, 3).max(axis=0) - world.reshape(-1, 3).min(axis=0)))
+        part_sizes = np.linalg.norm(world.max(axis=1) - world.min(axis=1), axis=1)
+        part_size = float(np.median(part_sizes))
+        print(f"  场景包围盒对角线: {scene_size:.4g}")
+        print(f"  零件尺寸中位数: {part_size:.4g}")
+        
+        candidates = [(unit, factor) for unit, factor in self.DETECT_UNITS
+                      if 0.02 <= scene_size * factor <= 20.0]
+        if not candidates:
+            print("  ! 无法判定单位，按米处理")
+            return 1.0
+        if part_size > 0.0:
+            # 按量级比较，候选顺序（米优先）决定相同距离时的取舍
+            unit, factor = min(candidates, key=lambda candidate: abs(
+                np.log10(part_size * candidate[1] / self.TYPICAL_PART_SIZE)))
+        else:
+            unit, factor = candidates[0]
+        print(f"  → 判定单位: {unit}")
+        return factor
+    
+    def scale_meshes(self, scene, factor):
+        """顶点缓冲区整体缩放（共享网格只处理一次）"""
+        meshes = {obj.data for obj in scene.objects if obj.type == 'MESH'}
+        for mesh in meshes:
+            co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+            mesh.vertices.foreach_get("co", co)
+            mesh.vertices.foreach_set("co", co * np.float32(factor))
+            mesh.update()
+        return len(meshes)
+    
+    def scale_transforms(self, context, factor):
+        """所有对象的世界位置按系数缩放，旋转和缩放保持不变"""
+        objects = list(context.scene.objects)
+        world = {obj: matrix_to_numpy(obj.matrix_world) for obj in objects}
+        for obj in objects:
+            if obj.parent is not None:
+                world.setdefault(obj.parent, matrix_to_numpy(obj.parent.matrix_world))
+        
+        new_world = {}
+        for obj in objects:
+            scaled = world[obj].copy()
+            scaled[:3, 3] *= factor
+            new_world[obj] = scaled
+        
+        apply_world_matrices(new_world, world)
+        context.view_layer.update()
+        return len(new_world)
+    
+    def scale_properties(self, scene, factor):
+        """prismatic关节限制、几何图元尺寸按系数缩放，惯量按系数平方缩放"""
+        count = 0
+        for obj in scene.objects:
+            for key in list(obj.keys()):
+                if key in self.LENGTH_JOINT_KEYS:
+                    if obj.get('joint/type') != 'prismatic':
+                        continue
+                    scale = factor
+                elif key in self.LENGTH_GEOMETRY_KEYS:
+                    scale = factor
+                elif key.endswith('inertial/inertia'):
+                    scale = factor * factor
+                else:
+                    continue
+                
+                value = obj[key]
+                if isinstance(value, (int, float)):
+                    obj[key] = value * scale
+                else:
+                    obj[key] = [v * scale for v in value]
+                count += 1
+        return count
+
 class URDF_OT_ClearParentKeepTransform(Operator):
     """Clear parent and keep transform (Step 1)"""
     bl_idname = "urdf.clear_parent_keep_transform"
@@ -45,6 +2570,215 @@ class URDF_OT_DeleteNonMesh(Operator):
         self.report({'INFO'}, "Deleted all non-mesh objects")
         return {'FINISHED'}
 
+class URDF_OT_CleanupMeshes(Operator):
+    """批量清理网格：合并重复顶点、删除退化面和游离几何、应用缩放 (Step 2b)"""
+    bl_idname = "urdf.cleanup_meshes"
+    bl_label = "Cleanup Meshes"
+    bl_description = "向量化检测所有网格的问题，只对需要处理的网格执行bmesh清理，并输出前后体积报告"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    merge_distance: FloatProperty(
+        name="Merge Distance",
+        description="合并重复顶点和判定退化面的距离阈值",
+        default=0.00001,
+        min=0.0,
+        precision=6
+    )
+    
+    remove_loose: BoolProperty(
+        name="Remove Loose Geometry",
+        description="删除不属于任何面的游离顶点和边",
+        default=True
+    )
+    
+    apply_scale: BoolProperty(
+        name="Apply Scale",
+        description="将对象缩放写入网格数据，使缩放归一",
+        default=True
+    )
+    
+    def execute(self, context):
+        mesh_objects = [obj for obj in context.scene.objects if obj.type == 'MESH']
+        if not mesh_objects:
+            self.report({'WARNING'}, "场景中未找到网格对象")
+            return {'CANCELLED'}
+        
+        print(f"\n{'='*60}")
+        print(f"开始批量清理 {len(mesh_objects)} 个网格对象...")
+        print(f"{'='*60}")
+        
+        # 缩放不同的对象共享网格时先拆分，避免缩放写入影响其他对象
+        if self.apply_scale:
+            for obj in mesh_objects:
+                if self.needs_scale(obj) and obj.data.users > 1:
+                    obj.data = obj.data.copy()
+        
+        users = {}
+        for obj in mesh_objects:
+            users.setdefault(obj.data, []).append(obj)
+        
+        before = self.measure(users)
+        
+        # 步骤1: 向量化分析，只收集需要处理的网格
+        dirty = {}
+        for mesh, objs in users.items():
+            reasons = self.analyze(mesh, objs)
+            if reasons:
+                dirty[mesh] = reasons
+        
+        print(f"分析完成: {len(dirty)}/{len(users)} 个网格需要清理")
+        
+        # 步骤2: 仅对脏网格执行bmesh清理
+        for mesh, reasons in dirty.items():
+            try:
+                self.clean_mesh(mesh, users[mesh])
+                print(f"  ✓ {mesh.name}: {', '.join(reasons)}")
+            except Exception as e:
+                print(f"  ✗ 清理 '{mesh.name}' 失败: {e}")
+        
+        after = self.measure(users)
+        self.print_report(before, after)
+        
+        self.report({'INFO'}, f"清理了 {len(dirty)} 个网格，顶点 {before['verts']} → {after['verts']}")
+        return {'FINISHED'}
+    
+    def needs_scale(self, obj):
+        """对象缩放是否需要写入网格（忽略零缩放）"""
+        scale = obj.scale
+        if any(abs(s) < 1e-9 for s in scale):
+            return False
+        return any(abs(s - 1.0) > 1e-6 for s in scale)
+    
+    def count_duplicate_vertices(self, co, distance):
+        """统计距离不超过distance的重复顶点数量（每组保留一个）
+        
+        坐标完全相同的顶点先按字节去重（精确计数）；其余顶点用8组错开半个格子的网格
+        （格子边长2*distance）检测：距离不超过distance的两个顶点至少在一组网格里落入同一格子，
+        每组网格按格子排序后只比较相邻顶点的距离，全程向量化（同一格子内夹有其他顶点的近邻可能漏计）
+        """
+        co = np.ascontiguousarray(co, dtype=np.float32).reshape(-1, 3)
+        if len(co) < 2:
+            return 0
+        unique = np.unique(co.view(np.dtype((np.void, co.itemsize * 3))).ravel())
+        exact = len(co) - len(unique)
+        co = unique.view(np.float32).reshape(-1, 3).astype(np.float64)
+        if len(co) < 2:
+            return exact
+        
+        cell = 2.0 * distance
+        duplicate = np.zeros(len(co), dtype=bool)
+        for offset in np.ndindex(2, 2, 2):
+            keys = np.floor(co / cell + np.array(offset) * 0.5).astype(np.int64)
+            keys -= keys.min(axis=0)
+            span = keys.max(axis=0) + 1
+            if float(np.prod(span.astype(np.float64))) < 2.0 ** 62:
+                order = np.argsort((keys[:, 0] * span[1] + keys[:, 1]) * span[2] + keys[:, 2], kind='stable')
+            else:
+                # 格子编号组合后会溢出int64时按三个分量排序
+                order = np.lexsort((keys[:, 2], keys[:, 1], keys[:, 0]))
+            first, second = order[:-1], order[1:]
+            delta = co[first] - co[second]
+            close = (keys[first] == keys[second]).all(axis=1) & (
+                np.einsum('ij,ij->i', delta, delta) <= distance * distance)
+            # 每对中序号较大的一个会被合并掉
+            duplicate[np.maximum(first[close], second[close])] = True
+        return exact + int(duplicate.sum())
+    
+    def analyze(self, mesh, objs):
+        """基于foreach_get数组检测重复顶点、退化面、游离几何和缩放问题"""
+        reasons = []
+        arrays = read_mesh_arrays(mesh)
+        co = arrays['co']
+        
+        if self.merge_distance > 0 and len(co):
+            duplicates = self.count_duplicate_vertices(co, self.merge_distance)
+            if duplicates:
+                reasons.append(f"重复顶点 {duplicates}")
+        
+        if len(arrays['loop_start']):
+            area = np.empty(len(mesh.polygons), dtype=np.float32)
+            mesh.polygons.foreach_get("area", area)
+            # 面内相邻loop指向同一顶点也视为退化
+            loop_start = arrays['loop_start']
+            loop_total = arrays['loop_total']
+            owner = np.repeat(np.arange(len(loop_start)), loop_total)
+            position = np.arange(len(owner)) - loop_start[owner]
+            following = loop_start[owner] + (position + 1) % loop_total[owner]
+            repeated = arrays['loop_vidx'] == arrays['loop_vidx'][following]
+            degenerate = (area <= self.merge_distance ** 2) | np.bincount(
+                owner, weights=repeated, minlength=len(loop_start)).astype(bool)
+            if degenerate.any():
+                reasons.append(f"退化面 {int(degenerate.sum())}")
+        
+        if self.remove_loose:
+            loose_verts = int((np.bincount(arrays['loop_vidx'], minlength=len(co)) == 0).sum())
+            if loose_verts:
+                reasons.append(f"游离顶点 {loose_verts}")
+            edge_index = np.empty(len(mesh.loops), dtype=np.int32)
+            mesh.loops.foreach_get("edge_index", edge_index)
+            loose_edges = int((np.bincount(edge_index, minlength=len(mesh.edges)) == 0).sum())
+            if loose_edges:
+                reasons.append(f"游离边 {loose_edges}")
+        
+        if self.apply_scale and len(objs) == 1 and self.needs_scale(objs[0]):
+            scale = objs[0].scale
+            reasons.append(f"缩放 ({scale.x:.3g}, {scale.y:.3g}, {scale.z:.3g})")
+        
+        return reasons
+    
+    def clean_mesh(self, mesh, objs):
+        """bmesh清理单个网格，并在需要时写入对象缩放"""
+        bm = bmesh.new()
+        bm.from_mesh(mesh)
+        
+        if self.merge_distance > 0:
+            bmesh.ops.remove_doubles(bm, verts=bm.verts, dist=self.merge_distance)
+            bmesh.ops.dissolve_degenerate(bm, dist=self.merge_distance, edges=bm.edges)
+        
+        if self.remove_loose:
+            loose_edges = [e for e in bm.edges if not e.link_faces]
+            if loose_edges:
+                bmesh.ops.delete(bm, geom=loose_edges, context='EDGES')
+            loose_verts = [v for v in bm.verts if not v.link_faces]
+            if loose_verts:
+                bmesh.ops.delete(bm, geom=loose_verts, context='VERTS')
+        
+        obj = objs[0]
+        if self.apply_scale and len(objs) == 1 and self.needs_scale(obj):
+            scale_matrix = Matrix.Diagonal(obj.scale).to_4x4()
+            bm.transform(scale_matrix)
+            if obj.scale.x * obj.scale.y * obj.scale.z < 0:
+                bmesh.ops.reverse_faces(bm, faces=bm.faces)
+            # 子对象通过父级逆矩阵补偿，保持世界变换不变
+            for child in obj.children:
+                child.matrix_parent_inverse = scale_matrix @ child.matrix_parent_inverse
+            obj.scale = (1.0, 1.0, 1.0)
+        
+        bm.to_mesh(mesh)
+        bm.free()
+        mesh.update()
+    
+    def measure(self, users):
+        """统计顶点数、面数、三角形数及按二进制STL估算的导出体积"""
+        verts = faces = tris = 0
+        for mesh in users:
+            loop_total = np.empty(len(mesh.polygons), dtype=np.int32)
+            mesh.polygons.foreach_get("loop_total", loop_total)
+            verts += len(mesh.vertices)
+            faces += len(loop_total)
+            tris += int((loop_total - 2).sum())
+        return {'verts': verts, 'faces': faces, 'tris': tris, 'bytes': 84 * len(users) + 50 * tris}
+    
+    def print_report(self, before, after):
+        """输出清理前后的体积报告"""
+        print(f"\n清理报告:")
+        print(f"  {'':8}{'清理前':>14}{'清理后':>14}")
+        print(f"  {'顶点':8}{before['verts']:>14,}{after['verts']:>14,}")
+        print(f"  {'面':8}{before['faces']:>14,}{after['faces']:>14,}")
+        print(f"  {'三角形':8}{before['tris']:>14,}{after['tris']:>14,}")
+        print(f"  {'STL体积':8}{before['bytes'] / 1e6:>12.2f}MB{after['bytes'] / 1e6:>12.2f}MB")
+        print(f"{'='*60}\n")
+
 class URDF_OT_SetVisualMesh(Operator):
     """Set all objects as visual mesh type (Step 3)"""
     bl_idname = "urdf.set_visual_mesh"
@@ -123,20 +2857,133 @@ class URDF_OT_SetVisualMesh(Operator):
             print(f"    ❌ 设置 '{obj.name}' 失败: {e}")
 
 class URDF_OT_SmartJoin(Operator):
-    """Smart join selected objects (Step 4)"""
+    """Smart join selected objects (Step 4) - 基于NumPy缓冲区的批量合并"""
     bl_idname = "urdf.smart_join"
     bl_label = "Smart Join"
+    bl_description = "按分组键批量合并选中的网格，直接由拼接的顶点缓冲区构建网格（不调用bpy.ops.object.join）"
     bl_options = {'REGISTER', 'UNDO'}
     
+    group_by: EnumProperty(
+        name="Group By",
+        description="合并分组方式",
+        items=[
+            ('NONE', 'All', '全部选中对象合并为一个（与Ctrl+J相同）'),
+            ('PARENT', 'Parent', '按父级装配体分组'),
+            ('MATERIAL', 'Material', '按第一个材质分组'),
+            ('COLLECTION', 'Collection', '按所属集合分组'),
+        ],
+        default='NONE'
+    )
+    
+    max_chunk_vertices: IntProperty(
+        name="Max Chunk Vertices",
+        description="单个合并网格的最大顶点数，超出时分块生成多个对象以限制内存占用",
+        default=2000000,
+        min=1000
+    )
+    
     def execute(self, context):
-        selected = bpy.context.selected_objects
-        if len(selected) > 1:
-            bpy.context.view_layer.objects.active = selected[0]
-            bpy.ops.object.join()
-            self.report({'INFO'}, f"Joined {len(selected)} objects")
-        else:
+        selected = [obj for obj in context.selected_objects if obj.type == 'MESH']
+        if len(selected) < 2:
             self.report({'WARNING'}, "Need at least 2 objects selected")
+            return {'FINISHED'}
+        
+        active = context.active_object
+        groups = self.group_objects(selected)
+        
+        print(f"\n{'='*60}")
+        print(f"批量合并: {len(selected)} 个对象, {len(groups)} 个分组 (按 {self.group_by})")
+        print(f"{'='*60}")
+        
+        removed = []
+        result_count = 0
+        joined_count = 0
+        
+        for key, objects in groups.items():
+            if len(objects) < 2:
+                continue
+            joined_count += len(objects)
+            
+            # 活动对象在组内时作为合并目标，保留其名称、父级和属性
+            target = active if active in objects else objects[0]
+            others = [obj for obj in objects if obj != target]
+            
+            chunks = self.split_chunks([target] + others)
+            for i, chunk in enumerate(chunks):
+                owner = target if i == 0 else self.new_chunk_object(context, target, i)
+                arrays, materials = merge_objects_to_arrays(chunk, owner.matrix_world, layers=True)
+                old_mesh = owner.data
+                owner.data = build_mesh_from_arrays(old_mesh.name, arrays, materials)
+                apply_vertex_groups(owner, arrays['groups'])
+                if old_mesh.users == 0:
+                    bpy.data.meshes.remove(old_mesh)
+                result_count += 1
+            
+            self.reparent_children(others, target)
+            removed.extend(others)
+            
+            print(f"  ✓ 分组 '{key}': {len(objects)} 个对象 → {len(chunks)} 个网格 ({target.name})")
+        
+        # 一次性批量删除被合并的对象及其孤立网格
+        old_meshes = {obj.data for obj in removed}
+        if removed:
+            bpy.data.batch_remove(removed)
+        orphan_meshes = [mesh for mesh in old_meshes if mesh.users == 0]
+        if orphan_meshes:
+            bpy.data.batch_remove(orphan_meshes)
+        
+        print(f"✓ 合并完成: 删除 {len(removed)} 个对象, 生成 {result_count} 个网格")
+        self.report({'INFO'}, f"Joined {joined_count} objects into {result_count}")
         return {'FINISHED'}
+    
+    def group_key(self, obj):
+        """计算对象的分组键"""
+        if self.group_by == 'PARENT':
+            return obj.parent.name if obj.parent else "(无父级)"
+        if self.group_by == 'MATERIAL':
+            material = obj.active_material
+            return material.name if material else "(无材质)"
+        if self.group_by == 'COLLECTION':
+            return obj.users_collection[0].name if obj.users_collection else "(无集合)"
+        return "全部"
+    
+    def group_objects(self, objects):
+        """按分组键对对象分组"""
+        groups = {}
+        for obj in sorted(objects, key=lambda o: o.name):
+            groups.setdefault(self.group_key(obj), []).append(obj)
+        return groups
+    
+    def split_chunks(self, objects):
+        """按累计顶点数切分，保证每次拼接的缓冲区大小有上限"""
+        chunks = [[]]
+        vertex_total = 0
+        for obj in objects:
+            count = len(obj.data.vertices)
+            if chunks[-1] and vertex_total + count > self.max_chunk_vertices:
+                chunks.append([])
+                vertex_total = 0
+            chunks[-1].append(obj)
+            vertex_total += count
+        return chunks
+    
+    def new_chunk_object(self, context, target, index):
+        """为超出上限的分块创建与目标同位置、同父级的新对象"""
+        obj = target.copy()
+        obj.name = f"{target.name}_part{index}"
+        for collection in target.users_collection or [context.scene.collection]:
+            collection.objects.link(obj)
+        return obj
+    
+    def reparent_children(self, removed, target):
+        """被合并对象的子对象改挂到合并目标上，保持世界变换"""
+        for obj in removed:
+            for child in obj.children:
+                if child in removed:
+                    continue
+                world = child.matrix_world.copy()
+                child.parent = target
+                child.matrix_world = world
 
 class URDF_OT_CreateLinkAtSelection(Operator):
     """Set 3D cursor at geometric center of selected elements (Step 5)"""
@@ -219,34 +3066,241 @@ class URDF_OT_CreateLinkAtSelection(Operator):
             self.report({'WARNING'}, "Must be in edit mode with mesh object selected")
             return {'CANCELLED'}
 
+class URDF_OT_SegmentLinks(Operator):
+    """按连通性和空间邻近自动划分link候选（Step 5 自动版）"""
+    bl_idname = "urdf.segment_links"
+    bl_label = "Auto Segment Links"
+    bl_description = "按集合、材质、包围盒接触和空间邻近把网格零件聚类为刚体候选，并为每组生成link空物体供检查"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    contact_tolerance: FloatProperty(
+        name="Contact Tolerance",
+        description="包围盒间距小于该值即视为接触",
+        default=0.001,
+        min=0.0,
+        precision=4
+    )
+    
+    respect_collections: BoolProperty(
+        name="Same Collection Only",
+        description="只在同一集合内的零件之间聚类",
+        default=True
+    )
+    
+    match_material: BoolProperty(
+        name="Same Material Only",
+        description="只在材质相同的零件之间聚类",
+        default=False
+    )
+    
+    min_cluster_size: IntProperty(
+        name="Min Cluster Size",
+        description="零件数少于该值的分组不生成link候选",
+        default=2,
+        min=1
+    )
+    
+    bind_members: BoolProperty(
+        name="Bind Members",
+        description="直接将分组零件绑定到生成的link空物体",
+        default=False
+    )
+    
+    SEGMENT_COLLECTION = "URDF_Segments"
+    
+    # 单个零件最多登记的网格单元数，超过的大零件改为与全部零件直接比较
+    MAX_CELLS_PER_OBJECT = 64
+    
+    def execute(self, context):
+        scene = context.scene
+        parts = [obj for obj in scene.objects
+                 if obj.type == 'MESH' and obj.parent is None and not is_link_object(obj)]
+        if len(parts) < 2:
+            self.report({'WARNING'}, "可聚类的未绑定网格不足两个")
+            return {'CANCELLED'}
+        
+        print(f"\n{'='*60}")
+        print(f"开始自动划分link: {len(parts)} 个零件")
+        print(f"{'='*60}")
+        
+        lower, upper = self.world_bounds(parts)
+        pairs = self.candidate_pairs(lower, upper)
+        pairs = self.filter_pairs(parts, pairs, lower, upper)
+        labels = self.union_find(len(parts), pairs)
+        
+        clusters = {}
+        for index, label in enumerate(labels):
+            clusters.setdefault(label, []).append(index)
+        
+        self.clear_previous_proposals()
+        collection = self.proposal_collection(scene)
+        
+        proposals = 0
+        singles = 0
+        for members in sorted(clusters.values(), key=len, reverse=True):
+            if len(members) < self.min_cluster_size:
+                singles += len(members)
+                continue
+            proposals += 1
+            self.create_proposal(collection, proposals, [parts[i] for i in members],
+                                 lower[members].min(axis=0), upper[members].max(axis=0))
+        
+        print(f"✓ 候选接触对: {len(pairs)}")
+        print(f"✓ 生成link候选: {proposals}，未分组零件: {singles}")
+        print(f"{'='*60}\n")
+        self.report({'INFO'}, f"生成 {proposals} 个link候选（集合 {self.SEGMENT_COLLECTION}），请检查后使用")
+        return {'FINISHED'}
+    
+    def world_bounds(self, parts):
+        """向量化计算所有零件的世界坐标轴对齐包围盒"""
+        corners = np.array([[list(corner) for corner in obj.bound_box] for obj in parts], dtype=np.float64)
+        matrices = np.array([matrix_to_numpy(obj.matrix_world) for obj in parts])
+        world = np.einsum('nij,nkj->nki', matrices[:, :3, :3], corners) + matrices[:, None, :3, 3]
+        return world.min(axis=1), world.max(axis=1)
+    
+    def candidate_pairs(self, lower, upper):
+        """均匀网格空间哈希，返回可能接触的零件对 (M, 2)"""
+        tol = self.contact_tolerance
+        extent = (upper - lower).max(axis=1)
+        cell = max(float(np.median(extent)), tol * 4, 1e-6)
+        
+        lo = np.floor((lower - tol) / cell).astype(np.int64)
+        hi = np.floor((upper + tol) / cell).astype(np.int64)
+        spans = np.prod(hi - lo + 1, axis=1)
+        
+        cells = {}
+        large = []
+        for index in range(len(lower)):
+            if spans[index] > self.MAX_CELLS_PER_OBJECT:
+                large.append(index)
+                continue
+            for x in range(lo[index, 0], hi[index, 0] + 1):
+                for y in range(lo[index, 1], hi[index, 1] + 1):
+                    for z in range(lo[index, 2], hi[index, 2] + 1):
+                        cells.setdefault((x, y, z), []).append(index)
+        
+        pairs = set()
+        for members in cells.values():
+            for a in range(len(members)):
+                for b in range(a + 1, len(members)):
+                    pairs.add((members[a], members[b]))
+        
+        # 大零件与所有零件比较
+        everything = np.arange(len(lower))
+        for index in large:
+            others = everything[everything != index]
+            pairs.update(zip(np.minimum(index, others).tolist(), np.maximum(index, others).tolist()))
+        
+        return np.array(sorted(pairs), dtype=np.int64).reshape(-1, 2)
+    
+    def filter_pairs(self, parts, pairs, lower, upper):
+        """包围盒接触测试及集合/材质约束（向量化）"""
+        if not len(pairs):
+            return pairs
+        tol = self.contact_tolerance
+        a, b = pairs[:, 0], pairs[:, 1]
+        keep = np.all((lower[a] <= upper[b] + tol) & (lower[b] <= upper[a] + tol), axis=1)
+        
+        if self.respect_collections:
+            keys = [obj.users_collection[0].name if obj.users_collection else "" for obj in parts]
+            ids = np.unique(keys, return_inverse=True)[1]
+            keep &= ids[a] == ids[b]
+        
+        if self.match_material:
+            keys = [obj.active_material.name if obj.active_material else "" for obj in parts]
+            ids = np.unique(keys, return_inverse=True)[1]
+            keep &= ids[a] == ids[b]
+        
+        return pairs[keep]
+    
+    def union_find(self, count, pairs):
+        """并查集合并接触对，返回每个零件的分组根"""
+        parent = list(range(count))
+        
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+        
+        for a, b in pairs.tolist():
+            root_a, root_b = find(a), find(b)
+            if root_a != root_b:
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+        
+        return [find(i) for i in range(count)]
+    
+    def clear_previous_proposals(self):
+        """删除上次生成且未被使用的link候选，并清理零件上失效的分组标记
+
+        只删除候选集合中仍保留 new_link_seg 名称且没有子对象的空物体；
+        已重命名（如经"命名link"）或已绑定零件的候选视为已采用，保持不变。
+        """
+        collection = bpy.data.collections.get(self.SEGMENT_COLLECTION)
+        stale = []
+        if collection is not None:
+            stale = [obj for obj in collection.objects
+                     if 'urdf/segment_size' in obj and obj.name.startswith("new_link_seg") and not obj.children]
+        if stale:
+            bpy.data.batch_remove(stale)
+        
+        # 候选被删除或重命名后，零件上的分组标记不再指向任何候选
+        proposals = {obj.name for obj in bpy.data.objects if 'urdf/segment_size' in obj}
+        for obj in bpy.data.objects:
+            if 'urdf/segment' in obj and obj['urdf/segment'] not in proposals:
+                del obj['urdf/segment']
+    
+    def proposal_collection(self, scene):
+        """获取或创建存放link候选的集合"""
+        collection = bpy.data.collections.get(self.SEGMENT_COLLECTION)
+        if collection is None:
+            collection = bpy.data.collections.new(self.SEGMENT_COLLECTION)
+        if collection.name not in scene.collection.children:
+            scene.collection.children.link(collection)
+        return collection
+    
+    def create_proposal(self, collection, number, members, lower, upper):
+        """在分组包围盒中心生成link空物体（new_link前缀，可直接一键命名）"""
+        empty = bpy.data.objects.new(f"new_link_seg{number:03d}", None)
+        empty.empty_display_type = 'ARROWS'
+        empty.empty_display_size = max(float((upper - lower).max()) * 0.25, 0.01)
+        empty.location = Vector(((lower + upper) / 2).tolist())
+        collection.objects.link(empty)
+        
+        set_phobostype(empty, 'link')
+        empty['urdf/segment_size'] = len(members)
+        for obj in members:
+            obj['urdf/segment'] = empty.name
+        
+        if self.bind_members:
+            empty.matrix_world = Matrix.Translation(empty.location)
+            bulk_parent(members, empty)
+        
+        print(f"  → {empty.name}: {len(members)} 个零件")
+
 class URDF_OT_RelevantBones(Operator):
     """Create relevant bones for robot links (replaces Ctrl+P functionality)"""
     bl_idname = "urdf.relevant_bones"
     bl_label = "Relevant Bones"
-    bl_description = "Set parent-child relationship: mesh can bind to link, link can bind to link"
+    bl_description = "Set parent-child relationship for all selected objects to the active link: mesh can bind to link, link can bind to link"
     bl_options = {'REGISTER', 'UNDO'}
     
     def execute(self, context):
         selected_objects = context.selected_objects
         
         # 验证选择数量
-        if len(selected_objects) != 2:
-            self.report({'WARNING'}, f"请选择两个对象，当前选择了 {len(selected_objects)} 个对象")
+        if len(selected_objects) < 2:
+            self.report({'WARNING'}, f"请至少选择两个对象，当前选择了 {len(selected_objects)} 个对象")
             return {'CANCELLED'}
         
-        # 获取活动对象作为父对象，另一个作为子对象
+        # 获取活动对象作为父对象，其余选中对象均作为子对象
         active_obj = context.active_object
         if active_obj not in selected_objects:
             self.report({'WARNING'}, "活动对象必须在选择的对象中")
             return {'CANCELLED'}
         
-        child_obj = None
-        for obj in selected_objects:
-            if obj != active_obj:
-                child_obj = obj
-                break
-        
         parent_obj = active_obj
+        child_objs = [obj for obj in selected_objects if obj != active_obj]
         
         # 识别对象类型
         def is_link_object(obj):
@@ -267,39 +3321,40 @@ class URDF_OT_RelevantBones(Operator):
                 return False
             return True
         
-        # 判断对象类型
-        child_is_mesh = is_mesh_object(child_obj)
-        child_is_link = is_link_object(child_obj)
         parent_is_link = is_link_object(parent_obj)
-        
-        print(f"子对象 {child_obj.name}: mesh={child_is_mesh}, link={child_is_link}")
         print(f"父对象 {parent_obj.name}: link={parent_is_link}")
         
-        # 验证绑定规则
-        valid_binding = False
-        binding_type = ""
+        # 一次性验证所有子对象的绑定规则
+        binding_counts = {"mesh → link": 0, "link → link": 0}
+        invalid = []
         
-        if child_is_mesh and parent_is_link:
-            valid_binding = True
-            binding_type = "mesh → link"
-        elif child_is_link and parent_is_link:
-            valid_binding = True
-            binding_type = "link → link"
+        for child_obj in child_objs:
+            child_is_mesh = is_mesh_object(child_obj)
+            child_is_link = is_link_object(child_obj)
+            
+            if child_is_mesh and parent_is_link:
+                binding_counts["mesh → link"] += 1
+            elif child_is_link and parent_is_link:
+                binding_counts["link → link"] += 1
+            else:
+                child_type = "mesh" if child_is_mesh else ("link" if child_is_link else "unknown")
+                invalid.append(f"{child_obj.name}({child_type})")
         
-        if not valid_binding:
-            child_type = "mesh" if child_is_mesh else ("link" if child_is_link else "unknown")
+        if invalid:
             parent_type = "link" if parent_is_link else "non-link"
+            print(f"不支持的绑定: {', '.join(invalid)} → {parent_obj.name}({parent_type})")
             self.report({'WARNING'}, 
-                       f"不支持的绑定类型: {child_type} → {parent_type}。"
+                       f"{len(invalid)} 个对象的绑定类型不支持（→ {parent_type}），如 {invalid[0]}。"
                        f"只允许 mesh→link 或 link→link 的绑定")
             return {'CANCELLED'}
         
+        binding_type = ", ".join(f"{name} ×{count}" for name, count in binding_counts.items() if count)
+        
         try:
-            # 清除所有选择
+            # 选择所有子对象和父对象，一次Phobos parent调用完成全部绑定
             bpy.ops.object.select_all(action='DESELECT')
-            
-            # 选择子对象和父对象
-            child_obj.select_set(True)
+            for child_obj in child_objs:
+                child_obj.select_set(True)
             parent_obj.select_set(True)
             # 确保父对象是活动对象
             context.view_layer.objects.active = parent_obj
@@ -309,16 +3364,16 @@ class URDF_OT_RelevantBones(Operator):
                 if hasattr(bpy.ops.phobos, 'parent'):
                     bpy.ops.phobos.parent()
                     self.report({'INFO'}, 
-                               f"成功建立 {binding_type} 关系: {child_obj.name} → {parent_obj.name}")
+                               f"成功建立 {binding_type} 关系: {len(child_objs)} 个对象 → {parent_obj.name}")
                     return {'FINISHED'}
             except Exception as e:
                 print(f"Phobos parent操作失败: {e}")
             
-            # 备用方案：使用标准Blender操作
-            bpy.ops.object.parent_set(type='OBJECT', keep_transform=True)
+            # 备用方案：直接批量设置父级
+            bulk_parent(child_objs, parent_obj)
             
             self.report({'INFO'}, 
-                       f"成功建立 {binding_type} 关系: {child_obj.name} → {parent_obj.name}")
+                       f"成功建立 {binding_type} 关系: {len(child_objs)} 个对象 → {parent_obj.name}")
             return {'FINISHED'}
             
         except Exception as e:
@@ -328,8 +3383,8 @@ class URDF_OT_RelevantBones(Operator):
     
     @classmethod
     def poll(cls, context):
-        # 确保有两个对象被选中且有活动对象
-        return (len(context.selected_objects) == 2 and 
+        # 确保至少有两个对象被选中且有活动对象
+        return (len(context.selected_objects) >= 2 and 
                 context.active_object is not None and
                 context.active_object in context.selected_objects)
 
@@ -360,6 +3415,11 @@ class URDF_OT_NameLinks(Operator):
             new_name = f"link{i}"
             link.name = new_name
             renamed_count += 1
+            # 自动划分的候选被采用后，零件上的分组标记跟随新名称
+            if 'urdf/segment_size' in link:
+                for obj in bpy.data.objects:
+                    if obj.get('urdf/segment') == old_name:
+                        obj['urdf/segment'] = link.name
             print(f"Renamed: {old_name} -> {new_name}")
         
         self.report({'INFO'}, f"Successfully renamed {renamed_count} links (link1 to link{renamed_count})")
@@ -606,6 +3666,163 @@ class URDF_OT_ParentToBase(Operator):
         # 确保场景中有对象
         return len(bpy.context.scene.objects) > 0
 
+class URDF_OT_AutoBindNearestLink(Operator):
+    """将未绑定的网格自动绑定到最近的link (Step 7b 自动版)"""
+    bl_idname = "urdf.auto_bind_nearest_link"
+    bl_label = "Auto Bind Meshes to Nearest Link"
+    bl_description = "用KD树索引已有link的几何和原点，把每个未绑定网格分配给最近或包含它的link，输出置信度报告后一次性批量绑定"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    max_distance: FloatProperty(
+        name="Max Distance",
+        description="超过该距离的网格不绑定（0表示不限制）",
+        default=0.0,
+        min=0.0
+    )
+    
+    min_confidence: EnumProperty(
+        name="Min Confidence",
+        description="只绑定置信度不低于该等级的网格",
+        items=[
+            ('LOW', 'Low', '全部绑定'),
+            ('MEDIUM', 'Medium', '绑定中、高置信度的网格'),
+            ('HIGH', 'High', '只绑定高置信度的网格'),
+        ],
+        default='MEDIUM'
+    )
+    
+    dry_run: BoolProperty(
+        name="Report Only",
+        description="只输出分配报告，不执行绑定",
+        default=False
+    )
+    
+    samples_per_link: IntProperty(
+        name="Samples per Link",
+        description="每个link几何体最多抽样的顶点数",
+        default=2000,
+        min=10
+    )
+    
+    samples_per_mesh: IntProperty(
+        name="Samples per Mesh",
+        description="每个待绑定网格用于查询的最多顶点数",
+        default=64,
+        min=1
+    )
+    
+    CONFIDENCE_LEVELS = {'LOW': 0, 'MEDIUM': 1, 'HIGH': 2}
+    
+    def execute(self, context):
+        scene = context.scene
+        links = [obj for obj in scene.objects if is_link_object(obj)]
+        if not links:
+            self.report({'ERROR'}, "场景中没有link对象")
+            return {'CANCELLED'}
+        
+        unbound = [obj for obj in scene.objects
+                   if obj.type == 'MESH' and obj.parent is None and not is_link_object(obj)]
+        if not unbound:
+            self.report({'INFO'}, "没有找到需要绑定的未绑定网格")
+            return {'FINISHED'}
+        
+        print(f"\n{'='*60}")
+        print(f"自动绑定: {len(unbound)} 个未绑定网格, {len(links)} 个link")
+        print(f"{'='*60}")
+        
+        tree, bounds = self.build_link_index(scene, links)
+        assignments = [self.assign(obj, tree, bounds, links) for obj in unbound]
+        
+        threshold = self.CONFIDENCE_LEVELS[self.min_confidence]
+        to_bind = {}
+        print(f"  {'网格':<28}{'link':<20}{'距离':>10}{'票数':>8}  置信度")
+        for obj, (link, distance, vote_ratio, level) in zip(unbound, assignments):
+            level_name = ('LOW', 'MEDIUM', 'HIGH')[level]
+            accepted = link is not None and level >= threshold
+            link_name = link.name if link else "-"
+            mark = "✓" if accepted else "✗"
+            print(f"  {mark} {obj.name:<26}{link_name:<20}{distance:>10.4f}{vote_ratio:>8.0%}  {level_name}")
+            if accepted:
+                to_bind.setdefault(link, []).append(obj)
+        
+        bind_count = sum(len(objs) for objs in to_bind.values())
+        if self.dry_run:
+            self.report({'INFO'}, f"报告模式: {bind_count}/{len(unbound)} 个网格可绑定，详见控制台")
+            return {'FINISHED'}
+        
+        # 一次性批量绑定
+        for link, objs in to_bind.items():
+            bulk_parent(objs, link)
+        context.view_layer.update()
+        
+        print(f"\n✓ 绑定完成: {bind_count}/{len(unbound)} 个网格")
+        print(f"{'='*60}\n")
+        self.report({'INFO'}, f"已自动绑定 {bind_count}/{len(unbound)} 个网格")
+        return {'FINISHED'}
+    
+    def build_link_index(self, scene, links):
+        """KD树索引每个link的原点及其已绑定几何的抽样顶点"""
+        link_index = {link: i for i, link in enumerate(links)}
+        points = [np.array([list(link.matrix_world.translation) for link in links])]
+        owners = [np.arange(len(links))]
+        
+        for obj in scene.objects:
+            if obj.type != 'MESH' or is_link_object(obj):
+                continue
+            link = find_parent_link(obj)
+            if link not in link_index:
+                continue
+            sample = sample_world_vertices(obj, self.samples_per_link)
+            points.append(sample)
+            owners.append(np.full(len(sample), link_index[link]))
+        
+        points = np.concatenate(points)
+        owners = np.concatenate(owners)
+        
+        # link包围盒用于判断包含关系
+        lower = np.full((len(links), 3), np.inf)
+        upper = np.full((len(links), 3), -np.inf)
+        np.minimum.at(lower, owners, points)
+        np.maximum.at(upper, owners, points)
+        
+        tree = KDTree(len(points))
+        for i, co in enumerate(points):
+            tree.insert(co.tolist(), int(owners[i]))
+        tree.balance()
+        return tree, (lower, upper)
+    
+    def assign(self, obj, tree, bounds, links):
+        """投票选出最近的link，返回 (link, 距离, 得票率, 置信度等级)"""
+        queries = sample_world_vertices(obj, self.samples_per_mesh)
+        if not len(queries):
+            queries = np.array([list(obj.matrix_world.translation)])
+        center = (queries.min(axis=0) + queries.max(axis=0)) / 2
+        queries = np.vstack([center, queries])
+        
+        votes = np.zeros(len(links))
+        nearest = np.full(len(links), np.inf)
+        for co in queries:
+            _, index, distance = tree.find(co.tolist())
+            votes[index] += 1
+            nearest[index] = min(nearest[index], distance)
+        
+        winner = int(np.argmax(votes))
+        distance = float(nearest[winner])
+        vote_ratio = votes[winner] / len(queries)
+        
+        if self.max_distance > 0 and distance > self.max_distance:
+            return None, distance, vote_ratio, 0
+        
+        lower, upper = bounds
+        contained = bool(np.all(center >= lower[winner]) and np.all(center <= upper[winner]))
+        if vote_ratio >= 0.8 or (contained and vote_ratio >= 0.5):
+            level = 2
+        elif vote_ratio >= 0.5 or contained:
+            level = 1
+        else:
+            level = 0
+        return links[winner], distance, vote_ratio, level
+
 class URDF_OT_SetModuleRoot(Operator):
     """设置模型根目录并命名为URDF_Data (Step 8) - 针对base_link对象"""
     bl_idname = "urdf.set_module_root"
@@ -942,6 +4159,50 @@ class URDF_OT_SetModuleRoot(Operator):
         # 确保场景中有名为base_link的对象
         return any(obj.name == "base_link" for obj in bpy.context.scene.objects)
 
+class URDF_OT_NormalizeTransforms(Operator):
+    """批量归一化所有link和网格的变换（不仅限于base_link）"""
+    bl_idname = "urdf.normalize_transforms"
+    bl_label = "Normalize All Transforms"
+    bl_description = "检测所有link和网格的异常缩放/剪切，将其写入网格顶点数据，使所有对象只保留刚体变换"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    tolerance: FloatProperty(
+        name="Tolerance",
+        description="判定变换为刚体变换的容差",
+        default=0.0001,
+        min=0.0,
+        precision=6
+    )
+    
+    def execute(self, context):
+        objects = [obj for obj in context.scene.objects
+                   if obj.type == 'MESH' or is_link_object(obj)]
+        if not objects:
+            self.report({'WARNING'}, "场景中未找到link或网格对象")
+            return {'CANCELLED'}
+        
+        print(f"\n{'='*60}")
+        print(f"开始检查 {len(objects)} 个link/网格对象的变换...")
+        print(f"{'='*60}")
+        
+        try:
+            result = normalize_object_transforms(objects, self.tolerance)
+            context.view_layer.update()
+        except Exception as e:
+            self.report({'ERROR'}, f"变换归一化失败: {str(e)}")
+            print(f"变换归一化错误: {e}")
+            return {'CANCELLED'}
+        
+        print(f"✓ 修复对象: {result['objects']}")
+        print(f"✓ 改写网格: {result['meshes']}（其中新复制 {result['copies']} 个共享网格）")
+        print(f"{'='*60}\n")
+        
+        if result['objects']:
+            self.report({'INFO'}, f"已归一化 {result['objects']} 个对象的变换")
+        else:
+            self.report({'INFO'}, "所有对象变换正常")
+        return {'FINISHED'}
+
 class URDF_OT_SelectExportPathAndExport(Operator):
     """选择导出路径并执行Phobos导出 (替代原9b功能)"""
     bl_idname = "urdf.select_export_path_and_export"
@@ -949,35 +4210,143 @@ class URDF_OT_SelectExportPathAndExport(Operator):
     bl_description = "选择导出路径并使用Phobos导出URDF模型"
     bl_options = {'REGISTER', 'UNDO'}
     
-    # 文件路径属性
-    filepath: StringProperty(
-        name="Export Path",
-        description="Choose export directory",
-        subtype='DIR_PATH'
+    # 文件路径属性
+    filepath: StringProperty(
+        name="Export Path",
+        description="Choose export directory",
+        subtype='DIR_PATH'
+    )
+    
+    # 导出选项
+    export_urdf: BoolProperty(
+        name="Export URDF",
+        description="Export URDF format",
+        default=True
+    )
+    
+    export_joint_limits: BoolProperty(
+        name="Export Joint Limits", 
+        description="Export joint limits",
+        default=True
+    )
+    
+    mesh_format: EnumProperty(
+        name="Mesh Format",
+        description="Mesh export format",
+        items=[
+            ('dae', 'DAE (Collada)', 'Export meshes as DAE format'),
+            ('stl', 'STL', 'Export meshes as STL format'),
+            ('obj', 'OBJ', 'Export meshes as OBJ format'),
+            ('glb', 'GLB (glTF)', 'Export meshes as binary glTF with materials'),
+        ],
+        default='dae'
+    )
+    
+    glb_quantize: BoolProperty(
+        name="Quantize GLB",
+        description="GLB顶点位置量化为16位整数（KHR_mesh_quantization），文件更小；读取端需支持该扩展",
+        default=False
+    )
+    
+    consolidate_materials: EnumProperty(
+        name="Consolidate Materials",
+        description="导出时把基础色/粗糙度/金属度等效的visual材质合并为共享调色板（场景本身不被修改）",
+        items=[
+            ('NONE', 'Off', '不合并材质'),
+            ('LINK', 'Per Link', '在每个link内合并等效材质'),
+            ('ROBOT', 'Per Robot', '在整个机器人范围内合并等效材质'),
+        ],
+        default='NONE'
+    )
+    
+    material_tolerance: FloatProperty(
+        name="Tolerance",
+        description="基础色/粗糙度/金属度按该步长取整后相同的材质视为等效",
+        default=0.01,
+        min=0.0001,
+        max=0.5
+    )
+    
+    bake_vertex_colors: BoolProperty(
+        name="Bake to Vertex Colors",
+        description="把纯色材质的颜色烘焙为顶点色，每个合并范围只保留一个调色板材质（仅DAE格式能保存顶点色）",
+        default=False
+    )
+    
+    optimize_mesh_files: BoolProperty(
+        name="Optimize Mesh Files",
+        description="导出后精简DAE/OBJ网格文件：按visual/collision用途去掉不需要的属性、降低浮点精度并焊接重复顶点",
+        default=False
+    )
+    
+    visual_strip: EnumProperty(
+        name="Visual: Drop",
+        description="visual网格中去掉的属性",
+        items=[
+            ('NORMAL', 'Normals', '去掉法线'),
+            ('TEXCOORD', 'UVs', '去掉UV坐标'),
+            ('COLOR', 'Colors', '去掉顶点色'),
+        ],
+        options={'ENUM_FLAG'},
+        default=set()
+    )
+    
+    collision_strip: EnumProperty(
+        name="Collision: Drop",
+        description="collision网格中去掉的属性（碰撞检测只需要顶点位置）",
+        items=[
+            ('NORMAL', 'Normals', '去掉法线'),
+            ('TEXCOORD', 'UVs', '去掉UV坐标'),
+            ('COLOR', 'Colors', '去掉顶点色'),
+        ],
+        options={'ENUM_FLAG'},
+        default={'NORMAL', 'TEXCOORD', 'COLOR'}
+    )
+    
+    mesh_decimals: IntProperty(
+        name="Decimals",
+        description="网格浮点数保留的小数位数（顶点坐标以米为单位时5位即0.01毫米）",
+        default=6,
+        min=1,
+        max=9
     )
     
-    # 导出选项
-    export_urdf: BoolProperty(
-        name="Export URDF",
-        description="Export URDF format",
+    weld_vertices: BoolProperty(
+        name="Weld Vertices",
+        description="精简后合并位置相同的顶点（保留顶点色时不焊接）",
         default=True
     )
     
-    export_joint_limits: BoolProperty(
-        name="Export Joint Limits", 
-        description="Export joint limits",
-        default=True
+    optimize_textures: BoolProperty(
+        name="Optimize Textures",
+        description="导出后把网格引用的纹理缩小到最大边长并重新编码，内容相同的纹理只保留一份；结果按内容缓存，跨导出复用",
+        default=False
     )
     
-    mesh_format: EnumProperty(
-        name="Mesh Format",
-        description="Mesh export format",
+    texture_max_size: IntProperty(
+        name="Max Size",
+        description="纹理最大边长（像素）",
+        default=1024,
+        min=16,
+        max=16384
+    )
+    
+    texture_format: EnumProperty(
+        name="Texture Format",
+        description="重新编码的格式（带透明通道的纹理始终为PNG）",
         items=[
-            ('dae', 'DAE (Collada)', 'Export meshes as DAE format'),
-            ('stl', 'STL', 'Export meshes as STL format'),
-            ('obj', 'OBJ', 'Export meshes as OBJ format'),
+            ('JPEG', 'JPEG', '有损压缩，文件最小'),
+            ('PNG', 'PNG', '无损压缩'),
         ],
-        default='dae'
+        default='JPEG'
+    )
+    
+    texture_quality: IntProperty(
+        name="Quality",
+        description="JPEG压缩质量",
+        default=85,
+        min=10,
+        max=100
     )
     
     model_name: StringProperty(
@@ -986,6 +4355,30 @@ class URDF_OT_SelectExportPathAndExport(Operator):
         default="robot_model"
     )
     
+    merge_link_meshes: BoolProperty(
+        name="Merge Link Meshes",
+        description="导出时将每个link下的所有visual网格合并为一个网格（场景本身不被修改）",
+        default=False
+    )
+    
+    collapse_fixed_joints: BoolProperty(
+        name="Collapse Fixed Joints",
+        description="导出时将固定关节（或未设置关节类型）的link子树合并到最近的可动祖先link，减少仿真刚体数量",
+        default=False
+    )
+    
+    export_sdf: BoolProperty(
+        name="Export SDF",
+        description="同时在导出目录写出Gazebo模型（model.sdf与model.config），复用已导出的网格文件",
+        default=False
+    )
+    
+    verify_after_export: BoolProperty(
+        name="Verify After Export",
+        description="导出后校验URDF：检查引用网格是否存在、可读且非空，并与场景的link/关节数量比较",
+        default=True
+    )
+    
     def execute(self, context):
         try:
             print(f"\n{'='*60}")
@@ -993,7 +4386,14 @@ class URDF_OT_SelectExportPathAndExport(Operator):
             print(f"导出路径: {self.filepath}")
             print(f"模型名称: {self.model_name}")
             print(f"导出格式: URDF={self.export_urdf}, Joint Limits={self.export_joint_limits}")
-            print(f"网格格式: {self.mesh_format}")
+            print(f"网格格式: {self.mesh_format}" + (" (量化)" if self.mesh_format == 'glb' and self.glb_quantize else ""))
+            print(f"合并link网格: {self.merge_link_meshes}")
+            print(f"合并固定关节: {self.collapse_fixed_joints}")
+            print(f"合并材质: {self.consolidate_materials}" + (" (烘焙顶点色)" if self.consolidate_materials != 'NONE' and self.bake_vertex_colors else ""))
+            print(f"精简网格文件: {self.optimize_mesh_files}")
+            print(f"压缩纹理: {self.optimize_textures}" + (f" (≤{self.texture_max_size}px, {self.texture_format})" if self.optimize_textures else ""))
+            print(f"导出SDF: {self.export_sdf}")
+            print(f"导出后校验: {self.verify_after_export}")
             print(f"{'='*60}")
             
             # 检查Phobos可用性
@@ -1012,8 +4412,43 @@ class URDF_OT_SelectExportPathAndExport(Operator):
                 self.report({'ERROR'}, "导出设置配置失败")
                 return {'CANCELLED'}
             
-            # 执行导出
-            export_result = self.execute_phobos_export(context)
+            # 执行导出（临时修改在导出后全部撤销）
+            edits = TemporaryExportEdits()
+            expected = None
+            try:
+                if self.collapse_fixed_joints:
+                    self.collapse_fixed_links(context, edits)
+                if self.consolidate_materials != 'NONE':
+                    self.consolidate_visual_materials(context, edits)
+                if self.merge_link_meshes:
+                    self.merge_visuals_per_link(context, edits)
+                # 烘焙在合并网格之后进行，合并后的临时网格同样带顶点色
+                if self.consolidate_materials != 'NONE' and self.bake_vertex_colors:
+                    if self.mesh_format == 'dae':
+                        self.bake_material_colors(context, edits)
+                    else:
+                        # STL/OBJ/GLB不写顶点色，烘焙后整个机器人会变成白色
+                        print(f"  ! {self.mesh_format.upper()}格式不保存顶点色，跳过烘焙")
+                # 校验用的数量需在撤销前统计，否则被合并的固定link会重新计入
+                expected = scene_link_joint_counts(context.scene)
+                export_result = self.execute_phobos_export(context)
+                if export_result and self.optimize_mesh_files:
+                    self.optimize_exported_meshes(context)
+                if export_result and self.optimize_textures:
+                    self.optimize_exported_textures(context)
+                if export_result and self.mesh_format == 'glb':
+                    self.convert_meshes_to_glb(context)
+                # SDF在临时修改撤销前写出，与URDF保持一致
+                if export_result and self.export_sdf:
+                    self.export_sdf_model(context)
+            finally:
+                edits.restore()
+            
+            if export_result and self.verify_after_export:
+                errors, warnings = self.verify_export(context, expected)
+                if errors:
+                    self.report({'WARNING'}, f"URDF已导出但校验发现 {len(errors)} 个错误（详见控制台）")
+                    return {'FINISHED'}
             
             if export_result:
                 self.report({'INFO'}, f"URDF导出完成: {self.filepath}")
@@ -1127,22 +4562,23 @@ class URDF_OT_SelectExportPathAndExport(Operator):
             # 设置导出格式 - models
             scene.export_entity_urdf = self.export_urdf
             scene.export_entity_joint_limits = self.export_joint_limits
-            scene.export_entity_sdf = False  # 禁用SDF
+            scene.export_entity_sdf = False  # 禁用Phobos的SDF，SDF由export_sdf选项单独写出
             scene.export_entity_smurf = False  # 禁用SMURF
             
             print(f"    ✓ Model格式: URDF={self.export_urdf}, Joint Limits={self.export_joint_limits}")
             
-            # 设置网格格式
+            # 设置网格格式（Phobos不支持GLB：先导出STL，导出后再转换为GLB）
+            phobos_format = 'stl' if self.mesh_format == 'glb' else self.mesh_format
             if hasattr(export_settings, 'export_urdf_mesh_type'):
-                export_settings.export_urdf_mesh_type = self.mesh_format
-                print(f"    ✓ URDF mesh格式: {self.mesh_format}")
+                export_settings.export_urdf_mesh_type = phobos_format
+                print(f"    ✓ URDF mesh格式: {phobos_format}")
             
             # 设置mesh导出选项
-            scene.export_mesh_dae = (self.mesh_format == 'dae')
-            scene.export_mesh_stl = (self.mesh_format == 'stl')  
-            scene.export_mesh_obj = (self.mesh_format == 'obj')
+            scene.export_mesh_dae = (phobos_format == 'dae')
+            scene.export_mesh_stl = (phobos_format == 'stl')  
+            scene.export_mesh_obj = (phobos_format == 'obj')
             
-            print(f"    ✓ Mesh导出: DAE={self.mesh_format=='dae'}, STL={self.mesh_format=='stl'}, OBJ={self.mesh_format=='obj'}")
+            print(f"    ✓ Mesh导出: DAE={phobos_format=='dae'}, STL={phobos_format=='stl'}, OBJ={phobos_format=='obj'}")
             
             # 设置路径类型为相对路径
             export_settings.urdfOutputPathtype = 'relative'
@@ -1158,6 +4594,524 @@ class URDF_OT_SelectExportPathAndExport(Operator):
             print(f"  ✗ 配置导出设置失败: {e}")
             return False
     
+    def collapse_fixed_links(self, context, edits):
+        """把固定关节link的子对象转移到最近的可动祖先，并合并惯量"""
+        print("  合并固定关节link...")
+        links, parent_links = collect_link_tree(context.scene)
+        
+        def is_fixed(link):
+            return (parent_links.get(link) is not None and
+                    link.get('joint/type') not in MOVABLE_JOINT_TYPES)
+        
+        def movable_ancestor(link):
+            while is_fixed(link):
+                link = parent_links[link]
+            return link
+        
+        fixed_links = [link for link in links if is_fixed(link)]
+        if not fixed_links:
+            print("  ✓ 没有固定关节link")
+            return 0
+        
+        absorbed = {}
+        for link in fixed_links:
+            absorbed.setdefault(movable_ancestor(link), []).append(link)
+        
+        # 合并惯量需要在转移子对象之前读取
+        for target, sources in absorbed.items():
+            self.merge_inertials(context, edits, target, sources)
+        
+        assignments = []
+        for link in fixed_links:
+            target = movable_ancestor(link)
+            for child in link.children:
+                # 固定的子link会被一并合并，其子对象在各自循环中处理
+                if child.name in context.scene.objects and not is_fixed(child):
+                    assignments.append((child, target))
+        edits.reparent_many(context, assignments)
+        
+        for link in fixed_links:
+            edits.hide_object(link)
+        
+        for target, sources in absorbed.items():
+            names = ", ".join(source.name for source in sources)
+            print(f"    ✓ {target.name} ← {names}")
+        print(f"  ✓ 共合并 {len(fixed_links)} 个固定关节link")
+        return len(fixed_links)
+    
+    def merge_inertials(self, context, edits, target, sources):
+        """按平行轴定理把目标link及被合并link的惯量合成为一个临时inertial对象"""
+        inertials = []
+        for link in [target] + sources:
+            inertials.extend(child for child in link.children
+                             if get_phobostype(child) == 'inertial' and 'inertial/mass' in child)
+        if not any(inertial.parent in sources for inertial in inertials):
+            return
+        
+        items = []
+        for inertial in inertials:
+            world = matrix_to_numpy(inertial.matrix_world)
+            rotation = polar_decompose(world[:3, :3])[0]
+            local = inertia_to_matrix(inertial.get('inertial/inertia', [0.0] * 6))
+            items.append((float(inertial['inertial/mass']), world[:3, 3],
+                          rotation @ local @ rotation.T))
+        mass, com, inertia = combine_inertials(items)
+        
+        # 惯量表示在目标link的朝向下
+        target_world = matrix_to_numpy(target.matrix_world)
+        target_rotation = polar_decompose(target_world[:3, :3])[0]
+        link_name = target.get('link/name', target.name)
+        
+        merged = bpy.data.objects.new(f"inertial_{link_name}", None)
+        collection = target.users_collection[0] if target.users_collection else context.scene.collection
+        edits.add_object(merged, collection)
+        world = np.eye(4)
+        world[:3, :3] = target_rotation
+        world[:3, 3] = com
+        merged.parent = target
+        merged.matrix_parent_inverse = target.matrix_world.inverted()
+        merged.matrix_basis = Matrix(world.tolist())
+        
+        set_phobostype(merged, 'inertial')
+        merged['inertial/mass'] = mass
+        merged['inertial/inertia'] = matrix_to_inertia(target_rotation.T @ inertia @ target_rotation)
+        
+        for inertial in inertials:
+            edits.hide_object(inertial)
+        print(f"    ✓ {link_name}: 合并 {len(inertials)} 个惯量, 质量 {mass:.4g}")
+    
+    def material_scopes(self, context):
+        """按合并范围分组visual，返回 [(范围名称, [visual, ...]), ...]"""
+        groups = collect_link_visuals(context.scene)
+        if self.consolidate_materials == 'LINK':
+            return [(link.get('link/name', link.name), visuals) for link, visuals in groups.items()]
+        model_name = self.model_name or get_model_name(context.scene)
+        return [(model_name, [visual for visuals in groups.values() for visual in visuals])]
+    
+    def consolidate_visual_materials(self, context, edits):
+        """把等效的纯色材质替换为同一个代表材质（带纹理的材质保持不变）"""
+        print("  合并等效材质...")
+        before = set()
+        after = set()
+        for _, visuals in self.material_scopes(context):
+            palette = {}
+            for obj in visuals:
+                materials = [slot.material for slot in obj.material_slots]
+                replaced = []
+                for material in materials:
+                    parameters = material_parameters(material) if material is not None else None
+                    if parameters is None:
+                        replaced.append(material)
+                        continue
+                    key = tuple(np.round(parameters / self.material_tolerance).astype(np.int64))
+                    replaced.append(palette.setdefault(key, material))
+                before.update(material for material in materials if material is not None)
+                after.update(material for material in replaced if material is not None)
+                if any(new is not old for new, old in zip(replaced, materials)):
+                    edits.set_slot_materials(obj, replaced)
+        print(f"  ✓ visual材质 {len(before)} → {len(after)} 个")
+        return len(after)
+    
+    def bake_material_colors(self, context, edits):
+        """把纯色材质的颜色写入面角颜色，每个范围的visual共用一个白色调色板材质"""
+        print("  烘焙材质颜色为顶点色...")
+        baked = palettes = copied = 0
+        for name, visuals in self.material_scopes(context):
+            candidates = []
+            for obj in visuals:
+                materials = [slot.material for slot in obj.material_slots]
+                parameters = [material_parameters(material) if material is not None else None
+                              for material in materials]
+                # 有纹理或空材质槽的对象保持原样
+                if obj.type != 'MESH' or not materials or any(p is None for p in parameters):
+                    continue
+                candidates.append((obj, np.array(parameters)))
+            if not candidates:
+                continue
+            
+            stacked = np.concatenate([parameters for _, parameters in candidates])
+            palette = bpy.data.materials.new(f"{name}_palette")
+            edits.add_material(palette)
+            palette.diffuse_color = (1.0, 1.0, 1.0, 1.0)
+            palette.roughness = float(np.median(stacked[:, 4]))
+            palette.metallic = float(np.median(stacked[:, 5]))
+            palettes += 1
+            
+            # 共享同一网格数据（且材质相同）的实例共用一个烘焙副本，导出时仍只写出一个网格文件
+            copies = {}
+            for obj, parameters in candidates:
+                key = (obj.data.name, tuple(slot.material.name for slot in obj.material_slots))
+                mesh = copies.get(key)
+                if mesh is None:
+                    mesh = obj.data.copy()
+                    arrays = read_mesh_arrays(mesh)
+                    faces = np.clip(arrays['mat_idx'], 0, len(parameters) - 1)
+                    write_corner_colors(mesh, parameters[np.repeat(faces, arrays['loop_total']), :4])
+                    # 保持材质槽数量不变，对象级材质槽才不会丢失
+                    for index in range(len(mesh.materials)):
+                        mesh.materials[index] = palette
+                    copies[key] = mesh
+                    copied += 1
+                edits.replace_data(obj, mesh)
+                edits.set_slot_materials(obj, [palette] * len(obj.material_slots))
+                baked += 1
+        print(f"  ✓ 已烘焙 {baked} 个visual（{copied} 个网格副本），{palettes} 个调色板材质")
+        return baked
+    
+    def merge_visuals_per_link(self, context, edits):
+        """按link合并visual网格：在link坐标系下拼接缓冲区并生成临时网格"""
+        print("  合并每个link下的visual网格...")
+        merged_count = 0
+        
+        for link, visuals in collect_link_visuals(context.scene).items():
+            if len(visuals) < 2:
+                continue
+            
+            # 保留着色、自定义法线、UV和颜色层，合并后的导出结果与未合并时一致
+            arrays, materials = merge_objects_to_arrays(visuals, link.matrix_world, layers=True)
+            if not len(arrays['loop_start']):
+                continue
+            
+            link_name = link.get('link/name', link.name)
+            mesh = build_mesh_from_arrays(f"{link_name}_visual", arrays, materials)
+            merged = bpy.data.objects.new(f"{link_name}_visual", mesh)
+            
+            collection = link.users_collection[0] if link.users_collection else context.scene.collection
+            edits.add_object(merged, collection)
+            
+            # 沿用原visual的父级方式（Phobos可能使用骨骼父级）
+            merged.parent = link
+            direct = next((v for v in visuals if v.parent == link), None)
+            if direct is not None:
+                merged.parent_type = direct.parent_type
+                merged.parent_bone = direct.parent_bone
+            merged.matrix_world = link.matrix_world.copy()
+            
+            set_phobostype(merged, 'visual')
+            merged['geometry/type'] = 'mesh'
+            
+            for visual in visuals:
+                edits.hide_object(visual)
+            
+            merged_count += 1
+            print(f"    ✓ {link_name}: {len(visuals)} 个visual → 1 个网格 "
+                  f"({len(arrays['co'])} 顶点, {len(materials)} 个材质槽)")
+        
+        print(f"  ✓ 共合并 {merged_count} 个link的visual网格")
+        return merged_count
+    
+    def optimize_exported_meshes(self, context):
+        """按URDF中的用途精简导出的DAE/OBJ文件（同时被visual引用的文件按visual处理）"""
+        import os
+        import xml.etree.ElementTree as ET
+        if self.mesh_format not in ('dae', 'obj'):
+            print(f"  ! {self.mesh_format.upper()}格式不需要精简，跳过")
+            return 0
+        directory = bpy.path.abspath(self.filepath)
+        candidates = find_urdf_files(directory) if os.path.isdir(directory) else []
+        if not candidates:
+            print("  ! 导出目录中没有找到URDF文件，跳过网格精简")
+            return 0
+        urdf_path = candidates[0]
+        urdf_dir = os.path.dirname(urdf_path)
+        print("  精简网格文件...")
+        
+        drops = {}
+        for element in ET.parse(urdf_path).getroot().iter():
+            if element.tag not in ('visual', 'collision'):
+                continue
+            drop = set(self.visual_strip if element.tag == 'visual' else self.collision_strip)
+            for mesh in element.iter('mesh'):
+                path = resolve_urdf_mesh_path(mesh.get('filename', ''), urdf_dir)
+                if path is None:
+                    continue
+                # 多处引用同一文件时只去掉所有用途都不需要的属性
+                drops[path] = drops[path] & drop if path in drops else drop
+        
+        before = after = optimized = 0
+        ET.register_namespace('', COLLADA_NAMESPACE)
+        for path, drop in sorted(drops.items()):
+            extension = os.path.splitext(path)[1].lower()
+            if extension not in ('.dae', '.obj'):
+                continue
+            try:
+                before += os.path.getsize(path)
+                if extension == '.obj':
+                    with open(path, 'r', encoding='utf-8') as f:
+                        text = optimize_obj_text(f.read(), drop, self.mesh_decimals, self.weld_vertices)
+                    with open(path, 'w', encoding='utf-8') as f:
+                        f.write(text)
+                else:
+                    tree = optimize_dae_tree(ET.parse(path), drop, self.mesh_decimals, self.weld_vertices)
+                    tree.write(path, encoding='utf-8', xml_declaration=True)
+                after += os.path.getsize(path)
+                optimized += 1
+                dropped = ", ".join(sorted(drop)) or "无"
+                print(f"    ✓ {os.path.basename(path)}: 去掉 {dropped}")
+            except Exception as e:
+                print(f"    ✗ 精简失败 {os.path.basename(path)}: {e}")
+        
+        print(f"  ✓ 已精简 {optimized} 个网格文件 ({before/1024:.1f} KB → {after/1024:.1f} KB)")
+        return optimized
+    
+    def optimize_exported_textures(self, context):
+        """缩小并重新编码导出网格引用的纹理
+
+        并行计算内容哈希，内容相同的纹理只处理一次；处理结果按 哈希+设置 缓存在
+        用户数据目录中，再次导出时直接复制。Blender图像API不是线程安全的，
+        解码、缩放和编码在主线程进行。
+        """
+        import os
+        import json
+        import shutil
+        from concurrent.futures import ThreadPoolExecutor
+        directory = bpy.path.abspath(self.filepath)
+        texture_dir = os.path.join(directory, "textures")
+        references = collect_texture_references(directory) if os.path.isdir(directory) else {}
+        # textures/ 中是之前处理过的结果，不再重复编码
+        sources = sorted({path for items in references.values() for _, path in items
+                          if not path.startswith(os.path.normpath(texture_dir) + os.sep)})
+        if not sources:
+            print("  ✓ 导出的网格没有引用纹理")
+            return 0
+        print(f"  压缩纹理 ({len(sources)} 个)...")
+        
+        with ThreadPoolExecutor() as executor:
+            hashes = dict(zip(sources, executor.map(file_sha1, sources)))
+        before = sum(os.path.getsize(path) for path in sources)
+        
+        cache_dir = texture_cache_directory()
+        index_path = os.path.join(cache_dir, "index.json")
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        
+        settings = f"{self.texture_max_size}_{self.texture_format}_{self.texture_quality}"
+        os.makedirs(texture_dir, exist_ok=True)
+        outputs = {}
+        copies = []
+        encoded = hits = 0
+        for source in sources:
+            digest = hashes[source]
+            if digest in outputs:
+                continue
+            key = f"{digest}_{settings}"
+            entry = index.get(key)
+            cached = os.path.join(cache_dir, entry['file']) if entry else None
+            if cached is not None and os.path.isfile(cached):
+                hits += 1
+            else:
+                try:
+                    cached, original, size = encode_texture(source, os.path.join(cache_dir, key), self.texture_max_size,
+                                                            self.texture_format, self.texture_quality)
+                except Exception as e:
+                    print(f"    ✗ 纹理处理失败 {os.path.basename(source)}: {e}")
+                    continue
+                index[key] = {'file': os.path.basename(cached), 'source': os.path.basename(source),
+                              'original': list(original), 'size': list(size)}
+                encoded += 1
+                print(f"    ✓ {os.path.basename(source)}: {original[0]}x{original[1]} → {size[0]}x{size[1]}")
+            
+            stem = sanitize_filename(os.path.splitext(os.path.basename(source))[0])
+            target = os.path.join(texture_dir, f"{stem}_{digest[:8]}{os.path.splitext(cached)[1]}")
+            outputs[digest] = target
+            copies.append((cached, target))
+        
+        with ThreadPoolExecutor() as executor:
+            list(executor.map(lambda pair: shutil.copyfile(*pair), copies))
+        with open(index_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=1)
+        
+        for owner, items in references.items():
+            mapping = {}
+            for reference, path in items:
+                target = outputs.get(hashes.get(path))
+                if target is not None:
+                    mapping[reference] = os.path.relpath(target, os.path.dirname(owner)).replace(os.sep, '/')
+            if mapping:
+                rewrite_texture_references(owner, mapping)
+        
+        # 导出目录中被替换的原纹理副本已无引用
+        root = os.path.normpath(directory) + os.sep
+        written = set(outputs.values())
+        for source in sources:
+            if source.startswith(root) and source not in written and hashes[source] in outputs:
+                os.remove(source)
+        
+        after = sum(os.path.getsize(path) for path in written)
+        print(f"  ✓ {len(sources)} 个纹理 → {len(outputs)} 个（新编码 {encoded}, 缓存命中 {hits}）"
+              f"({before/1048576:.1f} MB → {after/1048576:.1f} MB)")
+        return len(outputs)
+    
+    def mesh_file_sources(self, context, urdf_path):
+        """按URDF中visual/collision元素的名称找回导出时的网格数据，返回 {网格文件路径: 网格}
+        
+        Phobos写出的文件名经过清理和去重（如追加_1），不能按文件名反查bpy.data.meshes；
+        需在临时修改撤销前调用。不同网格数据对应到同一文件时不做对应。
+        """
+        import os
+        import xml.etree.ElementTree as ET
+        urdf_dir = os.path.dirname(urdf_path)
+        objects = {}
+        for obj in context.scene.objects:
+            if obj.type == 'MESH':
+                objects.setdefault(obj.name, obj)
+        for obj in context.scene.objects:
+            for kind in ('visual', 'collision'):
+                name = obj.get(f'{kind}/name')
+                if obj.type == 'MESH' and isinstance(name, str):
+                    objects[name] = obj
+        
+        sources = {}
+        conflicts = set()
+        for element in ET.parse(urdf_path).getroot().iter():
+            if element.tag not in ('visual', 'collision'):
+                continue
+            obj = objects.get(element.get('name', ''))
+            if obj is None:
+                continue
+            for mesh in element.iter('mesh'):
+                path = resolve_urdf_mesh_path(mesh.get('filename', ''), urdf_dir)
+                if path is None:
+                    continue
+                key = os.path.normcase(os.path.abspath(path))
+                if sources.setdefault(key, obj.data) != obj.data:
+                    conflicts.add(key)
+        for key in conflicts:
+            del sources[key]
+        return sources
+    
+    def glb_material_parameters(self, material):
+        """GLB材质参数：优先Principled BSDF的基础色/粗糙度/金属度，基础色接了纹理时退回视图颜色"""
+        parameters = material_parameters(material)
+        if parameters is None:
+            parameters = list(material.diffuse_color) + [material.roughness, material.metallic]
+        return [float(v) for v in parameters]
+    
+    def convert_meshes_to_glb(self, context):
+        """把Phobos导出的STL转换为GLB（带材质），并改写URDF中的网格引用"""
+        import os
+        import posixpath
+        import xml.etree.ElementTree as ET
+        directory = bpy.path.abspath(self.filepath)
+        candidates = find_urdf_files(directory) if os.path.isdir(directory) else []
+        if not candidates:
+            print("  ! 导出目录中没有找到URDF文件，跳过GLB转换")
+            return 0
+        urdf_path = candidates[0]
+        urdf_dir = os.path.dirname(urdf_path)
+        print("  转换网格为GLB...")
+        
+        filenames = {element.get('filename') for element in ET.parse(urdf_path).iter('mesh')}
+        sources = self.mesh_file_sources(context, urdf_path)
+        replacements = {}
+        converted = {}
+        for filename in sorted(name for name in filenames if name and name.lower().endswith('.stl')):
+            source = resolve_urdf_mesh_path(filename, urdf_dir)
+            if source is None:
+                print(f"    ! 找不到网格文件: {filename}")
+                continue
+            
+            folder, base = posixpath.split(filename)
+            stem = os.path.splitext(base)[0]
+            if posixpath.basename(folder) == 'stl':
+                folder = posixpath.join(posixpath.dirname(folder), 'glb')
+            target_name = posixpath.join(folder, stem + '.glb')
+            target = os.path.join(os.path.dirname(os.path.dirname(source)), 'glb', stem + '.glb') \
+                if os.path.basename(os.path.dirname(source)) == 'stl' else os.path.splitext(source)[0] + '.glb'
+            
+            try:
+                if target not in converted:
+                    arrays = read_stl_arrays(source)
+                    triangles, _ = triangulate_arrays(arrays)
+                    materials, material_index, co = (), None, arrays['co']
+                    # 找得到导出时的网格数据且三角形数量与STL一致时从Blender读取以保留材质
+                    mesh = sources.get(os.path.normcase(os.path.abspath(source)))
+                    if mesh is not None and len(mesh.polygons):
+                        mesh_arrays = read_mesh_arrays(mesh)
+                        mesh_triangles, polygon = triangulate_arrays(mesh_arrays)
+                        if len(mesh_triangles) == len(triangles):
+                            materials = [(material.name, self.glb_material_parameters(material)) if material
+                                         else ("default", [0.8, 0.8, 0.8, 1.0, 0.5, 0.0])
+                                         for material in mesh.materials]
+                            material_index = mesh_arrays['mat_idx'][polygon]
+                            triangles, co = mesh_triangles, mesh_arrays['co']
+                        else:
+                            print(f"    ! 网格 '{mesh.name}' 与 {filename} 的三角形数量不一致，按STL转换（不带材质）")
+                    if not len(triangles):
+                        print(f"    ! 网格没有面，保留STL: {filename}")
+                        continue
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    write_glb(target, co, triangles, material_index, materials, quantize=self.glb_quantize)
+                    converted[target] = source
+                replacements[filename] = target_name
+            except Exception as e:
+                print(f"    ✗ 转换失败 {filename}: {e}")
+        
+        if replacements:
+            with open(urdf_path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            for old, new in replacements.items():
+                text = text.replace(f'filename="{old}"', f'filename="{new}"')
+            with open(urdf_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+        
+        stl_size = sum(os.path.getsize(path) for path in set(converted.values()))
+        glb_size = sum(os.path.getsize(path) for path in converted)
+        # 删除已转换的中间STL文件
+        for source in set(converted.values()):
+            os.remove(source)
+            folder = os.path.dirname(source)
+            if os.path.basename(folder) == 'stl' and not os.listdir(folder):
+                os.rmdir(folder)
+        
+        print(f"  ✓ 已转换 {len(converted)} 个网格为GLB，改写 {len(replacements)} 处URDF引用 "
+              f"({stl_size/1024:.1f} KB → {glb_size/1024:.1f} KB)")
+        return len(converted)
+    
+    def export_sdf_model(self, context):
+        """写出SDF模型，优先引用Phobos已导出的网格文件"""
+        import os
+        directory = bpy.path.abspath(self.filepath)
+        model_name = self.model_name or get_model_name(context.scene)
+        cache = MeshExportCache(os.path.join(directory, "meshes", "stl"), root=directory)
+        
+        snapshot = collect_robot_snapshot(context.scene)
+        reused = 0
+        for link in snapshot['links']:
+            for item in link['visuals'] + link['collisions']:
+                if item['geometry']['type'] != 'mesh':
+                    continue
+                mesh = item['object'].data
+                for candidate in (os.path.join(directory, "meshes", self.mesh_format, f"{mesh.name}.{self.mesh_format}"),
+                                  os.path.join(directory, "meshes", f"{mesh.name}.{self.mesh_format}")):
+                    if os.path.isfile(candidate):
+                        cache.reuse(mesh, candidate)
+                        reused += 1
+                        break
+        
+        try:
+            path = write_sdf_model(snapshot, directory, model_name, cache)
+            print(f"  ✓ SDF已写出: {path}（复用 {reused} 个已导出网格, 新写出 {len(cache.files)} 个）")
+        except Exception as e:
+            print(f"  ✗ SDF导出失败: {e}")
+    
+    def verify_export(self, context, expected=None):
+        """校验导出目录中最新的URDF，expected为导出时场景的 (link数量, 关节数量)"""
+        import os
+        directory = bpy.path.abspath(self.filepath)
+        candidates = find_urdf_files(directory) if os.path.isdir(directory) else []
+        if not candidates:
+            print("  ! 导出目录中没有找到URDF文件，跳过校验")
+            return ["未找到URDF文件"], []
+        try:
+            return report_urdf_verification(candidates[0], context.scene, expected)
+        except Exception as e:
+            print(f"  ✗ 校验URDF失败: {e}")
+            return [str(e)], []
+    
     def execute_phobos_export(self, context):
         """执行Phobos导出"""
         try:
@@ -1206,71 +5160,775 @@ class URDF_OT_SelectExportPathAndExport(Operator):
             
             return False
     
-    def invoke(self, context, event):
-        # 设置默认路径
+    def invoke(self, context, event):
+        # 设置默认路径
+        import os
+        default_path = os.path.join(os.path.expanduser("~"), "Documents", "URDF_Export")
+        self.filepath = default_path
+        
+        # 尝试从现有设置获取模型名称
+        try:
+            scene = context.scene
+            if hasattr(scene, 'phobosexportsettings'):
+                export_settings = scene.phobosexportsettings
+                if export_settings.rosPackageName:
+                    self.model_name = export_settings.rosPackageName
+                elif export_settings.name:
+                    self.model_name = export_settings.name
+        except:
+            pass
+        
+        # 打开文件浏览器
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+    
+    def draw(self, context):
+        layout = self.layout
+        
+        # 标题
+        layout.label(text="Phobos URDF Export Settings", icon='EXPORT')
+        layout.separator()
+        
+        # 路径设置
+        box = layout.box()
+        box.label(text="Export Path:", icon='FOLDER_REDIRECT')
+        box.prop(self, "filepath", text="Directory")
+        
+        # 模型设置
+        box = layout.box()
+        box.label(text="Model Settings:", icon='OBJECT_DATA')
+        box.prop(self, "model_name", text="Model Name")
+        
+        layout.separator()
+        
+        # 导出格式设置
+        box = layout.box()
+        box.label(text="Export Formats:", icon='SETTINGS')
+        
+        col = box.column(align=True)
+        col.prop(self, "export_urdf", icon='FILE_TEXT')
+        col.prop(self, "export_joint_limits", icon='CONSTRAINT')
+        
+        box.separator()
+        
+        # 网格格式
+        box.label(text="Mesh Format:")
+        box.prop(self, "mesh_format", expand=True)
+        if self.mesh_format == 'glb':
+            box.prop(self, "glb_quantize")
+        
+        layout.separator()
+        
+        # 导出优化
+        box = layout.box()
+        box.label(text="Optimization:", icon='MOD_DECIM')
+        col = box.column(align=True)
+        col.prop(self, "merge_link_meshes")
+        col.prop(self, "collapse_fixed_joints")
+        col.prop(self, "consolidate_materials")
+        if self.consolidate_materials != 'NONE':
+            row = box.row(align=True)
+            row.prop(self, "material_tolerance")
+            sub = row.row(align=True)
+            sub.enabled = self.mesh_format == 'dae'
+            sub.prop(self, "bake_vertex_colors")
+            col = box.column(align=True)
+        col.prop(self, "optimize_mesh_files")
+        if self.optimize_mesh_files:
+            sub = box.column(align=True)
+            sub.label(text="Visual: Drop")
+            sub.row(align=True).prop(self, "visual_strip")
+            sub.label(text="Collision: Drop")
+            sub.row(align=True).prop(self, "collision_strip")
+            row = sub.row(align=True)
+            row.prop(self, "mesh_decimals")
+            row.prop(self, "weld_vertices")
+            col = box.column(align=True)
+        col.prop(self, "optimize_textures")
+        if self.optimize_textures:
+            row = box.row(align=True)
+            row.prop(self, "texture_max_size")
+            row.prop(self, "texture_format", text="")
+            if self.texture_format == 'JPEG':
+                row.prop(self, "texture_quality")
+            col = box.column(align=True)
+        col.prop(self, "export_sdf")
+        col.prop(self, "verify_after_export")
+        
+        layout.separator()
+        
+        # 信息提示
+        info_box = layout.box()
+        info_box.label(text="Export Info:", icon='INFO')
+        col = info_box.column(align=True)
+        col.scale_y = 0.8
+        col.label(text="• URDF file and meshes will be exported")
+        col.label(text="• Make sure model has proper phobos setup")
+        col.label(text="• Check export path after completion")
+
+class URDF_OT_ExportMJCF(Operator):
+    """导出MJCF（MuJoCo）"""
+    bl_idname = "urdf.export_mjcf"
+    bl_label = "Export MJCF"
+    bl_description = "读取与URDF导出相同的link/joint属性，直接生成MuJoCo可用的MJCF：body/joint/geom树、按内容去重的共享网格资源和碰撞图元"
+    bl_options = {'REGISTER'}
+    
+    filepath: StringProperty(
+        name="Export Path",
+        description="MJCF导出目录",
+        subtype='DIR_PATH'
+    )
+    
+    model_name: StringProperty(
+        name="Model Name",
+        description="模型名称（MJCF文件名）",
+        default="robot_model"
+    )
+    
+    export_visual: BoolProperty(
+        name="Visual Geoms",
+        description="导出visual几何（不参与碰撞，group 2）",
+        default=True
+    )
+    
+    floating_base: BoolProperty(
+        name="Floating Base",
+        description="根body添加freejoint（移动机器人），否则固定在世界坐标系",
+        default=False
+    )
+    
+    add_actuators: BoolProperty(
+        name="Add Motors",
+        description="为每个可动关节添加motor执行器，控制范围取关节effort",
+        default=False
+    )
+    
+    MESH_DIRECTORY = "meshes"
+    
+    def execute(self, context):
+        import os
+        import time
+        start_time = time.time()
+        
+        snapshot = collect_robot_snapshot(context.scene)
+        if not snapshot['links']:
+            self.report({'ERROR'}, "场景中没有link")
+            return {'CANCELLED'}
+        
+        directory = bpy.path.abspath(self.filepath)
+        model_name = self.model_name or snapshot['name']
+        print(f"\n{'='*60}")
+        print(f"导出MJCF: {model_name} ({len(snapshot['links'])} 个link)")
+        print(f"{'='*60}")
+        
+        try:
+            os.makedirs(directory, exist_ok=True)
+            self.cache = MeshExportCache(os.path.join(directory, self.MESH_DIRECTORY))
+            self.assets = {}
+            tree = self.build_mjcf(model_name, snapshot)
+            path = os.path.join(directory, f"{model_name}.xml")
+            tree.write(path, encoding='utf-8', xml_declaration=True)
+        except Exception as e:
+            self.report({'ERROR'}, f"MJCF导出失败: {str(e)}")
+            print(f"MJCF导出错误: {e}")
+            return {'CANCELLED'}
+        
+        print(f"  网格文件: {len(self.cache.files)} 个, mesh资源: {len(self.assets)} 个")
+        print(f"✓ 已写入: {path} ({time.time() - start_time:.2f} 秒)")
+        print(f"{'='*60}\n")
+        self.report({'INFO'}, f"MJCF导出完成: {path}")
+        return {'FINISHED'}
+    
+    def build_mjcf(self, model_name, snapshot):
+        """生成MJCF元素树"""
+        import xml.etree.ElementTree as ET
+        
+        root = ET.Element('mujoco', model=model_name)
+        # boundmass/boundinertia 避免没有惯量的可动body导致编译失败
+        ET.SubElement(root, 'compiler', angle='radian', meshdir=self.MESH_DIRECTORY,
+                      autolimits='true', boundmass='1e-6', boundinertia='1e-9')
+        default = ET.SubElement(root, 'default')
+        visual = ET.SubElement(default, 'default', {'class': 'visual'})
+        ET.SubElement(visual, 'geom', contype='0', conaffinity='0', group='2', density='0')
+        collision = ET.SubElement(default, 'default', {'class': 'collision'})
+        ET.SubElement(collision, 'geom', group='3')
+        
+        self.asset = ET.SubElement(root, 'asset')
+        worldbody = ET.SubElement(root, 'worldbody')
+        
+        bodies = []
+        actuated = []
+        for link in snapshot['links']:
+            parent = worldbody if link['parent'] < 0 else bodies[link['parent']]
+            body = ET.SubElement(parent, 'body', name=link['name'])
+            self.set_pose(body, link['origin'])
+            bodies.append(body)
+            
+            if link['parent'] < 0 and self.floating_base:
+                ET.SubElement(body, 'freejoint', name=f"{link['name']}_free")
+            
+            inertial = link['inertial']
+            if inertial is not None:
+                inertia = inertial['inertia']
+                ET.SubElement(body, 'inertial', pos=format_numbers(inertial['com']),
+                              mass=format_numbers([inertial['mass']]),
+                              fullinertia=format_numbers([inertia[0, 0], inertia[1, 1], inertia[2, 2],
+                                                          inertia[0, 1], inertia[0, 2], inertia[1, 2]]))
+            
+            joint = link['joint']
+            if joint is not None and joint['type'] != 'fixed':
+                element = ET.SubElement(body, 'joint', name=joint['name'],
+                                        type='slide' if joint['type'] == 'prismatic' else 'hinge',
+                                        axis=format_numbers(joint['axis']))
+                if joint['lower'] is not None and joint['upper'] is not None:
+                    element.set('range', format_numbers([joint['lower'], joint['upper']]))
+                if joint['damping']:
+                    element.set('damping', format_numbers([joint['damping']]))
+                if joint['friction']:
+                    element.set('frictionloss', format_numbers([joint['friction']]))
+                actuated.append(joint)
+            
+            if self.export_visual:
+                for item in link['visuals']:
+                    self.add_geom(body, item, 'visual')
+            for item in link['collisions']:
+                self.add_geom(body, item, 'collision')
+        
+        if self.add_actuators and actuated:
+            actuator = ET.SubElement(root, 'actuator')
+            for joint in actuated:
+                motor = ET.SubElement(actuator, 'motor', name=joint['name'], joint=joint['name'])
+                if joint['effort'] > 0:
+                    motor.set('ctrlrange', format_numbers([-joint['effort'], joint['effort']]))
+        
+        if len(self.asset) == 0:
+            root.remove(self.asset)
+        tree = ET.ElementTree(root)
+        if hasattr(ET, 'indent'):
+            ET.indent(tree, space="  ")
+        return tree
+    
+    def set_pose(self, element, matrix):
+        """写入pos/quat属性（单位变换时省略）"""
+        if not np.allclose(matrix[:3, 3], 0.0, atol=1e-9):
+            element.set('pos', format_numbers(matrix[:3, 3]))
+        quaternion = rotation_to_quaternion(matrix[:3, :3])
+        if not np.allclose(quaternion, [1.0, 0.0, 0.0, 0.0], atol=1e-9):
+            element.set('quat', format_numbers(quaternion))
+    
+    def add_geom(self, body, item, geom_class):
+        """写出geom：碰撞图元直接使用MJCF图元，网格引用共享的mesh资源"""
+        import xml.etree.ElementTree as ET
+        geometry = item['geometry']
+        geom = ET.SubElement(body, 'geom', {'class': geom_class, 'name': item['name']})
+        if geometry['type'] == 'box':
+            geom.set('type', 'box')
+            geom.set('size', format_numbers(np.asarray(geometry['size']) / 2.0))
+        elif geometry['type'] == 'cylinder':
+            geom.set('type', 'cylinder')
+            geom.set('size', format_numbers([geometry['radius'], geometry['length'] / 2.0]))
+        elif geometry['type'] == 'sphere':
+            geom.set('type', 'sphere')
+            geom.set('size', format_numbers([geometry['radius']]))
+        else:
+            geom.set('type', 'mesh')
+            geom.set('mesh', self.mesh_asset(item))
+        self.set_pose(geom, item['origin'])
+        if geom_class == 'visual' and item['rgba'] is not None:
+            geom.set('rgba', format_numbers(item['rgba'], 4))
+    
+    def mesh_asset(self, item):
+        """同一网格文件+缩放只声明一个mesh资源"""
+        import os
+        import xml.etree.ElementTree as ET
+        filename, scale = self.cache.mesh_file(item['object'], item['stretch'])
+        key = (filename, None if scale is None else tuple(np.round(scale, 9)))
+        if key not in self.assets:
+            name = os.path.splitext(filename)[0]
+            if scale is not None:
+                name = f"{name}_scaled{len(self.assets)}"
+            element = ET.SubElement(self.asset, 'mesh', name=name, file=filename)
+            if scale is not None:
+                element.set('scale', format_numbers(scale))
+            self.assets[key] = name
+        return self.assets[key]
+    
+    def invoke(self, context, event):
+        import os
+        model_name = get_model_name(context.scene)
+        self.model_name = model_name
+        self.filepath = os.path.join(os.path.expanduser("~"), "Documents", "URDF_Export", f"{model_name}_mjcf") + os.sep
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+class URDF_OT_ExportXacro(Operator):
+    """导出Xacro（重复子结构提取为宏）"""
+    bl_idname = "urdf.export_xacro"
+    bl_label = "Export Xacro"
+    bl_description = "生成Xacro：结构、关节参数与网格完全相同的子树（腿、手指、轮子等）只定义一次宏，按prefix与origin参数实例化"
+    bl_options = {'REGISTER'}
+    
+    filepath: StringProperty(
+        name="Export Path",
+        description="Xacro包目录（urdf/ 与 meshes/ 写在其中）",
+        subtype='DIR_PATH'
+    )
+    
+    model_name: StringProperty(
+        name="Model Name",
+        description="模型名称（也用作package://的包名）",
+        default="robot_model"
+    )
+    
+    use_macros: BoolProperty(
+        name="Extract Macros",
+        description="把重复子树提取为xacro宏；关闭时输出展开的URDF内容",
+        default=True
+    )
+    
+    min_macro_links: IntProperty(
+        name="Min Links per Macro",
+        description="子树至少包含多少个link才提取为宏",
+        default=1,
+        min=1,
+        max=64
+    )
+    
+    MESH_DIRECTORY = "meshes"
+    XACRO_NAMESPACE = "http://www.ros.org/wiki/xacro"
+    NAME_SEPARATORS = "_-/"
+    
+    def execute(self, context):
         import os
-        default_path = os.path.join(os.path.expanduser("~"), "Documents", "URDF_Export")
-        self.filepath = default_path
+        import time
+        import xml.etree.ElementTree as ET
+        start_time = time.time()
+        
+        snapshot = collect_robot_snapshot(context.scene)
+        if not snapshot['links']:
+            self.report({'ERROR'}, "场景中没有link")
+            return {'CANCELLED'}
+        
+        directory = bpy.path.abspath(self.filepath)
+        self.package = self.model_name or snapshot['name']
+        print(f"\n{'='*60}")
+        print(f"导出Xacro: {self.package} ({len(snapshot['links'])} 个link)")
+        print(f"{'='*60}")
         
-        # 尝试从现有设置获取模型名称
         try:
-            scene = context.scene
-            if hasattr(scene, 'phobosexportsettings'):
-                export_settings = scene.phobosexportsettings
-                if export_settings.rosPackageName:
-                    self.model_name = export_settings.rosPackageName
-                elif export_settings.name:
-                    self.model_name = export_settings.name
-        except:
-            pass
+            os.makedirs(os.path.join(directory, "urdf"), exist_ok=True)
+            self.cache = MeshExportCache(os.path.join(directory, self.MESH_DIRECTORY), root=directory)
+            self.links = snapshot['links']
+            self.children = [[] for _ in self.links]
+            for index, link in enumerate(self.links):
+                if link['parent'] >= 0:
+                    self.children[link['parent']].append(index)
+            
+            self.hash_subtrees()
+            macros = self.select_macros() if self.use_macros else {}
+            robot = self.build_xacro(macros)
+            flat = build_urdf_document(snapshot, self.mesh_uri, self.package).getroot()
+            if hasattr(ET, 'indent'):
+                ET.indent(robot, space="  ")
+                ET.indent(flat, space="  ")
+            path = os.path.join(directory, "urdf", f"{self.package}.urdf.xacro")
+            ET.ElementTree(robot).write(path, encoding='utf-8', xml_declaration=True)
+            # 两份文档按相同的缩进和编码序列化后比较大小
+            size = len(ET.tostring(robot, encoding='utf-8'))
+            flat_size = len(ET.tostring(flat, encoding='utf-8'))
+        except Exception as e:
+            self.report({'ERROR'}, f"Xacro导出失败: {str(e)}")
+            print(f"Xacro导出错误: {e}")
+            return {'CANCELLED'}
         
-        # 打开文件浏览器
+        for name, group in macros.items():
+            print(f"  宏 {name}: {group['size']} 个link × {len(group['roots'])} 个实例 "
+                  f"(prefix: {', '.join(group['prefixes'])})")
+        print(f"  网格文件: {len(self.cache.files)} 个")
+        print(f"  文件大小: {size/1024:.1f} KB（展开的URDF约 {flat_size/1024:.1f} KB）")
+        print(f"✓ 已写入: {path} ({time.time() - start_time:.2f} 秒)")
+        print(f"{'='*60}\n")
+        self.report({'INFO'}, f"Xacro导出完成: {len(macros)} 个宏, {path}")
+        return {'FINISHED'}
+    
+    def mesh_uri(self, item):
+        filename, scale = self.cache.mesh_file(item['object'], item['stretch'])
+        return f"package://{self.package}/{filename}", scale
+    
+    def hash_subtrees(self):
+        """自底向上计算子树签名
+
+        签名取自去掉名称后的URDF文本（link内容、连接关节除origin外的参数、
+        按签名排序的子关节origin与子树签名），签名相同的子树生成的宏体必然相同。
+        排序后的子节点顺序同时作为宏体中元素的对应关系。
+        """
+        import hashlib
+        import xml.etree.ElementTree as ET
+        count = len(self.links)
+        self.signature = [None] * count
+        self.size = [1] * count
+        self.order = [None] * count
+        # 快照中父link总在子link之前
+        for index in reversed(range(count)):
+            link = self.links[index]
+            parts = [ET.tostring(urdf_link_element(link, self.mesh_uri, name="", item_names=False))]
+            if link['joint'] is not None:
+                joint = urdf_joint_element(link, "", "", include_origin=False)
+                joint.set('name', "")
+                parts.append(ET.tostring(joint))
+            keys = []
+            for child in self.children[index]:
+                origin = self.links[child]['origin']
+                key = (format_numbers(origin[:3, 3]) + "|" + format_numbers(rotation_to_rpy(origin[:3, :3]))
+                       + "|" + self.signature[child])
+                keys.append((key, self.links[child]['name'], child))
+                self.size[index] += self.size[child]
+            keys.sort()
+            self.order[index] = [child for _, _, child in keys]
+            parts.extend(key.encode() for key, _, _ in keys)
+            self.signature[index] = hashlib.sha1(b"\0".join(parts)).hexdigest()
+    
+    def subtree_sequence(self, index):
+        """子树中的 (类型, link索引) 序列：先连接关节再link，子树按签名顺序"""
+        sequence = [('joint', index), ('link', index)]
+        for child in self.order[index]:
+            sequence.extend(self.subtree_sequence(child))
+        return sequence
+    
+    def element_name(self, kind, index):
+        link = self.links[index]
+        return link['joint']['name'] if kind == 'joint' else link['name']
+    
+    def select_macros(self):
+        """自顶向下选出最大的重复子树并确定各实例的prefix
+
+        无法用统一的 prefix+后缀 表示全部名称的组（命名不规律）会被放弃，
+        改为在其内部继续寻找更小的重复子树。
+        """
+        from collections import Counter, defaultdict
+        counts = Counter(self.signature[index] for index, link in enumerate(self.links) if link['parent'] >= 0)
+        rejected = set()
+        while True:
+            groups = defaultdict(list)
+            roots = [index for index, link in enumerate(self.links) if link['parent'] < 0]
+            stack = [child for root in roots for child in self.children[root]]
+            while stack:
+                index = stack.pop()
+                signature = self.signature[index]
+                if counts[signature] >= 2 and signature not in rejected and self.size[index] >= self.min_macro_links:
+                    groups[signature].append(index)
+                else:
+                    stack.extend(self.children[index])
+            
+            macros = {}
+            bad = set()
+            for signature, members in groups.items():
+                members.sort(key=lambda index: self.links[index]['name'])
+                members = self.consistent_members(members)
+                if len(members) < 2:
+                    bad.add(signature)
+                    continue
+                prefixes, suffixes = self.instance_prefixes(members)
+                name = self.macro_name(suffixes[1], members[0], macros)
+                macros[name] = {'roots': members, 'prefixes': prefixes, 'suffixes': suffixes,
+                                'size': self.size[members[0]]}
+            if not bad:
+                return macros
+            rejected |= bad
+    
+    def consistent_members(self, members):
+        """命名规律一致的最大实例子集（个别命名不规律的实例单独展开输出）"""
+        best = []
+        for start in range(len(members)):
+            accepted = [members[start]]
+            for member in members[:start] + members[start + 1:]:
+                if self.instance_prefixes(accepted + [member]) is not None:
+                    accepted.append(member)
+            if len(accepted) > len(best):
+                best = accepted
+            if len(best) == len(members):
+                break
+        return sorted(best, key=lambda index: self.links[index]['name'])
+    
+    def instance_prefixes(self, members):
+        """每个位置取各实例名称的公共后缀，要求同一实例的剩余部分（prefix）一致"""
+        import os
+        names = [[self.element_name(kind, index) for kind, index in self.subtree_sequence(member)]
+                 for member in members]
+        suffixes = [os.path.commonprefix([name[::-1] for name in column])[::-1] for column in zip(*names)]
+        
+        def split(suffixes):
+            prefixes = []
+            for instance in names:
+                candidates = {name[:len(name) - len(suffix)] for name, suffix in zip(instance, suffixes)}
+                if len(candidates) != 1:
+                    return None
+                prefixes.append(candidates.pop())
+            return prefixes if len(set(prefixes)) == len(prefixes) else None
+        
+        # 优先在分隔符处切分（left_leg/right_leg → left + _leg，而不是 lef + t_leg）
+        trimmed = []
+        for suffix in suffixes:
+            cut = [suffix.find(separator) for separator in self.NAME_SEPARATORS if separator in suffix]
+            trimmed.append(suffix[min(cut):] if cut else suffix)
+        for candidate in (trimmed, suffixes):
+            prefixes = split(candidate)
+            if prefixes is not None:
+                return prefixes, candidate
+        return None
+    
+    def macro_name(self, root_suffix, root, macros):
+        import re
+        base = root_suffix.strip(self.NAME_SEPARATORS)
+        if not base:
+            base = re.sub(r'\d+$', '', self.links[root]['name']).strip(self.NAME_SEPARATORS)
+        base = re.sub(r'[^A-Za-z0-9_]', '_', base) or "subtree"
+        if base[0].isdigit():
+            base = "_" + base
+        name = base
+        number = 2
+        while name in macros:
+            name = f"{base}_{number}"
+            number += 1
+        return name
+    
+    def build_xacro(self, macros):
+        import xml.etree.ElementTree as ET
+        robot = ET.Element('robot', {'name': self.package, 'xmlns:xacro': self.XACRO_NAMESPACE})
+        instances = {}
+        for name, group in macros.items():
+            robot.append(self.macro_definition(name, group))
+            for root, prefix in zip(group['roots'], group['prefixes']):
+                instances[root] = (name, prefix)
+        
+        for index, link in enumerate(self.links):
+            if link['parent'] < 0:
+                self.emit_subtree(robot, index, instances)
+        return robot
+    
+    def emit_subtree(self, robot, index, instances):
+        """展开输出link及其子树，遇到宏实例时改为调用宏"""
+        import xml.etree.ElementTree as ET
+        link = self.links[index]
+        robot.append(urdf_link_element(link, self.mesh_uri))
+        for child in self.children[index]:
+            if child in instances:
+                name, prefix = instances[child]
+                call = ET.SubElement(robot, f"xacro:{name}", prefix=prefix, parent=link['name'])
+                origin = self.links[child]['origin']
+                ET.SubElement(call, 'origin', xyz=format_numbers(origin[:3, 3]),
+                              rpy=format_numbers(rotation_to_rpy(origin[:3, :3])))
+                continue
+            robot.append(urdf_joint_element(self.links[child], link['name'], self.links[child]['name']))
+            self.emit_subtree(robot, child, instances)
+    
+    def macro_definition(self, name, group):
+        """以第一个实例为模板生成宏体，名称替换为 ${prefix}+公共后缀"""
+        import xml.etree.ElementTree as ET
+        macro = ET.Element('xacro:macro', name=name, params="prefix parent *origin")
+        root = group['roots'][0]
+        sequence = self.subtree_sequence(root)
+        names = {(kind, index): "${prefix}" + suffix for (kind, index), suffix in zip(sequence, group['suffixes'])}
+        for kind, index in sequence:
+            link = self.links[index]
+            if kind == 'link':
+                macro.append(urdf_link_element(link, self.mesh_uri, name=names[kind, index], item_names=False))
+                continue
+            if index == root:
+                joint = urdf_joint_element(link, "${parent}", names['link', index], include_origin=False)
+                joint.insert(0, ET.Element('xacro:insert_block', name="origin"))
+            else:
+                joint = urdf_joint_element(link, names['link', link['parent']], names['link', index])
+            joint.set('name', names[kind, index])
+            macro.append(joint)
+        return macro
+    
+    def invoke(self, context, event):
+        import os
+        model_name = get_model_name(context.scene)
+        self.model_name = model_name
+        self.filepath = os.path.join(os.path.expanduser("~"), "Documents", "URDF_Export", f"{model_name}_xacro") + os.sep
         context.window_manager.fileselect_add(self)
         return {'RUNNING_MODAL'}
+
+class URDF_OT_ExportURDFBackground(Operator):
+    """后台导出URDF（不阻塞界面）"""
+    bl_idname = "urdf.export_urdf_background"
+    bl_label = "Export URDF (Background)"
+    bl_description = "开始时把模型（含网格缓冲区）快照为纯数据，由工作线程三角化并写出STL，导出期间界面保持可用；显示进度，按ESC取消"
+    bl_options = {'REGISTER'}
     
-    def draw(self, context):
-        layout = self.layout
+    filepath: StringProperty(
+        name="Export Path",
+        description="导出目录（urdf/ 与 meshes/stl/ 写在其中）",
+        subtype='DIR_PATH'
+    )
+    
+    model_name: StringProperty(
+        name="Model Name",
+        description="模型名称（URDF文件名）",
+        default="robot_model"
+    )
+    
+    max_workers: IntProperty(
+        name="Workers",
+        description="写出网格文件的工作线程数",
+        default=4,
+        min=1,
+        max=32
+    )
+    
+    verify_after_export: BoolProperty(
+        name="Verify After Export",
+        description="导出后校验URDF：检查引用网格是否存在、可读且非空，并与场景的link/关节数量比较",
+        default=True
+    )
+    
+    TIMER_INTERVAL = 0.05
+    
+    def execute(self, context):
+        import os
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        self.start_time = time.time()
         
-        # 标题
-        layout.label(text="Phobos URDF Export Settings", icon='EXPORT')
-        layout.separator()
+        # link树、变换、关节、惯量与网格缓冲区在同一时刻快照，导出期间对场景的修改不影响结果
+        self.snapshot = collect_robot_snapshot(context.scene)
+        if not self.snapshot['links']:
+            self.report({'ERROR'}, "场景中没有link")
+            return {'CANCELLED'}
         
-        # 路径设置
-        box = layout.box()
-        box.label(text="Export Path:", icon='FOLDER_REDIRECT')
-        box.prop(self, "filepath", text="Directory")
+        self.directory = bpy.path.abspath(self.filepath)
+        self.robot_name = self.model_name or self.snapshot['name']
+        self.cache = MeshExportCache(os.path.join(self.directory, "meshes", "stl"),
+                                     root=os.path.join(self.directory, "urdf"))
         
-        # 模型设置
-        box = layout.box()
-        box.label(text="Model Settings:", icon='OBJECT_DATA')
-        box.prop(self, "model_name", text="Model Name")
+        # 同一网格数据+烘焙拉伸只写出一次；读取网格缓冲区只能在主线程进行（foreach_get，只是内存复制）
+        self.jobs = []
+        self.item_keys = {}
+        arrays = {}
+        keys = set()
+        for link in self.snapshot['links']:
+            for item in link['visuals'] + link['collisions']:
+                if item['geometry']['type'] != 'mesh':
+                    continue
+                mesh = item['object'].data
+                key, scale, baked = MeshExportCache.mesh_key(mesh, item['stretch'])
+                self.item_keys[id(item)] = (key, scale)
+                if key not in keys:
+                    keys.add(key)
+                    if mesh.name not in arrays:
+                        arrays[mesh.name] = read_mesh_arrays(mesh)
+                    self.jobs.append((key, mesh.name, baked))
         
-        layout.separator()
+        print(f"\n{'='*60}")
+        print(f"后台导出URDF: {self.robot_name} ({len(self.snapshot['links'])} 个link, {len(self.jobs)} 个网格, "
+              f"快照 {time.time() - self.start_time:.2f} 秒)")
+        print(f"{'='*60}")
         
-        # 导出格式设置
-        box = layout.box()
-        box.label(text="Export Formats:", icon='SETTINGS')
+        self.results = {}
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self.futures = {key: self.executor.submit(self.cache.write_arrays, mesh_name, arrays[mesh_name], baked)
+                        for key, mesh_name, baked in self.jobs}
         
-        col = box.column(align=True)
-        col.prop(self, "export_urdf", icon='FILE_TEXT')
-        col.prop(self, "export_joint_limits", icon='CONSTRAINT')
+        wm = context.window_manager
+        wm.progress_begin(0, 100)
+        self.timer = wm.event_timer_add(self.TIMER_INTERVAL, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+    
+    def modal(self, context, event):
+        if event.type == 'ESC' and event.value == 'PRESS':
+            self.cancel(context)
+            print("! 后台导出已取消")
+            self.report({'WARNING'}, "URDF导出已取消")
+            return {'CANCELLED'}
+        if event.type != 'TIMER' or event.timer is not self.timer:
+            return {'PASS_THROUGH'}
         
-        box.separator()
+        for key, future in list(self.futures.items()):
+            if future.done():
+                del self.futures[key]
+                error = future.exception()
+                self.results[key] = error if error is not None else future.result()
         
-        # 网格格式
-        box.label(text="Mesh Format:")
-        box.prop(self, "mesh_format", expand=True)
+        done = len(self.results)
+        context.window_manager.progress_update(int(100 * done / max(len(self.jobs), 1)))
+        context.workspace.status_text_set(
+            f"导出URDF {self.robot_name}: 写出网格 {done}/{len(self.jobs)}（ESC取消）")
         
-        layout.separator()
+        if done < len(self.jobs):
+            return {'PASS_THROUGH'}
         
-        # 信息提示
-        info_box = layout.box()
-        info_box.label(text="Export Info:", icon='INFO')
-        col = info_box.column(align=True)
-        col.scale_y = 0.8
-        col.label(text="• URDF file and meshes will be exported")
-        col.label(text="• Make sure model has proper phobos setup")
-        col.label(text="• Check export path after completion")
+        self.cancel(context)
+        return self.finish(context)
+    
+    def finish(self, context):
+        """所有网格写出后生成URDF"""
+        import os
+        import time
+        import xml.etree.ElementTree as ET
+        failed = {key: error for key, error in self.results.items() if isinstance(error, Exception)}
+        for key, error in failed.items():
+            print(f"  ✗ 网格 {key[0]}: {error}")
+        
+        def mesh_uri(item):
+            key, scale = self.item_keys[id(item)]
+            path = self.results[key]
+            return (None, None) if isinstance(path, Exception) else (path, scale)
+        
+        try:
+            tree = build_urdf_document(self.snapshot, mesh_uri, self.robot_name)
+            # 写出失败的网格不引用
+            for link in tree.getroot().findall('link'):
+                for node in link.findall('visual') + link.findall('collision'):
+                    mesh = node.find('geometry/mesh')
+                    if mesh is not None and mesh.get('filename') is None:
+                        link.remove(node)
+            if hasattr(ET, 'indent'):
+                ET.indent(tree, space="  ")
+            os.makedirs(os.path.join(self.directory, "urdf"), exist_ok=True)
+            path = os.path.join(self.directory, "urdf", f"{self.robot_name}.urdf")
+            tree.write(path, encoding='utf-8', xml_declaration=True)
+        except Exception as e:
+            self.report({'ERROR'}, f"URDF导出失败: {str(e)}")
+            print(f"URDF导出错误: {e}")
+            return {'CANCELLED'}
+        
+        print(f"  网格文件: {len(self.cache.files)} 个（{len(failed)} 个失败）")
+        print(f"✓ 已写入: {path} ({time.time() - self.start_time:.2f} 秒)")
+        print(f"{'='*60}\n")
+        
+        if self.verify_after_export:
+            errors, _ = report_urdf_verification(path, context.scene)
+            if errors:
+                self.report({'WARNING'}, f"URDF已导出但校验发现 {len(errors)} 个错误（详见控制台）")
+                return {'FINISHED'}
+        if failed:
+            self.report({'WARNING'}, f"URDF已导出，{len(failed)} 个网格写出失败（详见控制台）")
+        else:
+            self.report({'INFO'}, f"URDF导出完成: {path}")
+        return {'FINISHED'}
+    
+    def cancel(self, context):
+        """停止定时器和工作线程，清除进度显示"""
+        wm = context.window_manager
+        if getattr(self, 'timer', None) is not None:
+            wm.event_timer_remove(self.timer)
+            self.timer = None
+            wm.progress_end()
+            context.workspace.status_text_set(None)
+        if getattr(self, 'executor', None) is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+    
+    def invoke(self, context, event):
+        import os
+        model_name = get_model_name(context.scene)
+        self.model_name = model_name
+        self.filepath = os.path.join(os.path.expanduser("~"), "Documents", "URDF_Export", model_name) + os.sep
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
 
 class URDF_OT_SetExportSettings(Operator):
     """Set URDF export settings - 配置导出model类型和mesh类型 (Step 10)"""
@@ -1384,27 +6042,422 @@ class URDF_OT_SetExportSettings(Operator):
                 success += 1
                 
         except Exception as e:
-            print(f"  phobosexportsettings mesh设置失败: {e}")
+            print(f"  phobosexportsettings mesh设置失败: {e}")
+        
+        # 设置Scene的mesh导出属性
+        mesh_settings = {
+            'export_mesh_dae': True,           # 启用DAE网格导出
+            'export_mesh_stl': False,          # 禁用STL
+            'export_mesh_obj': False,          # 禁用OBJ
+        }
+        
+        for attr_name, value in mesh_settings.items():
+            try:
+                if hasattr(scene, attr_name):
+                    setattr(scene, attr_name, value)
+                    status = "启用" if value else "禁用"
+                    print(f"    {status}: {attr_name}")
+                    success += 1
+                    
+            except Exception as e:
+                print(f"    设置 {attr_name} 失败: {e}")
+        
+        return success
+
+class URDF_OT_VerifyExport(Operator):
+    """校验导出的URDF"""
+    bl_idname = "urdf.verify_export"
+    bl_label = "Verify URDF Export"
+    bl_description = "流式解析导出的URDF，并行检查所有引用网格是否存在、可读且三角形数量非零，并与场景的link/关节数量比较"
+    bl_options = {'REGISTER'}
+    
+    filepath: StringProperty(
+        name="URDF Path",
+        description="URDF文件或导出目录（目录时使用其中最新的URDF）",
+        subtype='FILE_PATH'
+    )
+    
+    filter_glob: StringProperty(
+        default="*.urdf",
+        options={'HIDDEN'}
+    )
+    
+    def execute(self, context):
+        import os
+        path = bpy.path.abspath(self.filepath)
+        if os.path.isdir(path):
+            candidates = find_urdf_files(path)
+            if not candidates:
+                self.report({'ERROR'}, f"目录中没有URDF文件: {path}")
+                return {'CANCELLED'}
+            path = candidates[0]
+        elif not os.path.isfile(path):
+            self.report({'ERROR'}, f"文件不存在: {path}")
+            return {'CANCELLED'}
+        
+        print(f"\n{'='*60}")
+        try:
+            errors, warnings = report_urdf_verification(path, context.scene)
+        except Exception as e:
+            self.report({'ERROR'}, f"解析URDF失败: {str(e)}")
+            print(f"  ✗ 解析URDF失败: {e}")
+            return {'CANCELLED'}
+        print(f"{'='*60}\n")
+        
+        if errors:
+            self.report({'ERROR'}, f"校验失败: {len(errors)} 个错误（详见控制台）")
+        elif warnings:
+            self.report({'WARNING'}, f"校验通过但有 {len(warnings)} 个警告（详见控制台）")
+        else:
+            self.report({'INFO'}, "URDF校验通过")
+        return {'FINISHED'}
+    
+    def invoke(self, context, event):
+        import os
+        directory = os.path.join(os.path.expanduser("~"), "Documents", "URDF_Export")
+        try:
+            if hasattr(context.scene, 'phobosexportsettings') and context.scene.phobosexportsettings.path:
+                directory = bpy.path.abspath(context.scene.phobosexportsettings.path)
+        except Exception:
+            pass
+        candidates = find_urdf_files(directory) if os.path.isdir(directory) else []
+        self.filepath = candidates[0] if candidates else directory + os.sep
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+class URDF_OT_DiffURDF(Operator):
+    """比较两个URDF"""
+    bl_idname = "urdf.diff_urdf"
+    bl_label = "Diff URDF Exports"
+    bl_description = "比较两次导出的URDF结构差异（link、关节、几何、惯量和限制），结果输出到控制台和文本编辑器"
+    bl_options = {'REGISTER'}
+    
+    filepath: StringProperty(
+        name="Old URDF",
+        description="作为基准的URDF文件",
+        subtype='FILE_PATH'
+    )
+    
+    compare_path: StringProperty(
+        name="New URDF",
+        description="要比较的URDF文件",
+        subtype='FILE_PATH'
+    )
+    
+    tolerance: FloatProperty(
+        name="Tolerance",
+        description="数值比较容差",
+        default=1e-6,
+        min=0.0,
+        precision=8
+    )
+    
+    def execute(self, context):
+        path_a = bpy.path.abspath(self.filepath)
+        path_b = bpy.path.abspath(self.compare_path)
+        try:
+            differences = diff_urdf(path_a, path_b, self.tolerance)
+        except Exception as e:
+            self.report({'ERROR'}, f"比较失败: {str(e)}")
+            print(f"URDF比较错误: {e}")
+            return {'CANCELLED'}
+        
+        lines = [f"--- {path_a}", f"+++ {path_b}"] + (differences or ["（结构相同）"])
+        print(f"\n{'='*60}")
+        for line in lines:
+            print(f"  {line}")
+        print(f"{'='*60}\n")
+        
+        text = bpy.data.texts.get("URDF_Diff") or bpy.data.texts.new("URDF_Diff")
+        text.clear()
+        text.write("\n".join(lines) + "\n")
+        
+        if differences:
+            self.report({'INFO'}, f"发现 {len(differences)} 处差异（见文本 URDF_Diff）")
+        else:
+            self.report({'INFO'}, "两个URDF结构相同")
+        return {'FINISHED'}
+    
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self, width=500)
+
+class URDF_OT_ImportURDF(Operator):
+    """导入URDF"""
+    bl_idname = "urdf.import_urdf"
+    bl_label = "Import URDF"
+    bl_description = "流式解析URDF，按插件的link/joint/phobostype属性格式重建link、关节、visual、collision和惯量；同一网格文件只加载一次并在所有引用处共享网格数据"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    filepath: StringProperty(
+        name="URDF Path",
+        description="要导入的URDF文件",
+        subtype='FILE_PATH'
+    )
+    
+    filter_glob: StringProperty(
+        default="*.urdf;*.xml",
+        options={'HIDDEN'}
+    )
+    
+    import_visual: BoolProperty(
+        name="Visual",
+        description="导入visual几何",
+        default=True
+    )
+    
+    import_collision: BoolProperty(
+        name="Collision",
+        description="导入collision几何",
+        default=True
+    )
+    
+    import_inertial: BoolProperty(
+        name="Inertial",
+        description="导入惯量对象",
+        default=True
+    )
+    
+    # 非STL格式交给Blender自带的导入器（模块名, 操作符名, 参数）
+    MESH_IMPORTERS = {
+        '.dae': ('wm', 'collada_import', {}),
+        '.obj': ('wm', 'obj_import', {'forward_axis': 'Y', 'up_axis': 'Z'}),
+        '.ply': ('wm', 'ply_import', {'forward_axis': 'Y', 'up_axis': 'Z'}),
+        '.glb': ('import_scene', 'gltf', {}),
+        '.gltf': ('import_scene', 'gltf', {}),
+    }
+    
+    def execute(self, context):
+        import os
+        import time
+        
+        path = bpy.path.abspath(self.filepath)
+        start_time = time.time()
+        try:
+            robot = parse_urdf(path)
+        except Exception as e:
+            self.report({'ERROR'}, f"解析URDF失败: {str(e)}")
+            print(f"解析URDF错误: {e}")
+            return {'CANCELLED'}
+        
+        print(f"\n{'='*60}")
+        print(f"导入URDF: {robot['name']} ({len(robot['links'])} 个link, {len(robot['joints'])} 个关节)")
+        print(f"{'='*60}")
+        
+        self.urdf_dir = os.path.dirname(path)
+        self.named_materials = robot['materials']
+        self.mesh_cache = {}
+        self.primitive_cache = {}
+        self.material_cache = {}
+        self.missing = set()
+        
+        collection = bpy.data.collections.new(robot['name'])
+        context.scene.collection.children.link(collection)
+        
+        links = {}
+        for link in robot['links']:
+            obj = bpy.data.objects.new(link['name'], None)
+            obj.empty_display_type = 'ARROWS'
+            obj.empty_display_size = 0.1
+            collection.objects.link(obj)
+            set_phobostype(obj, 'link')
+            obj['link/name'] = link['name']
+            links[link['name']] = obj
+        
+        joint_count = 0
+        for joint in robot['joints']:
+            parent = links.get(joint['parent'])
+            child = links.get(joint['child'])
+            if parent is None or child is None:
+                print(f"  ✗ 关节 {joint['name']}: 找不到link {joint['parent']} / {joint['child']}")
+                continue
+            child.parent = parent
+            child.matrix_basis = Matrix(joint['origin'].tolist())
+            self.write_joint(child, joint)
+            joint_count += 1
+        
+        instances = 0
+        for link in robot['links']:
+            obj = links[link['name']]
+            if self.import_visual:
+                for k, item in enumerate(link['visuals']):
+                    name = item['name'] or (f"visual_{link['name']}" + (f"_{k}" if k else ""))
+                    visual = self.create_geometry(collection, obj, item, 'visual', name)
+                    if visual is not None:
+                        self.assign_material(visual, item.get('material'))
+                        instances += 1
+            if self.import_collision:
+                for k, item in enumerate(link['collisions']):
+                    name = item['name'] or (f"collision_{link['name']}" + (f"_{k}" if k else ""))
+                    if self.create_geometry(collection, obj, item, 'collision', name) is not None:
+                        instances += 1
+            if self.import_inertial and link['inertial'] is not None:
+                self.create_inertial(collection, obj, link['name'], link['inertial'])
+        
+        loaded = sum(1 for mesh in self.mesh_cache.values() if mesh is not None)
+        for missing in sorted(self.missing):
+            print(f"  ✗ 找不到网格: {missing}")
+        print(f"  网格文件: {loaded} 个, 几何实例: {instances} 个")
+        print(f"✓ 导入完成, 用时 {time.time() - start_time:.2f} 秒")
+        print(f"{'='*60}\n")
+        
+        self.report({'INFO'}, f"已导入 {len(links)} 个link, {joint_count} 个关节, {loaded} 个网格文件（{instances} 个实例）")
+        return {'FINISHED'}
+    
+    def write_joint(self, obj, joint):
+        """按插件的关节属性格式写入（转动用joint/limits/*，滑动用joint/limit/*）"""
+        obj['joint/type'] = joint['type']
+        obj['joint/name'] = joint['name']
+        if joint['type'] == 'fixed':
+            return
+        obj['joint/axis'] = joint['axis']
+        prefix = 'joint/limit/' if joint['type'] == 'prismatic' else 'joint/limits/'
+        for key, value in joint['limit'].items():
+            obj[prefix + key] = value
+        for key, value in joint['dynamics'].items():
+            obj['joint/dynamics/' + key] = value
+    
+    def create_geometry(self, collection, link_obj, item, phobostype, name):
+        """创建visual/collision对象，网格数据按文件或图元类型共享"""
+        geometry = item['geometry']
+        if geometry is None:
+            return None
+        
+        kind = geometry['type']
+        if kind == 'mesh':
+            mesh = self.load_mesh(geometry['filename'])
+            scale = geometry['scale']
+        else:
+            mesh = self.primitive_mesh(kind)
+            if kind == 'box':
+                scale = geometry['size']
+            elif kind == 'cylinder':
+                scale = [geometry['radius'], geometry['radius'], geometry['length']]
+            else:
+                scale = [geometry['radius']] * 3
+        if mesh is None:
+            return None
+        
+        obj = bpy.data.objects.new(name, mesh)
+        collection.objects.link(obj)
+        obj.parent = link_obj
+        obj.matrix_basis = Matrix(item['origin'].tolist()) @ Matrix.Diagonal(list(scale) + [1.0])
+        
+        set_phobostype(obj, phobostype)
+        obj['geometry/type'] = kind
+        if kind == 'box':
+            obj['geometry/size'] = list(geometry['size'])
+        elif kind == 'cylinder':
+            obj['geometry/radius'] = geometry['radius']
+            obj['geometry/length'] = geometry['length']
+        elif kind == 'sphere':
+            obj['geometry/radius'] = geometry['radius']
+        if phobostype == 'collision':
+            obj.display_type = 'WIRE'
+        return obj
+    
+    def load_mesh(self, filename):
+        """每个网格文件只加载一次，返回共享的网格数据"""
+        import os
+        path = resolve_urdf_mesh_path(filename, self.urdf_dir)
+        if path is None:
+            self.missing.add(filename)
+            return None
+        key = os.path.normcase(os.path.abspath(path))
+        if key in self.mesh_cache:
+            return self.mesh_cache[key]
+        
+        name = os.path.splitext(os.path.basename(path))[0]
+        extension = os.path.splitext(path)[1].lower()
+        mesh = None
+        try:
+            if extension == '.stl':
+                mesh = build_mesh_from_arrays(name, read_stl_arrays(path), [])
+            elif extension in self.MESH_IMPORTERS:
+                mesh = self.import_with_operator(name, path, extension)
+            else:
+                print(f"  ✗ 不支持的网格格式: {path}")
+        except Exception as e:
+            print(f"  ✗ 读取网格失败 {path}: {e}")
         
-        # 设置Scene的mesh导出属性
-        mesh_settings = {
-            'export_mesh_dae': True,           # 启用DAE网格导出
-            'export_mesh_stl': False,          # 禁用STL
-            'export_mesh_obj': False,          # 禁用OBJ
-        }
+        # 没有材质槽的网格补一个空槽，供各实例在对象级别指定材质
+        if mesh is not None and not mesh.materials:
+            mesh.materials.append(None)
+        self.mesh_cache[key] = mesh
+        return mesh
+    
+    def import_with_operator(self, name, path, extension):
+        """用Blender导入器读取后把所有网格合并为一个网格数据，并删除临时对象"""
+        module, operator, options = self.MESH_IMPORTERS[extension]
+        before = set(bpy.data.objects)
+        getattr(getattr(bpy.ops, module), operator)(filepath=path, **options)
+        imported = [obj for obj in bpy.data.objects if obj not in before]
+        bpy.context.view_layer.update()
         
-        for attr_name, value in mesh_settings.items():
-            try:
-                if hasattr(scene, attr_name):
-                    setattr(scene, attr_name, value)
-                    status = "启用" if value else "禁用"
-                    print(f"    {status}: {attr_name}")
-                    success += 1
-                    
-            except Exception as e:
-                print(f"    设置 {attr_name} 失败: {e}")
+        meshes = [obj for obj in imported if obj.type == 'MESH']
+        mesh = None
+        if meshes:
+            arrays, materials = merge_objects_to_arrays(meshes, np.eye(4))
+            mesh = build_mesh_from_arrays(name, arrays, materials)
         
-        return success
+        old_data = {obj.data for obj in meshes}
+        bpy.data.batch_remove(imported)
+        bpy.data.batch_remove([data for data in old_data if data.users == 0])
+        return mesh
+    
+    def primitive_mesh(self, kind):
+        """单位尺寸图元网格（box边长1，cylinder半径1高1，sphere半径1），由对象缩放给出实际尺寸"""
+        if kind in self.primitive_cache:
+            return self.primitive_cache[kind]
+        bm = bmesh.new()
+        if kind == 'box':
+            bmesh.ops.create_cube(bm, size=1.0)
+        elif kind == 'cylinder':
+            bmesh.ops.create_cone(bm, cap_ends=True, segments=32, radius1=1.0, radius2=1.0, depth=1.0)
+        else:
+            bmesh.ops.create_uvsphere(bm, u_segments=32, v_segments=16, radius=1.0)
+        mesh = bpy.data.meshes.new(f"urdf_{kind}")
+        bm.to_mesh(mesh)
+        bm.free()
+        mesh.materials.append(None)
+        self.primitive_cache[kind] = mesh
+        return mesh
+    
+    def assign_material(self, obj, material):
+        """网格本身没有材质时，按URDF材质在对象级别的材质槽中指定颜色"""
+        if material is None or any(slot.material for slot in obj.material_slots):
+            return
+        name, rgba = material
+        rgba = rgba or self.named_materials.get(name)
+        if rgba is None:
+            return
+        key = name or tuple(rgba)
+        if key not in self.material_cache:
+            blender_material = bpy.data.materials.new(name or "urdf_material")
+            blender_material.diffuse_color = rgba
+            blender_material.use_nodes = True
+            bsdf = blender_material.node_tree.nodes.get("Principled BSDF")
+            if bsdf is not None:
+                bsdf.inputs['Base Color'].default_value = rgba
+            self.material_cache[key] = blender_material
+        slot = obj.material_slots[0]
+        slot.link = 'OBJECT'
+        slot.material = self.material_cache[key]
+    
+    def create_inertial(self, collection, link_obj, link_name, inertial):
+        """创建Phobos格式的惯量空物体"""
+        obj = bpy.data.objects.new(f"inertial_{link_name}", None)
+        obj.empty_display_type = 'SPHERE'
+        obj.empty_display_size = 0.02
+        collection.objects.link(obj)
+        obj.parent = link_obj
+        obj.matrix_basis = Matrix(inertial['origin'].tolist())
+        set_phobostype(obj, 'inertial')
+        obj['inertial/mass'] = inertial['mass']
+        obj['inertial/inertia'] = inertial['inertia']
+    
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
 
 class URDF_OT_PhobosCreateLink(Operator):
     """Create a Phobos Link"""
@@ -1975,6 +7028,788 @@ class URDF_OT_DebugJointProperties(Operator):
         
         return {'FINISHED'}
 
+class URDF_OT_GenerateSRDF(Operator):
+    """生成自碰撞矩阵SRDF（disable_collisions）"""
+    bl_idname = "urdf.generate_srdf"
+    bl_label = "Generate SRDF Collision Matrix"
+    bl_description = "在关节限制内随机采样关节配置，用BVH测试每对link的碰撞，输出从不碰撞/总是碰撞/相邻link的disable_collisions列表"
+    bl_options = {'REGISTER'}
+    
+    filepath: StringProperty(
+        name="SRDF Path",
+        description="SRDF输出文件",
+        subtype='FILE_PATH'
+    )
+    
+    num_samples: IntProperty(
+        name="Samples",
+        description="随机采样的关节配置数量",
+        default=1000,
+        min=1
+    )
+    
+    seed: IntProperty(
+        name="Random Seed",
+        description="采样随机种子",
+        default=0
+    )
+    
+    BATCH_SIZE = 1024
+    
+    def execute(self, context):
+        model = KinematicModel(context.scene)
+        if len(model.links) < 2:
+            self.report({'ERROR'}, "至少需要两个link")
+            return {'CANCELLED'}
+        
+        print(f"\n{'='*60}")
+        print(f"生成SRDF: {len(model.links)} 个link, {model.dof} 个可动关节, {self.num_samples} 次采样")
+        print(f"{'='*60}")
+        
+        collision = LinkCollisionModel(model, context.scene)
+        reasons = self.classify_pairs(model, collision)
+        
+        try:
+            self.write_srdf(get_model_name(context.scene), model, reasons)
+        except Exception as e:
+            self.report({'ERROR'}, f"写入SRDF失败: {str(e)}")
+            print(f"写入SRDF错误: {e}")
+            return {'CANCELLED'}
+        
+        summary = {}
+        for reason in reasons.values():
+            summary[reason] = summary.get(reason, 0) + 1
+        for reason, count in sorted(summary.items()):
+            print(f"  {reason}: {count}")
+        print(f"✓ 已写入: {self.filepath}")
+        print(f"{'='*60}\n")
+        
+        self.report({'INFO'}, f"SRDF已生成: {len(reasons)} 个禁用碰撞对")
+        return {'FINISHED'}
+    
+    def classify_pairs(self, model, collision):
+        """返回 {(link_a, link_b): reason} 的禁用碰撞对"""
+        reasons = {}
+        count = len(model.links)
+        pairs = []
+        for a in range(count):
+            for b in range(a + 1, count):
+                if model.parent[a] == b or model.parent[b] == a:
+                    reasons[(a, b)] = "Adjacent"
+                elif collision.has_geometry(a) and collision.has_geometry(b):
+                    pairs.append((a, b))
+        if not pairs:
+            return reasons
+        
+        pairs = np.array(pairs, dtype=np.int64)
+        
+        # 零位即碰撞的link对
+        zero = np.zeros(model.dof)
+        default = collision.test_pairs(model.link_poses(zero), pairs)
+        for a, b in pairs[default].tolist():
+            reasons[(a, b)] = "Default"
+        pairs = pairs[~default]
+        
+        # 仍可能"从不碰撞"或"总是碰撞"的link对才需要继续测试
+        never = np.ones(len(pairs), dtype=bool)
+        always = np.ones(len(pairs), dtype=bool)
+        rng = np.random.default_rng(self.seed)
+        samples = model.sample_configurations(self.num_samples, rng)
+        for start in range(0, len(samples), self.BATCH_SIZE):
+            if not (never | always).any():
+                break
+            # 一批配置的位姿一次性计算
+            batch_poses = model.forward_kinematics(samples[start:start + self.BATCH_SIZE])
+            for poses in batch_poses:
+                pending = never | always
+                if not pending.any():
+                    break
+                hit = collision.test_pairs(poses, pairs, pending)
+                never &= ~(hit & pending)
+                always &= hit | ~pending
+        
+        for a, b in pairs[never].tolist():
+            reasons[(a, b)] = "Never"
+        for a, b in pairs[always & ~never].tolist():
+            reasons[(a, b)] = "Always"
+        return reasons
+    
+    def write_srdf(self, robot_name, model, reasons):
+        """写出SRDF文件"""
+        import os
+        import xml.etree.ElementTree as ET
+        
+        robot = ET.Element('robot', name=robot_name)
+        for (a, b), reason in sorted(reasons.items()):
+            ET.SubElement(robot, 'disable_collisions',
+                          link1=model.names[a], link2=model.names[b], reason=reason)
+        tree = ET.ElementTree(robot)
+        if hasattr(ET, 'indent'):
+            ET.indent(tree, space="  ")
+        
+        directory = os.path.dirname(bpy.path.abspath(self.filepath))
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tree.write(bpy.path.abspath(self.filepath), encoding='utf-8', xml_declaration=True)
+    
+    def invoke(self, context, event):
+        import os
+        model_name = get_model_name(context.scene)
+        self.filepath = os.path.join(os.path.expanduser("~"), "Documents", "URDF_Export", f"{model_name}.srdf")
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+class URDF_OT_SuggestJointLimits(Operator):
+    """根据碰撞扫描建议关节限制"""
+    bl_idname = "urdf.suggest_joint_limits"
+    bl_label = "Suggest Joint Limits"
+    bl_description = "沿每个关节的运动范围扫描，用缓存的link BVH测试运动子树与其余部分的碰撞，建议最大的无碰撞区间"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    revolute_range: FloatProperty(
+        name="Revolute Sweep",
+        description="转动关节单侧扫描范围 (rad)",
+        default=3.14159,
+        min=0.0,
+        subtype='ANGLE'
+    )
+    
+    prismatic_range: FloatProperty(
+        name="Prismatic Sweep",
+        description="滑动关节单侧扫描范围 (m)",
+        default=1.0,
+        min=0.0
+    )
+    
+    revolute_step: FloatProperty(
+        name="Revolute Step",
+        description="转动关节扫描步长 (rad)",
+        default=0.0349066,
+        min=0.0001,
+        subtype='ANGLE'
+    )
+    
+    prismatic_step: FloatProperty(
+        name="Prismatic Step",
+        description="滑动关节扫描步长 (m)",
+        default=0.01,
+        min=0.00001
+    )
+    
+    only_selected: BoolProperty(
+        name="Selected Joints Only",
+        description="只处理选中的关节link",
+        default=False
+    )
+    
+    apply_limits: BoolProperty(
+        name="Apply",
+        description="将建议值写入关节限制属性（否则只输出报告）",
+        default=True
+    )
+    
+    def execute(self, context):
+        model = KinematicModel(context.scene)
+        if not model.dof:
+            self.report({'WARNING'}, "场景中没有可动关节")
+            return {'CANCELLED'}
+        
+        collision = LinkCollisionModel(model, context.scene)
+        selected = set(context.selected_objects)
+        zero = np.zeros(model.dof)
+        zero_poses = model.link_poses(zero)
+        
+        print(f"\n{'='*60}")
+        print(f"关节限制建议: {model.dof} 个可动关节")
+        print(f"{'='*60}")
+        
+        updated = 0
+        for joint, link_index in enumerate(model.joint_links):
+            link = model.links[link_index]
+            if self.only_selected and link not in selected:
+                continue
+            
+            pairs = self.joint_pairs(model, collision, link_index, zero_poses)
+            lower, upper = self.sweep(model, collision, joint, pairs)
+            old_lower, old_upper = read_joint_limits(link)
+            
+            unit = "m" if model.prismatic[joint] else "rad"
+            print(f"  {model.joint_names[joint]} ({model.joint_types[joint]}): "
+                  f"{old_lower} ~ {old_upper} → {lower:.4f} ~ {upper:.4f} {unit} "
+                  f"({len(pairs)} 个检测对)")
+            
+            if self.apply_limits:
+                self.write_limits(link, lower, upper)
+                updated += 1
+        
+        print(f"{'='*60}\n")
+        if self.apply_limits:
+            self.report({'INFO'}, f"已更新 {updated} 个关节的限制")
+        else:
+            self.report({'INFO'}, "关节限制建议已输出到控制台")
+        return {'FINISHED'}
+    
+    def joint_pairs(self, model, collision, link_index, zero_poses):
+        """运动子树与其余link之间需要检测的link对（排除父link及零位已接触的对）"""
+        moving = model.subtree(link_index)
+        static = [i for i in range(len(model.links))
+                  if i not in moving and i != model.parent[link_index]]
+        pairs = np.array([(m, t) for m in sorted(moving) for t in static
+                          if collision.has_geometry(m) and collision.has_geometry(t)],
+                         dtype=np.int64).reshape(-1, 2)
+        if len(pairs):
+            pairs = pairs[~collision.test_pairs(zero_poses, pairs)]
+        return pairs
+    
+    def sweep(self, model, collision, joint, pairs):
+        """从零位向两侧扫描，返回最大无碰撞区间"""
+        if model.prismatic[joint]:
+            limit, step = self.prismatic_range, self.prismatic_step
+        else:
+            limit, step = self.revolute_range, self.revolute_step
+        
+        values = np.arange(1, int(np.floor(limit / step + 1e-9)) + 1) * step
+        bounds = []
+        for direction in (-1.0, 1.0):
+            free = 0.0
+            if len(pairs) and len(values):
+                # 整个扫描方向的位姿批量计算，逐步检测直到首次碰撞
+                configurations = np.zeros((len(values), model.dof))
+                configurations[:, joint] = direction * values
+                for value, poses in zip(values, model.forward_kinematics(configurations)):
+                    if collision.test_pairs(poses, pairs).any():
+                        break
+                    free = value
+            elif len(values):
+                free = values[-1]
+            bounds.append(direction * free)
+        return bounds[0], bounds[1]
+    
+    def write_limits(self, link, lower, upper):
+        """按对象已有的限制属性格式写入（与设定关节属性一致）"""
+        if 'joint/limits/lower' in link or 'joint/limits/upper' in link:
+            link['joint/limits/lower'] = lower
+            link['joint/limits/upper'] = upper
+        else:
+            link['joint/limit/lower'] = lower
+            link['joint/limit/upper'] = upper
+
+class URDF_OT_ReachabilityMap(Operator):
+    """生成末端执行器工作空间可达性地图"""
+    bl_idname = "urdf.reachability_map"
+    bl_label = "Generate Reachability Map"
+    bl_description = "在关节限制内分块随机采样，批量计算末端link位置并体素化，保存为压缩的NumPy可达性网格（.npz），可选显示为点云"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    filepath: StringProperty(
+        name="Map Path",
+        description="可达性网格输出文件（.npz）",
+        subtype='FILE_PATH'
+    )
+    
+    end_effector: StringProperty(
+        name="End Effector",
+        description="末端link名称（link/name或对象名）；留空时使用活动link，否则使用层级最深的link",
+        default=""
+    )
+    
+    num_samples: IntProperty(
+        name="Samples",
+        description="随机采样的关节配置数量",
+        default=1000000,
+        min=1
+    )
+    
+    chunk_size: IntProperty(
+        name="Chunk Size",
+        description="每块采样数量，决定内存占用上限",
+        default=100000,
+        min=1000
+    )
+    
+    voxel_size: FloatProperty(
+        name="Voxel Size",
+        description="体素边长 (m)",
+        default=0.02,
+        min=0.0001
+    )
+    
+    seed: IntProperty(
+        name="Random Seed",
+        description="采样随机种子",
+        default=0
+    )
+    
+    create_point_cloud: BoolProperty(
+        name="Show Point Cloud",
+        description="在场景中创建体素中心点云对象（带reachability属性）",
+        default=True
+    )
+    
+    # 体素索引打包为int64键时每个轴占用的位数
+    KEY_BITS = 21
+    
+    def execute(self, context):
+        model = KinematicModel(context.scene)
+        if not model.dof:
+            self.report({'ERROR'}, "场景中没有可动关节")
+            return {'CANCELLED'}
+        
+        effector = self.find_end_effector(context, model)
+        if effector is None:
+            self.report({'ERROR'}, f"找不到末端link: {self.end_effector}")
+            return {'CANCELLED'}
+        
+        print(f"\n{'='*60}")
+        print(f"可达性地图: 末端 {model.names[effector]}, {self.num_samples} 次采样, 体素 {self.voxel_size} m")
+        print(f"{'='*60}")
+        
+        keys, counts = self.accumulate(model, effector)
+        indices = self.unpack_keys(keys)
+        reachability = (counts / counts.max()).astype(np.float32)
+        
+        try:
+            self.save_map(context, model, effector, indices, counts)
+        except Exception as e:
+            self.report({'ERROR'}, f"写入可达性地图失败: {str(e)}")
+            print(f"写入可达性地图错误: {e}")
+            return {'CANCELLED'}
+        
+        if self.create_point_cloud:
+            self.build_point_cloud(context, model, effector, indices, reachability)
+        
+        extent = (indices.max(axis=0) - indices.min(axis=0) + 1) * self.voxel_size
+        print(f"  占用体素: {len(indices)}")
+        print(f"  包围尺寸: {extent[0]:.3f} x {extent[1]:.3f} x {extent[2]:.3f} m")
+        print(f"✓ 已写入: {self.filepath}")
+        print(f"{'='*60}\n")
+        
+        self.report({'INFO'}, f"可达性地图已生成: {len(indices)} 个体素")
+        return {'FINISHED'}
+    
+    def find_end_effector(self, context, model):
+        """按名称、活动对象或层级深度确定末端link索引"""
+        if self.end_effector:
+            for i, link in enumerate(model.links):
+                if self.end_effector in (model.names[i], link.name):
+                    return i
+            return None
+        
+        active = context.active_object
+        if active in model.links:
+            return model.links.index(active)
+        
+        # 默认取可动关节最多的叶子link
+        depth = np.zeros(len(model.links), dtype=np.int64)
+        for i in range(len(model.links)):
+            p = model.parent[i]
+            depth[i] = (depth[p] if p >= 0 else 0) + (model.joint_index[i] >= 0)
+        return int(np.argmax(depth))
+    
+    def accumulate(self, model, effector):
+        """分块采样并累加体素计数，内存只与块大小和占用体素数有关"""
+        rng = np.random.default_rng(self.seed)
+        offset = 1 << (self.KEY_BITS - 1)
+        keys = np.empty(0, dtype=np.int64)
+        counts = np.empty(0, dtype=np.int64)
+        
+        for start in range(0, self.num_samples, self.chunk_size):
+            count = min(self.chunk_size, self.num_samples - start)
+            samples = model.sample_configurations(count, rng)
+            positions = model.forward_kinematics(samples, links=[effector])[:, 0, :3, 3]
+            
+            voxels = np.floor(positions / self.voxel_size).astype(np.int64) + offset
+            chunk_keys = (voxels[:, 0] << (2 * self.KEY_BITS)) | (voxels[:, 1] << self.KEY_BITS) | voxels[:, 2]
+            chunk_keys, chunk_counts = np.unique(chunk_keys, return_counts=True)
+            
+            # 与已有体素合并
+            keys, inverse = np.unique(np.concatenate([keys, chunk_keys]), return_inverse=True)
+            counts = np.bincount(inverse, weights=np.concatenate([counts, chunk_counts]),
+                                 minlength=len(keys)).astype(np.int64)
+            print(f"  {start + count}/{self.num_samples} 采样, {len(keys)} 个体素")
+        return keys, counts
+    
+    def unpack_keys(self, keys):
+        """int64键还原为 (N, 3) 体素索引"""
+        mask = (1 << self.KEY_BITS) - 1
+        offset = 1 << (self.KEY_BITS - 1)
+        indices = np.stack([(keys >> (2 * self.KEY_BITS)) & mask,
+                            (keys >> self.KEY_BITS) & mask,
+                            keys & mask], axis=1) - offset
+        return indices.astype(np.int32)
+    
+    def save_map(self, context, model, effector, indices, counts):
+        """保存稀疏体素网格：索引、计数和元数据"""
+        import os
+        path = bpy.path.abspath(self.filepath)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez_compressed(
+            path,
+            indices=indices,
+            counts=counts,
+            voxel_size=np.float64(self.voxel_size),
+            num_samples=np.int64(self.num_samples),
+            end_effector=np.str_(model.names[effector]),
+            base_link=np.str_(model.names[0]),
+            joint_names=np.array([model.joint_names[j] for j in range(model.dof)]),
+            lower=model.lower,
+            upper=model.upper,
+            model_name=np.str_(get_model_name(context.scene))
+        )
+        # np.savez会自动补上.npz后缀
+        if not path.endswith('.npz'):
+            self.filepath = self.filepath + '.npz'
+    
+    def build_point_cloud(self, context, model, effector, indices, reachability):
+        """创建体素中心点云对象，reachability作为点属性"""
+        name = f"{model.names[effector]}_reachability"
+        mesh = bpy.data.meshes.new(name)
+        centers = ((indices + 0.5) * self.voxel_size).astype(np.float32)
+        mesh.vertices.add(len(centers))
+        mesh.vertices.foreach_set("co", centers.ravel())
+        attribute = mesh.attributes.new(name="reachability", type='FLOAT', domain='POINT')
+        attribute.data.foreach_set("value", reachability)
+        mesh.update()
+        
+        obj = bpy.data.objects.new(name, mesh)
+        context.collection.objects.link(obj)
+        return obj
+    
+    def invoke(self, context, event):
+        import os
+        model_name = get_model_name(context.scene)
+        self.filepath = os.path.join(os.path.expanduser("~"), "Documents", "URDF_Export", f"{model_name}_reachability.npz")
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+class URDF_OT_ExportTrajectory(Operator):
+    """导出关节轨迹"""
+    bl_idname = "urdf.export_trajectory"
+    bl_label = "Export Joint Trajectory"
+    bl_description = "在帧范围内采样每个可动关节的值（直接读取F-curve），以joint/name为列名导出为压缩的.npz或CSV"
+    bl_options = {'REGISTER'}
+    
+    filepath: StringProperty(
+        name="Trajectory Path",
+        description="轨迹输出文件",
+        subtype='FILE_PATH'
+    )
+    
+    file_format: EnumProperty(
+        name="Format",
+        description="输出格式",
+        items=[
+            ('NPZ', "NPZ", "压缩NumPy数组（frames、time、values、joint_names）"),
+            ('CSV', "CSV", "逗号分隔文本，每行一帧"),
+        ],
+        default='NPZ'
+    )
+    
+    frame_start: IntProperty(
+        name="Start Frame",
+        description="采样起始帧",
+        default=1
+    )
+    
+    frame_end: IntProperty(
+        name="End Frame",
+        description="采样结束帧（包含）",
+        default=250
+    )
+    
+    frame_step: IntProperty(
+        name="Frame Step",
+        description="采样间隔帧数",
+        default=1,
+        min=1
+    )
+    
+    # 读取F-curve后重建的matrix_basis与实际值的允许误差
+    BASIS_TOLERANCE = 1e-4
+    
+    def execute(self, context):
+        scene = context.scene
+        if self.frame_end < self.frame_start:
+            self.report({'ERROR'}, "结束帧不能早于起始帧")
+            return {'CANCELLED'}
+        
+        model = KinematicModel(scene)
+        if not model.dof:
+            self.report({'ERROR'}, "场景中没有可动关节")
+            return {'CANCELLED'}
+        
+        frames = np.arange(self.frame_start, self.frame_end + 1, self.frame_step, dtype=np.float64)
+        values = np.zeros((len(frames), model.dof))
+        
+        # 能直接由F-curve重建局部变换的关节走快速路径，其余逐帧求值
+        fallback = []
+        for joint, link_index in enumerate(model.joint_links):
+            motion = self.sample_fcurve_motion(model.links[link_index], frames)
+            if motion is None:
+                fallback.append(joint)
+                continue
+            values[:, joint] = joint_values_from_motion(motion, model.axes[joint], model.prismatic[joint])
+        
+        if fallback:
+            values[:, fallback] = self.sample_evaluated(context, model, fallback, frames)
+        
+        fps = scene.render.fps / scene.render.fps_base
+        try:
+            self.write_trajectory(model, frames, frames / fps, values)
+        except Exception as e:
+            self.report({'ERROR'}, f"写入轨迹失败: {str(e)}")
+            print(f"写入轨迹错误: {e}")
+            return {'CANCELLED'}
+        
+        print(f"\n{'='*60}")
+        print(f"关节轨迹: {model.dof} 个关节, {len(frames)} 帧")
+        print(f"  F-curve直接读取: {model.dof - len(fallback)} 个关节")
+        if fallback:
+            print(f"  逐帧求值（约束/驱动器/NLA）: {', '.join(model.joint_names[j] for j in fallback)}")
+        print(f"✓ 已写入: {self.filepath}")
+        print(f"{'='*60}\n")
+        
+        self.report({'INFO'}, f"已导出 {model.dof} 个关节 × {len(frames)} 帧的轨迹")
+        return {'FINISHED'}
+    
+    def sample_fcurve_motion(self, obj, frames):
+        """由F-curve重建各帧的matrix_basis，返回相对当前matrix_basis的运动 (F, 4, 4)
+
+        有约束、变换驱动器、NLA或无法重建当前matrix_basis时返回None。
+        """
+        transform_paths = ('location', 'rotation_euler', 'rotation_quaternion', 'rotation_axis_angle', 'scale')
+        animation = obj.animation_data
+        if obj.constraints:
+            return None
+        fcurves = {}
+        if animation:
+            if animation.nla_tracks or any(d.data_path in transform_paths for d in animation.drivers):
+                return None
+            if animation.action:
+                for fcurve in action_fcurves(animation):
+                    if fcurve.data_path in transform_paths and not fcurve.mute:
+                        fcurves[(fcurve.data_path, fcurve.array_index)] = fcurve
+        
+        def channel(path, current):
+            data = np.tile(np.array(current, dtype=np.float64), (len(frames), 1))
+            for k in range(data.shape[1]):
+                fcurve = fcurves.get((path, k))
+                if fcurve is not None:
+                    data[:, k] = [fcurve.evaluate(frame) for frame in frames]
+            return data
+        
+        mode = obj.rotation_mode
+        if mode == 'QUATERNION':
+            rotation = quaternion_to_matrices(channel('rotation_quaternion', obj.rotation_quaternion))
+            current = quaternion_to_matrices(np.array([obj.rotation_quaternion], dtype=np.float64))
+        elif mode == 'AXIS_ANGLE':
+            rotation = axis_angle_to_matrices(channel('rotation_axis_angle', obj.rotation_axis_angle))
+            current = axis_angle_to_matrices(np.array([obj.rotation_axis_angle], dtype=np.float64))
+        else:
+            rotation = euler_to_matrices(channel('rotation_euler', obj.rotation_euler), mode)
+            current = euler_to_matrices(np.array([obj.rotation_euler], dtype=np.float64), mode)
+        
+        location = channel('location', obj.location)
+        scale = channel('scale', obj.scale)
+        basis = np.zeros((len(frames), 4, 4))
+        basis[:, :3, :3] = rotation * scale[:, None, :]
+        basis[:, :3, 3] = location
+        basis[:, 3, 3] = 1.0
+        
+        # 当前值重建结果必须与matrix_basis一致（排除delta变换等情况）
+        rest = matrix_to_numpy(obj.matrix_basis)
+        rebuilt = np.eye(4)
+        rebuilt[:3, :3] = current[0] * np.array(obj.scale)
+        rebuilt[:3, 3] = obj.location
+        if not np.allclose(rebuilt, rest, atol=self.BASIS_TOLERANCE):
+            return None
+        return np.linalg.inv(rest) @ basis
+    
+    def sample_evaluated(self, context, model, joints, frames):
+        """逐帧设置场景帧并读取求值后的世界矩阵，返回 (F, len(joints)) 关节值"""
+        scene = context.scene
+        original_frame = scene.frame_current
+        links = [model.links[model.joint_links[j]] for j in joints]
+        parents = [model.links[model.parent[model.joint_links[j]]] for j in joints]
+        local = np.zeros((len(joints), len(frames), 4, 4))
+        try:
+            for f, frame in enumerate(frames):
+                scene.frame_set(int(frame))
+                for k, (link, parent) in enumerate(zip(links, parents)):
+                    world = matrix_to_numpy(link.matrix_world)
+                    parent_world = matrix_to_numpy(parent.matrix_world)
+                    world[:3, :3] = polar_decompose(world[:3, :3])[0]
+                    parent_world[:3, :3] = polar_decompose(parent_world[:3, :3])[0]
+                    local[k, f] = np.linalg.inv(parent_world) @ world
+        finally:
+            scene.frame_set(original_frame)
+        
+        values = np.zeros((len(frames), len(joints)))
+        for k, joint in enumerate(joints):
+            motion = np.linalg.inv(model.rest[model.joint_links[joint]]) @ local[k]
+            values[:, k] = joint_values_from_motion(motion, model.axes[joint], model.prismatic[joint])
+        return values
+    
+    def write_trajectory(self, model, frames, times, values):
+        """写出NPZ或CSV"""
+        import os
+        path = bpy.path.abspath(self.filepath)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        if self.file_format == 'NPZ':
+            np.savez_compressed(
+                path,
+                frames=frames.astype(np.int64),
+                time=times,
+                values=values,
+                joint_names=np.array(model.joint_names),
+                joint_types=np.array(model.joint_types)
+            )
+        else:
+            header = ",".join(["frame", "time"] + list(model.joint_names))
+            table = np.column_stack([frames, times, values])
+            np.savetxt(path, table, delimiter=",", header=header, comments="",
+                       fmt=["%d", "%.6f"] + ["%.9g"] * model.dof)
+    
+    def invoke(self, context, event):
+        import os
+        scene = context.scene
+        self.frame_start = scene.frame_start
+        self.frame_end = scene.frame_end
+        self.frame_step = scene.frame_step
+        model_name = get_model_name(scene)
+        extension = ".npz" if self.file_format == 'NPZ' else ".csv"
+        self.filepath = os.path.join(os.path.expanduser("~"), "Documents", "URDF_Export", f"{model_name}_trajectory{extension}")
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+# === 关节预览 ===
+
+# 滑块变化在该间隔内合并为一次写入
+JOINT_PREVIEW_INTERVAL = 1.0 / 30.0
+
+# link对象名 -> 待写入的 matrix_basis
+_joint_preview_pending = {}
+
+def joint_preview_value(item):
+    """由滑块位置换算关节值"""
+    return item.lower + item.position * (item.upper - item.lower)
+
+def joint_preview_rest(item):
+    """缓存的零位matrix_basis（按行展开存储）"""
+    rest = item.rest_basis
+    return Matrix([rest[0:4], rest[4:8], rest[8:12], rest[12:16]])
+
+def joint_preview_basis(item):
+    """由缓存的零位matrix_basis与关节值计算link新的matrix_basis"""
+    rest = joint_preview_rest(item)
+    value = joint_preview_value(item)
+    axis = Vector(item.axis)
+    if item.prismatic:
+        return rest @ Matrix.Translation(axis * value)
+    return rest @ Matrix.Rotation(value, 4, axis)
+
+def flush_joint_preview():
+    """计时器回调：只写入发生变化的关节link，子树由父子关系带动"""
+    pending = dict(_joint_preview_pending)
+    _joint_preview_pending.clear()
+    for link_name, basis in pending.items():
+        obj = bpy.data.objects.get(link_name)
+        if obj is not None:
+            obj.matrix_basis = basis
+    return None
+
+def on_joint_preview_update(self, context):
+    """滑块回调：记录最新值，同一间隔内的多次变化只触发一次写入"""
+    _joint_preview_pending[self.link_name] = joint_preview_basis(self)
+    if not bpy.app.timers.is_registered(flush_joint_preview):
+        bpy.app.timers.register(flush_joint_preview, first_interval=JOINT_PREVIEW_INTERVAL)
+
+def restore_joint_preview(items):
+    """把预览中的link恢复到零位并清空缓存"""
+    _joint_preview_pending.clear()
+    for item in items:
+        obj = bpy.data.objects.get(item.link_name)
+        if obj is not None:
+            obj.matrix_basis = joint_preview_rest(item)
+    items.clear()
+
+class URDF_JointPreviewItem(PropertyGroup):
+    """关节预览缓存：关节轴、限制和link零位matrix_basis"""
+    link_name: StringProperty(name="Link")
+    prismatic: BoolProperty(name="Prismatic", default=False)
+    axis: FloatVectorProperty(name="Axis", size=3, default=(0.0, 0.0, 1.0))
+    lower: FloatProperty(name="Lower", default=-3.14159)
+    upper: FloatProperty(name="Upper", default=3.14159)
+    rest_basis: FloatVectorProperty(name="Rest Basis", size=16)
+    position: FloatProperty(
+        name="Position",
+        description="关节在限制范围内的位置",
+        default=0.5,
+        min=0.0,
+        max=1.0,
+        subtype='FACTOR',
+        update=on_joint_preview_update
+    )
+
+class URDF_OT_JointPreviewLoad(Operator):
+    """载入关节预览"""
+    bl_idname = "urdf.joint_preview_load"
+    bl_label = "Load Joint Preview"
+    bl_description = "按当前姿态缓存所有可动关节的轴、限制和零位变换，为每个关节生成预览滑块"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    def execute(self, context):
+        items = context.scene.urdf_joint_preview
+        # 重新载入前先回到零位，避免把预览姿态当作零位
+        if len(items):
+            restore_joint_preview(items)
+            context.view_layer.update()
+        
+        model = KinematicModel(context.scene)
+        if not model.dof:
+            self.report({'WARNING'}, "场景中没有可动关节")
+            return {'CANCELLED'}
+        
+        for joint, link_index in enumerate(model.joint_links):
+            link = model.links[link_index]
+            item = items.add()
+            item.name = model.joint_names[joint]
+            item.link_name = link.name
+            item.prismatic = bool(model.prismatic[joint])
+            item.axis = model.axes[joint].tolist()
+            item.lower = model.lower[joint]
+            item.upper = model.upper[joint]
+            item.rest_basis = [value for row in link.matrix_basis for value in row]
+            
+            span = item.upper - item.lower
+            position = (0.0 - item.lower) / span if span > 0 else 0.0
+            # 直接写入存储值，零位在限制内时不触发回调
+            item["position"] = min(max(position, 0.0), 1.0)
+            if not 0.0 <= position <= 1.0:
+                on_joint_preview_update(item, context)
+        
+        self.report({'INFO'}, f"已载入 {len(items)} 个关节")
+        return {'FINISHED'}
+
+class URDF_OT_JointPreviewReset(Operator):
+    """恢复关节零位"""
+    bl_idname = "urdf.joint_preview_reset"
+    bl_label = "Reset Joint Preview"
+    bl_description = "把所有预览中的关节link恢复到载入时的零位并清空预览滑块"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    def execute(self, context):
+        items = context.scene.urdf_joint_preview
+        count = len(items)
+        restore_joint_preview(items)
+        self.report({'INFO'}, f"已恢复 {count} 个关节的零位")
+        return {'FINISHED'}
+
 class URDF_PT_MainPanel(Panel):
     """Main panel for URDF tools"""
     bl_label = "URDF Data Processor"
@@ -1990,8 +7825,10 @@ class URDF_PT_MainPanel(Panel):
         box = layout.box()
         box.label(text="前置修改", icon='MODIFIER_DATA')
         col = box.column(align=True)
+        col.operator("urdf.convert_units", text="CAD单位换算为米")
         col.operator("urdf.clear_parent_keep_transform", text="清除父类关系")
         col.operator("urdf.delete_non_mesh", text="删除多余模块（非网格类）")
+        col.operator("urdf.cleanup_meshes", text="网格批量清理")
         col.operator("urdf.set_visual_mesh", text="设定Phobos及几何类型")
         
         # === 快捷键 ===
@@ -2006,11 +7843,14 @@ class URDF_PT_MainPanel(Panel):
         box = layout.box()
         box.label(text="links创建及设定", icon='OUTLINER_OB_ARMATURE')
         col = box.column(align=True)
+        col.operator("urdf.segment_links", text="自动划分link候选")
         col.operator("urdf.phobos_create_link", text="*创建link")
         col.operator("urdf.name_links", text="一键命名links（按数字）")
         col.operator("urdf.create_base_link", text="命名base_link")
+        col.operator("urdf.auto_bind_nearest_link", text="自动绑定网格至最近link")
         col.operator("urdf.parent_to_base", text="绑定非移动模块及其他link至base_link")
         col.operator("urdf.set_module_root", text="base_link设定")
+        col.operator("urdf.normalize_transforms", text="全部link及网格变换归一化")
         
         # === 关节设定 ===
         box = layout.box()
@@ -2021,12 +7861,27 @@ class URDF_PT_MainPanel(Panel):
         col.operator("urdf.define_joint_phobos", text="*设定关节属性")
         col.operator("urdf.debug_joint_properties", text="link属性检查（控制台输出）")
         
+        # === 运动规划 ===
+        box = layout.box()
+        box.label(text="运动规划", icon='ORIENTATION_GIMBAL')
+        col = box.column(align=True)
+        col.operator("urdf.generate_srdf", text="生成自碰撞矩阵（SRDF）")
+        col.operator("urdf.suggest_joint_limits", text="根据碰撞建议关节限制")
+        col.operator("urdf.reachability_map", text="生成工作空间可达性地图")
+        col.operator("urdf.export_trajectory", text="导出关节轨迹")
+        
         # === 导出设置 ===
         box = layout.box()
         box.label(text="导出设置", icon='EXPORT')
         col = box.column(align=True)
         col.operator("urdf.set_export_settings", text="设定模块及URDF类型")
         col.operator("urdf.select_export_path_and_export", text="选择路径并导出URDF")
+        col.operator("urdf.export_urdf_background", text="后台导出URDF")
+        col.operator("urdf.export_mjcf", text="导出MJCF（MuJoCo）")
+        col.operator("urdf.export_xacro", text="导出Xacro")
+        col.operator("urdf.verify_export", text="校验导出的URDF")
+        col.operator("urdf.diff_urdf", text="比较两个URDF")
+        col.operator("urdf.import_urdf", text="导入URDF")
         
         # === 当前对象信息 ===
         if context.active_object:
@@ -2077,30 +7932,79 @@ class URDF_PT_MainPanel(Panel):
                 row.label(text="Type: Not a joint", icon='OBJECT_DATA')
 
 
+class URDF_PT_JointPreview(Panel):
+    """Joint state preview panel"""
+    bl_label = "关节预览"
+    bl_idname = "URDF_PT_joint_preview"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = "URDF Tools"
+    bl_options = {'DEFAULT_CLOSED'}
+    
+    def draw(self, context):
+        layout = self.layout
+        items = context.scene.urdf_joint_preview
+        
+        row = layout.row(align=True)
+        row.operator("urdf.joint_preview_load", text="重新载入关节" if items else "载入关节", icon='FILE_REFRESH')
+        row.operator("urdf.joint_preview_reset", text="恢复零位", icon='LOOP_BACK')
+        
+        if not items:
+            layout.label(text="尚未载入关节", icon='INFO')
+            return
+        
+        col = layout.column(align=True)
+        for item in items:
+            unit = "m" if item.prismatic else "rad"
+            row = col.row(align=True)
+            row.prop(item, "position", text=item.name, slider=True)
+            row.label(text=f"{joint_preview_value(item):.3f} {unit}")
+
+
 # Keymap保持不变
 addon_keymaps = []
 
 def register():
     # Register all classes
+    bpy.utils.register_class(URDF_OT_ConvertUnits)
     bpy.utils.register_class(URDF_OT_ClearParentKeepTransform)
     bpy.utils.register_class(URDF_OT_DeleteNonMesh)
+    bpy.utils.register_class(URDF_OT_CleanupMeshes)
     bpy.utils.register_class(URDF_OT_SetVisualMesh)
     bpy.utils.register_class(URDF_OT_SmartJoin)
     bpy.utils.register_class(URDF_OT_CreateLinkAtSelection)
+    bpy.utils.register_class(URDF_OT_SegmentLinks)
     bpy.utils.register_class(URDF_OT_NameLinks)
     bpy.utils.register_class(URDF_OT_CreateBaseLink)
     bpy.utils.register_class(URDF_OT_ParentToBase)
+    bpy.utils.register_class(URDF_OT_AutoBindNearestLink)
     bpy.utils.register_class(URDF_OT_SetModuleRoot)
+    bpy.utils.register_class(URDF_OT_NormalizeTransforms)
     bpy.utils.register_class(URDF_OT_RelevantBones)
     bpy.utils.register_class(URDF_OT_SelectExportPathAndExport)
+    bpy.utils.register_class(URDF_OT_ExportMJCF)
+    bpy.utils.register_class(URDF_OT_ExportXacro)
+    bpy.utils.register_class(URDF_OT_ExportURDFBackground)
     bpy.utils.register_class(URDF_OT_SetExportSettings)
+    bpy.utils.register_class(URDF_OT_VerifyExport)
+    bpy.utils.register_class(URDF_OT_DiffURDF)
+    bpy.utils.register_class(URDF_OT_ImportURDF)
     bpy.utils.register_class(URDF_OT_PhobosCreateLink)
     bpy.utils.register_class(URDF_OT_SetJointRevolute)
     bpy.utils.register_class(URDF_OT_SetJointPrismatic)
     bpy.utils.register_class(URDF_OT_PhobosDefineJoint)
     bpy.utils.register_class(URDF_OT_AutoNameJoint)
     bpy.utils.register_class(URDF_OT_DebugJointProperties)
+    bpy.utils.register_class(URDF_OT_GenerateSRDF)
+    bpy.utils.register_class(URDF_OT_SuggestJointLimits)
+    bpy.utils.register_class(URDF_OT_ReachabilityMap)
+    bpy.utils.register_class(URDF_OT_ExportTrajectory)
+    bpy.utils.register_class(URDF_JointPreviewItem)
+    bpy.utils.register_class(URDF_OT_JointPreviewLoad)
+    bpy.utils.register_class(URDF_OT_JointPreviewReset)
     bpy.utils.register_class(URDF_PT_MainPanel)
+    bpy.utils.register_class(URDF_PT_JointPreview)
+    bpy.types.Scene.urdf_joint_preview = CollectionProperty(type=URDF_JointPreviewItem)
 
     
     # Add keymaps
@@ -2133,25 +8037,48 @@ def register():
 
 def unregister():
     # Unregister classes
+    bpy.utils.unregister_class(URDF_OT_ConvertUnits)
     bpy.utils.unregister_class(URDF_OT_ClearParentKeepTransform)
     bpy.utils.unregister_class(URDF_OT_DeleteNonMesh)
+    bpy.utils.unregister_class(URDF_OT_CleanupMeshes)
     bpy.utils.unregister_class(URDF_OT_SetVisualMesh)
     bpy.utils.unregister_class(URDF_OT_SmartJoin)
     bpy.utils.unregister_class(URDF_OT_CreateLinkAtSelection)
+    bpy.utils.unregister_class(URDF_OT_SegmentLinks)
     bpy.utils.unregister_class(URDF_OT_NameLinks)
     bpy.utils.unregister_class(URDF_OT_CreateBaseLink)
     bpy.utils.unregister_class(URDF_OT_ParentToBase)
+    bpy.utils.unregister_class(URDF_OT_AutoBindNearestLink)
     bpy.utils.unregister_class(URDF_OT_SetModuleRoot)
+    bpy.utils.unregister_class(URDF_OT_NormalizeTransforms)
     bpy.utils.unregister_class(URDF_OT_RelevantBones)
     bpy.utils.unregister_class(URDF_OT_SelectExportPathAndExport)
+    bpy.utils.unregister_class(URDF_OT_ExportMJCF)
+    bpy.utils.unregister_class(URDF_OT_ExportXacro)
+    bpy.utils.unregister_class(URDF_OT_ExportURDFBackground)
     bpy.utils.unregister_class(URDF_OT_SetExportSettings)
+    bpy.utils.unregister_class(URDF_OT_VerifyExport)
+    bpy.utils.unregister_class(URDF_OT_DiffURDF)
+    bpy.utils.unregister_class(URDF_OT_ImportURDF)
     bpy.utils.unregister_class(URDF_OT_PhobosCreateLink)
     bpy.utils.unregister_class(URDF_OT_SetJointRevolute)
     bpy.utils.unregister_class(URDF_OT_SetJointPrismatic)
     bpy.utils.unregister_class(URDF_OT_PhobosDefineJoint)
     bpy.utils.unregister_class(URDF_OT_AutoNameJoint)
     bpy.utils.unregister_class(URDF_OT_DebugJointProperties)
+    bpy.utils.unregister_class(URDF_OT_GenerateSRDF)
+    bpy.utils.unregister_class(URDF_OT_SuggestJointLimits)
+    bpy.utils.unregister_class(URDF_OT_ReachabilityMap)
+    bpy.utils.unregister_class(URDF_OT_ExportTrajectory)
+    if bpy.app.timers.is_registered(flush_joint_preview):
+        bpy.app.timers.unregister(flush_joint_preview)
+    _joint_preview_pending.clear()
+    del bpy.types.Scene.urdf_joint_preview
+    bpy.utils.unregister_class(URDF_PT_JointPreview)
     bpy.utils.unregister_class(URDF_PT_MainPanel)
+    bpy.utils.unregister_class(URDF_OT_JointPreviewReset)
+    bpy.utils.unregister_class(URDF_OT_JointPreviewLoad)
+    bpy.utils.unregister_class(URDF_JointPreviewItem)
     
     # Remove keymaps
     for km, kmi in addon_keymaps:
@@ -0,0 +1,72 @@
+"""GLB与STL导出的坐标一致性测试
+
+PLUGIN.py依赖bpy，需在带bpy模块的Python中运行（Blender自带Python或 pip install bpy）。
+"""
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+pytest.importorskip("bpy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import PLUGIN  # noqa: E402
+
+# 各轴尺寸不同的四面体，轴向错位时坐标无法重合
+CO = np.array([[0.0, 0.0, 0.0], [0.3, 0.0, 0.0], [0.0, 0.2, 0.0], [0.0, 0.0, 0.1]], dtype=np.float32) + [0.05, -0.4, 0.7]
+TRIANGLES = np.array([[0, 2, 1], [0, 1, 3], [0, 3, 2], [1, 2, 3]])
+
+
+def quaternion_matrix(x, y, z, w):
+    return np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+    ])
+
+
+def read_glb_corners(filepath):
+    """读取GLB第一个节点的网格，应用节点的TRS变换后返回 (T, 3, 3) 三角形顶点"""
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    length = int.from_bytes(data[12:16], 'little')
+    document = json.loads(data[20:20 + length])
+    binary = data[20 + length + 8:]
+
+    def accessor_array(index, columns):
+        accessor = document['accessors'][index]
+        view = document['bufferViews'][accessor['bufferView']]
+        dtype = {5123: np.uint16, 5125: np.uint32, 5126: np.float32}[accessor['componentType']]
+        width = view.get('byteStride', np.dtype(dtype).itemsize * columns) // np.dtype(dtype).itemsize
+        raw = np.frombuffer(binary, dtype=dtype, count=accessor['count'] * width, offset=view['byteOffset'])
+        return raw.reshape(-1, width)[:, :columns].astype(np.float64)
+
+    node = document['nodes'][0]
+    primitives = document['meshes'][node['mesh']]['primitives']
+    positions = accessor_array(primitives[0]['attributes']['POSITION'], 3)
+    indices = np.concatenate([accessor_array(p['indices'], 1).ravel() for p in primitives]).astype(np.int64)
+
+    positions = positions * node.get('scale', [1.0, 1.0, 1.0])
+    positions = positions @ quaternion_matrix(*node.get('rotation', [0.0, 0.0, 0.0, 1.0])).T
+    positions = positions + node.get('translation', [0.0, 0.0, 0.0])
+    return positions[indices.reshape(-1, 3)]
+
+
+def sorted_corners(corners):
+    rows = np.round(np.asarray(corners, dtype=np.float64).reshape(-1, 9), 4)
+    return rows[np.lexsort(rows.T[::-1])]
+
+
+@pytest.mark.parametrize("quantize", [False, True])
+def test_glb_matches_stl_in_link_frame(tmp_path, quantize):
+    stl_path = str(tmp_path / "part.stl")
+    glb_path = str(tmp_path / "part.glb")
+    PLUGIN.write_binary_stl(stl_path, CO, TRIANGLES)
+    PLUGIN.write_glb(glb_path, CO, TRIANGLES, quantize=quantize)
+
+    stl = PLUGIN.read_stl_arrays(stl_path)
+    stl_triangles, _ = PLUGIN.triangulate_arrays(stl)
+    tolerance = 1e-3 if quantize else 1e-5
+    np.testing.assert_allclose(sorted_corners(read_glb_corners(glb_path)),
+                               sorted_corners(stl['co'][stl_triangles]), atol=tolerance)